@@ -1,5 +1,7 @@
 # import sentry_sdk
+import asyncio
 import functools
+import itertools
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi import (
     Depends,
@@ -10,14 +12,13 @@ from fastapi import (
     Query,
     
 )
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
-from typing import  Optional
+from typing import  List, Literal, Optional
 
-from sqlalchemy import create_engine, select, Table, MetaData, and_,text
+from sqlalchemy import select, and_,text
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
 import jwt
 from jwt.exceptions import InvalidTokenError as InvalidTokenError, ExpiredSignatureError
 
@@ -35,10 +36,46 @@ from src.schema import TableMetadata, SchemaMetadata
 from src.db.schemas.schemas import SchemasPaginatedResponse
 
 from src.db.tables.schemas import TablesPaginatedResponse
+from src.db.columns.schemas import Columns
+from src.db.utils.tables import get_table
+from src.db.utils.pagination import (
+    keyset_key,
+    keyset_order,
+    keyset_page,
+    order_by,
+    paginate_rows,
+)
+from src.db.utils.filters import parse_filters, parse_sort
+from src.db.utils.cache import estimate_size, page_cache, written_tables
+from src.db.utils.resolution import project_connection, schema_name as project_schema_name
+from src.db.utils.engines import ConnectionLimitReached, engine_registry, get_engine
+from src.db.utils.queries import (
+    RunningQuery,
+    cancel_on_disconnect,
+    cancel_query,
+    effective_timeout,
+    query_registry,
+    tracked,
+)
+from src.db.utils.results import (
+    QUERY_MAX_BYTES,
+    QUERY_MAX_ROWS,
+    decode_continuation,
+    encode_continuation,
+    execute_bounded,
+    is_ordered,
+    is_read_only,
+    stream_ndjson,
+)
+from src.db.utils.replicas import is_replica_safe, replica_router, run_read
+from src.db.utils.query_log import RANKINGS, LoggedStatement, latency, query_log, slowest
+from src.db.utils.query_jobs import QUERY_JOB_TIMEOUT, QuotaExceeded, query_job_store
+from src.db.utils.counts import count_rows, count_sql, page_and_total
+from src.db.utils.export import EXPORT_FORMATS, export_table, project_columns
+from src.db.utils.formats import format_result, negotiate_format
 
 
 # from src.users.models import UserModel
-from src.projects.models import ProjectModel
 # from src.db.utils.decode import get_current_user
 from src.db import metadata_engine, engine
 from src.projects.router import project_router
@@ -96,35 +133,24 @@ async def get_source_db():
 
 
 
-@functools.lru_cache(maxsize=32)
-def get_engine(db_url: str):
-    """
-    Creates and caches a SQLAlchemy engine for a given database URL.
-    We are NOT using NullPool here, so it will use the default QueuePool.
-    """
-    print(f"--- CREATING NEW ENGINE for {db_url} ---")
-    #TODO: Consider adding pool_size and max_overflow parameters based on expected load
-    return create_engine(db_url) 
-
-# Cache for table metadata
-# The key will be a tuple: (db_url, schema_name, table_name)
-@functools.lru_cache(maxsize=128)
-def get_table(db_url: str, schema_name: str, table_name: str) -> Table:
+def get_project_table(db: Session, project_id: str, schema_id: str, table_name: str):
     """
-    Reflects and caches a Table object.
-    The db_url is part of the key to ensure we cache per-database.
+    Resolve a table of the project's database.
+
+    Returns:
+        tuple: ``(connection, target_table)``, ``connection`` being the
+        project's ``ProjectConnection``.
     """
-    print(f"--- REFLECTING NEW TABLE {schema_name}.{table_name} ---")
-    engine = get_engine(db_url) # This will be fast (from cache)
-    metadata = MetaData()
-    # Autoload the table structure ONCE
-    table = Table(
-        table_name, 
-        metadata, 
-        schema=schema_name, 
-        autoload_with=engine
+    connection = project_connection(db, project_id)
+    schema_name = project_schema_name(db, project_id, schema_id)
+
+    if not connection or not schema_name:
+        raise HTTPException(status_code=404, detail="Project or schema not found.")
+
+    pool_settings = tuple(sorted((connection.pool_settings or {}).items()))
+    return connection, get_table(
+        connection.db_url, schema_id, schema_name, table_name, pool_settings
     )
-    return table
 
 
 @app.middleware("http")
@@ -197,7 +223,33 @@ async def verify_token(request: Request, call_next):
         )
 
 
-     
+@app.middleware("http")
+async def log_statements(request: Request, call_next):
+    """
+    Record the statements an endpoint ran (``request.state.statements``) in
+    the query log once the response is sent. The bytes of the body, counted
+    as they are sent, go to the first statement, whose rows make it up.
+    """
+    statements = request.state.statements = []
+    response = await call_next(request)
+    if not statements:
+        return response
+    body = response.body_iterator
+
+    async def counted():
+        sent = 0
+        try:
+            async for chunk in body:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            statements[0].bytes = sent
+            for statement in statements:
+                query_log.record(statement)
+
+    response.body_iterator = counted()
+    return response
+
 
 # API Routes
 @app.get("/schemas/", response_model=SchemasPaginatedResponse)
@@ -276,10 +328,13 @@ def get_tables(
         "limit": limit,
     }
 
-@app.get("/columns/")
+@app.get("/columns/", response_model=List[Columns])
 def get_columns(table_id: str, limit: Optional[int] = 100, db: Session = Depends(get_db)):
     query = (
-        select(ColumnMetadata).where(ColumnMetadata.table_id == table_id).limit(limit)
+        select(ColumnMetadata)
+        .where(ColumnMetadata.table_id == table_id)
+        .order_by(ColumnMetadata.ordinal_position, ColumnMetadata.column_name)
+        .limit(limit)
     )
     columns = db.execute(query)
     return columns.scalars().all()
@@ -292,8 +347,51 @@ async def get_data(
     request: Request,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=15, le=100),
+    pagination: Literal["offset", "keyset"] = "offset",
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate", "cached", "none"] = "exact",
+    result_format: Optional[Literal["records", "rows", "columns", "arrow"]] = Query(
+        default=None, alias="format"
+    ),
+    columns: Optional[List[str]] = Query(default=None),
+    filters: Optional[List[str]] = Query(default=None, alias="filter"),
+    sort: Optional[List[str]] = Query(default=None),
     db: Session = Depends(get_db) # This is your PRIMARY app database
 ):
+    """
+    Get a page of rows from a table.
+
+    ``columns`` projects the page to the given columns, ``filter`` takes
+    ``column:operator[:value]`` predicates (``eq``, ``ne``, ``lt``, ``lte``,
+    ``gt``, ``gte``, ``in``, ``like``, ``is_null``, ``not_null``) and ``sort``
+    takes ``column`` or ``-column``. All are compiled into parameterized SQL
+    and run by the database.
+
+    With ``pagination=keyset`` pages are fetched by seeking on the table's
+    primary key (or a unique index), so deep pages cost the same as the first
+    one. Pass the returned ``next_cursor``/``prev_cursor`` as ``cursor`` to
+    move between pages. A ``sort`` is seeked on too, with the key as a
+    tie-breaker. Tables without a usable key, or sorts on nullable columns,
+    fall back to OFFSET, and the response's ``pagination`` says which mode was
+    used.
+
+    ``count`` picks how ``total`` is computed: ``exact`` counts every row,
+    ``estimate`` reads the planner's statistics and ``cached`` reuses an exact
+    count refreshed in the background. ``count_strategy`` in the response
+    says which one produced ``total``; filtered pages are always counted
+    exactly. Clients that already hold the total from an earlier page can
+    pass ``none`` to skip counting (``total`` is then null). The count and
+    the page are queried concurrently, on the project's async engine when
+    its dialect has one, so slow queries don't hold up the event loop.
+
+    ``format`` picks the layout of the rows: ``records`` (default),
+    ``rows``, ``columns`` or ``arrow``. Clients sending
+    ``Accept: application/vnd.apache.arrow.stream`` get Arrow by default.
+
+    Pages are served from a short-lived cache when the same page was read
+    recently; ``cache`` in the response says whether it was a ``hit``.
+    """
+    statements = request.state.statements
     try:
         
         start_time = datetime.now()
@@ -301,51 +399,165 @@ async def get_data(
         user = request.state.user
         project = user.get("project")
         project_id = project.get("project_id")
-        
-      
-        db_url_query = select(ProjectModel.db_connection_string).where(ProjectModel.id == project_id)
-        db_url = db.execute(db_url_query).scalars().first()
-        
-        schema_query = select(SchemaMetadata.schema_name).where(and_(SchemaMetadata.project_id == project_id, SchemaMetadata.id == schema))
-        schema_result = db.execute(schema_query).scalars().first()
-
-        if not db_url or not schema_result:
-            raise HTTPException(status_code=404, detail="Project or schema not found.")
-
-        target_engine = get_engine(db_url)
 
-       
-        target_table = get_table(db_url, schema_result, table)
+        # Resolving the table may hit the metadata database, which blocks.
+        project_db, target_table = await asyncio.to_thread(
+            get_project_table, db, project_id, schema, table
+        )
+        db_url = project_db.db_url
+        response_format = negotiate_format(result_format, request.headers.get("accept"))
+        cache_key = page_cache.key(
+            db_url,
+            target_table.schema,
+            target_table.name,
+            tuple(columns or ()),
+            tuple(filters or ()),
+            tuple(sort or ()),
+            pagination,
+            cursor,
+            skip,
+            limit,
+            count,
+        )
+        cached = page_cache.get(cache_key)
+        if cached is not None:
+            keys, rows, meta, sql = cached
+            # Served without running anything, but still what the client waited for.
+            hit = LoggedStatement("cache", sql, project_id, user.get("user_id"))
+            statements.append(hit)
+            hit.finish(rows=len(rows))
+            return format_result(
+                keys,
+                rows,
+                response_format,
+                {
+                    **meta,
+                    "time_taken": (datetime.now() - start_time).total_seconds(),
+                    "cache": "hit",
+                },
+                [target_table.c[key].type for key in keys],
+            )
 
-        #TODO: Figure out why I cannot use dependency injection for target_db and why this persists connection
-        with Session(target_engine) as target_db:
-            
-            
-            query = select(target_table).limit(limit).offset(skip)
-            
-            
-            total_query = select(func.count()).select_from(target_table)
+        projection = project_columns(target_table, columns)
+        where = parse_filters(target_table, filters)
+        order = parse_sort(target_table, sort)
+        key = keyset_order(target_table, order) if pagination == "keyset" else None
+        # Keyset cursors are built from the order columns, so fetch them
+        # even when they are projected away.
+        selected = projection + [
+            column for column, _ in key or [] if column not in projection
+        ]
+        query = select(*selected).where(*where)
+        if key:
+            query, direction, has_cursor = keyset_page(query, key, limit, cursor)
+        else:
+            stable_order = order + [
+                (column, False) for column in keyset_key(target_table) or []
+            ]
+            query = query.order_by(*order_by(stable_order)).limit(limit).offset(skip)
+
+        # Pages and counts are read from a replica when the project has a
+        # healthy one.
+        read_url = replica_router.choose(project_db)
+        read_engine = get_engine(read_url, project_db.pool_settings)
+
+        def fetch_total(connection):
+            counted = LoggedStatement("data", "", project_id, user.get("user_id"))
+            total = count_rows(connection, read_engine, target_table, count, where)
+            counted.sql = count_sql(connection, target_table, total[1], where)
+            counted.finish(rows=1)
+            if counted.sql:
+                statements.append(counted)
+            return total
+
+        def fetch_page(connection):
+            statement = LoggedStatement("data", str(query), project_id, user.get("user_id"))
+            # The page comes first: the response bytes are its.
+            statements.insert(0, statement)
+            page = connection.execute(query).mappings().all()
+            statement.finish(rows=len(page))
+            return page
+
+        (total_data, count_strategy), rows = await page_and_total(
+            functools.partial(run_read, project_db, url=read_url),
+            fetch_page,
+            None if count == "none" else fetch_total,
+        )
+        next_cursor = prev_cursor = None
+        if key:
+            rows, next_cursor, prev_cursor = paginate_rows(
+                rows, key, limit, direction, has_cursor
+            )
 
-            
-            total_data = target_db.execute(total_query).scalar_one()
-            result = target_db.execute(query)
-            
-            
-            
-            return {
-                "data": result.mappings().all(),
-                "total": total_data,
+        keys = [column.name for column in projection]
+        rows = [tuple(row.values())[: len(projection)] for row in rows]
+        meta = {
+            "total": total_data,
+            "page": None if key else (skip // limit) + 1,
+            "limit": limit,
+            "count_strategy": count_strategy,
+            "pagination": "keyset" if key else "offset",
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }
+        page_cache.set(cache_key, (keys, rows, meta, str(query)), estimate_size(rows))
+
+        return format_result(
+            keys,
+            rows,
+            response_format,
+            {
+                **meta,
                 "time_taken": (datetime.now() - start_time).total_seconds(),
-                "page": (skip // limit) + 1,
-                "limit": limit,
-            }
+                "cache": "miss",
+            },
+            [column.type for column in projection],
+        )
 
+    except HTTPException:
+        raise
+    except ConnectionLimitReached as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print("e", e)
+        for statement in statements:
+            statement.finish(error=str(e))
         # Handle specific exceptions if possible (e.g., table not found)
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get("/export/")
+def export_data(
+    schema: str,
+    table: str,
+    request: Request,
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    columns: Optional[List[str]] = Query(default=None),
+    db: Session = Depends(get_db),
+):
+    """
+    Stream a whole table as NDJSON or CSV, optionally projected to
+    ``columns``. Rows are read through a server-side cursor and sent in
+    chunks, so memory use does not grow with the table.
+    """
+    try:
+        project_id = request.state.user.get("project").get("project_id")
+        project_db, target_table = get_project_table(db, project_id, schema, table)
+        target_engine = get_engine(
+            replica_router.choose(project_db), project_db.pool_settings
+        )
+        export_columns = project_columns(target_table, columns)
+    except Exception as e:
+        print("e", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        export_table(target_engine, target_table, export_columns, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{export_format}"'},
+    )
+
+
 # @app.post("/table/new")
 # def create_new_table(
 #     request:Request,
@@ -378,27 +590,60 @@ async def get_data(
 #     pass
 
 @app.post("/query/execute")
-def execute_query(
+async def execute_query(
     query:dict,
     request:Request,
+    result_format: Optional[Literal["records", "rows", "columns", "arrow"]] = Query(
+        default=None, alias="format"
+    ),
+    max_rows: int = Query(default=QUERY_MAX_ROWS, ge=1, le=QUERY_MAX_ROWS),
+    max_bytes: int = Query(default=QUERY_MAX_BYTES, ge=1, le=QUERY_MAX_BYTES),
+    stream: bool = False,
+    timeout: Optional[int] = Query(default=None, ge=1),
+    primary: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Endpoint for executing arbitrary SQL queries on the selected project database"""
+    """
+    Endpoint for executing arbitrary SQL queries on the selected project
+    database. Queries run on the project's async engine, so a slow query only
+    holds its own request.
+
+    Rows are fetched in batches from a server-side cursor until ``max_rows``
+    rows or about ``max_bytes`` bytes are read. A cut-off result has
+    ``truncated: true`` and, for read-only statements with an ``ORDER BY``,
+    a ``continuation`` handle; post ``{"continuation": ...}`` to get the next
+    rows. With ``stream=true`` the whole result is streamed as NDJSON instead.
+
+    Each query gets an id (``query_id`` in the response; clients may pick
+    their own with ``{"query_id": ...}``, unique among their running
+    queries) and can be cancelled through ``POST /query/{query_id}/cancel``. It runs under the project's statement
+    timeout, which ``timeout`` (seconds) may shorten, and is cancelled if the
+    client disconnects before it finishes.
+
+    Read-only statements run on one of the project's read replicas when it
+    has a healthy one; ``primary=true`` keeps them on the primary, e.g. to
+    read back a write straight away.
+    """
     
 
+    statement = None
     try:
         start_time = datetime.now()
         user = request.state.user
         print("user", user)
         project = user.get("project")
         project_id = project.get("project_id")
-        db_url_query = select(ProjectModel.db_connection_string).where(ProjectModel.id == project_id)
-        db_url = db.execute(db_url_query).scalars().first()
-        db_engine = create_engine(db_url)
-        print("db_engine", db_engine)
-        target_db = Session(db_engine)
-        print("db", target_db)
-        query_str = query.get("query")
+        project_db = await asyncio.to_thread(project_connection, db, project_id)
+        if not project_db:
+            raise HTTPException(status_code=404, detail="Project not found.")
+        db_url, pool_settings = project_db.db_url, project_db.pool_settings
+        offset = 0
+        if query.get("continuation"):
+            query_str, offset = decode_continuation(
+                query["continuation"], user.get("user_id"), project_id
+            )
+        else:
+            query_str = query.get("query")
         print("query", query_str)
         if not query_str:
             raise HTTPException(
@@ -406,21 +651,304 @@ def execute_query(
                 detail="Missing or empty 'query' parameter.",
             )
         t = text(query_str)
+        # Writes, DDL and locking reads stay on the primary.
+        target_url = (
+            replica_router.choose(project_db)
+            if not primary and is_replica_safe(query_str)
+            else db_url
+        )
+        running = RunningQuery(
+            id=query_registry.new_id(query.get("query_id")),
+            user_id=user.get("user_id"),
+            project_id=project_id,
+            db_url=target_url,
+            sql=query_str,
+            timeout=effective_timeout(timeout, project_db.statement_timeout),
+            pool_settings=pool_settings,
+        )
+        statement = LoggedStatement("execute", query_str, project_id, user.get("user_id"))
+        request.state.statements.append(statement)
+
+        def invalidate_written():
+            # Cached pages of the written tables are stale now; statements
+            # whose targets can't be told apart drop every page of the database.
+            page_cache.invalidate(db_url, written_tables(query_str) or None)
+
+        if stream:
+            chunks = stream_ndjson(
+                get_engine(target_url, pool_settings), t, invalidate_written, query=running
+            )
+            # Run the statement and read the first batch before the headers go
+            # out, so SQL errors still get a proper error response.
+            first = await asyncio.to_thread(next, chunks, b"")
+            # Streams are logged with the time to their first batch.
+            statement.finish()
+            return StreamingResponse(
+                itertools.chain([first], chunks),
+                media_type=EXPORT_FORMATS["ndjson"],
+            )
+
+        def execute(connection):
+            with tracked(connection, running):
+                return execute_bounded(
+                    connection, t, query_str, max_rows, max_bytes, offset
+                )
+
+        async def cancel():
+            await asyncio.to_thread(
+                cancel_query, get_engine(running.db_url, pool_settings), running
+            )
+
         print("start",datetime.now())
-        result = target_db.execute(t)
+        executed = await cancel_on_disconnect(
+            request, run_read(project_db, execute, target_url), cancel
+        )
         print("end",datetime.now())
-        if result.returns_rows:
-            return {
-            "data": result.mappings().all(),
-            "time_taken": (datetime.now() - start_time).total_seconds(),
-        }
+        if not is_read_only(query_str):
+            invalidate_written()
+        if executed.keys is not None:
+            keys, rows, truncated, _ = executed
+            statement.finish(rows=len(rows))
+            continuation = None
+            if truncated and is_read_only(query_str) and is_ordered(query_str):
+                continuation = encode_continuation(
+                    query_str, offset + len(rows), user.get("user_id"), project_id
+                )
+            return format_result(
+                keys,
+                rows,
+                negotiate_format(result_format, request.headers.get("accept")),
+                {
+                    "query_id": running.id,
+                    "time_taken": (datetime.now() - start_time).total_seconds(),
+                    "row_count": len(rows),
+                    "truncated": truncated,
+                    "continuation": continuation,
+                },
+            )
         else:
-            target_db.commit()
-            return {"message": "Query executed successfully.", "time_taken": (datetime.now() - start_time).total_seconds()}
+            statement.finish()
+            return {"message": "Query executed successfully.", "rowcount": executed.rowcount, "query_id": running.id, "time_taken": (datetime.now() - start_time).total_seconds()}
         
+    except HTTPException:
+        raise
+    except ConnectionLimitReached as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print("e", e)
+        if statement is not None:
+            statement.finish(error=str(e))
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/query/running")
+def get_running_queries(request: Request):
+    """The current user's queries that are still running."""
+    user_id = request.state.user.get("user_id")
+    return [query.summary() for query in query_registry.for_user(user_id)]
+
+
+@app.post("/query/{query_id}/cancel")
+async def cancel_running_query(query_id: str, request: Request):
+    """Cancel one of the current user's running queries."""
+    running = query_registry.get(request.state.user.get("user_id"), query_id)
+    if not running:
+        raise HTTPException(status_code=404, detail="Query not found.")
+    try:
+        sent = await asyncio.to_thread(
+            cancel_query, get_engine(running.db_url, running.pool_settings), running
+        )
+    except Exception as e:
+        print("e", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    if not sent:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This database does not support cancelling queries.",
+        )
+    return {"query_id": query_id, "cancelled": True}
+
+
+@app.post("/query/jobs", status_code=status.HTTP_202_ACCEPTED)
+def submit_query_job(
+    query: dict,
+    request: Request,
+    timeout: Optional[int] = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Run a read-only query in the background and store its result on the
+    server. Poll ``GET /query/jobs/{job_id}`` until it is ``completed``, then
+    read pages of the result from ``GET /query/jobs/{job_id}/rows``. Jobs run
+    under the project's statement timeout, or ``QUERY_JOB_TIMEOUT``, which
+    ``timeout`` (seconds) may shorten, on a read replica when the project
+    has a healthy one.
+    """
+    try:
+        user = request.state.user
+        project_id = user.get("project").get("project_id")
+        project_db = project_connection(db, project_id)
+        if not project_db:
+            raise HTTPException(status_code=404, detail="Project not found.")
+        query_str = query.get("query")
+        if not query_str:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Missing or empty 'query' parameter.",
+            )
+        if not is_read_only(query_str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Query jobs only run read-only statements.",
+            )
+        running = RunningQuery(
+            id=query_registry.new_id(),
+            user_id=user.get("user_id"),
+            project_id=project_id,
+            db_url=(
+                replica_router.choose(project_db)
+                if is_replica_safe(query_str)
+                else project_db.db_url
+            ),
+            sql=query_str,
+            timeout=effective_timeout(
+                timeout, project_db.statement_timeout or QUERY_JOB_TIMEOUT
+            ),
+            pool_settings=project_db.pool_settings,
+        )
+        return query_job_store.submit(
+            get_engine(running.db_url, running.pool_settings), running
+        )
+    except HTTPException:
+        raise
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=status.HTTP_507_INSUFFICIENT_STORAGE, detail=str(e))
+    except Exception as e:
+        print("e", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/query/jobs")
+def get_query_jobs(request: Request):
+    """The current user's query jobs, newest first."""
+    return query_job_store.for_user(request.state.user.get("user_id"))
+
+
+def get_user_job(request, job_id):
+    job = query_job_store.get(request.state.user.get("user_id"), job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.get("/query/jobs/{job_id}")
+def get_query_job(job_id: str, request: Request):
+    """Status and progress of a query job."""
+    return get_user_job(request, job_id)
+
+
+@app.get("/query/jobs/{job_id}/rows")
+def get_query_job_rows(
+    job_id: str,
+    request: Request,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=QUERY_MAX_ROWS),
+    result_format: Optional[Literal["records", "rows", "columns", "arrow"]] = Query(
+        default=None, alias="format"
+    ),
+):
+    """A page of a completed query job's stored result."""
+    job = get_user_job(request, job_id)
+    if job["status"] != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job['status']}, not completed.",
+        )
+    try:
+        rows = query_job_store.rows(job["user_id"], job_id, skip, limit)
+    except FileNotFoundError:
+        # Expired and swept since the manifest was read.
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return format_result(
+        job["columns"],
+        rows,
+        negotiate_format(result_format, request.headers.get("accept")),
+        {
+            "job_id": job_id,
+            "total": job["row_count"],
+            "skip": skip,
+            "limit": limit,
+            "expires_at": job["expires_at"],
+        },
+    )
+
+
+@app.delete("/query/jobs/{job_id}")
+def delete_query_job(job_id: str, request: Request):
+    """
+    Delete a query job and its stored result. Running jobs are cancelled
+    first; their result is gone once the cancellation lands.
+    """
+    job = get_user_job(request, job_id)
+    if job["status"] not in ("completed", "failed", "cancelled"):
+        running = query_registry.get(job["user_id"], job_id)
+        if running:
+            try:
+                cancel_query(get_engine(running.db_url, running.pool_settings), running)
+            except Exception as e:
+                print("e", e)
+                raise HTTPException(status_code=400, detail=str(e))
+    query_job_store.delete(job["user_id"], job_id)
+    return {"job_id": job_id, "deleted": True}
+
+
+@app.get("/query/log/slowest")
+def get_slowest_queries(
+    request: Request,
+    limit: int = Query(default=10, ge=1, le=100),
+    by: Literal[RANKINGS] = "mean",
+    db: Session = Depends(get_db),
+):
+    """
+    The current project's slowest statement fingerprints, ranked by mean,
+    max or total duration in milliseconds, or by how often they ran.
+    """
+    query_log.flush()
+    project_id = request.state.user.get("project").get("project_id")
+    return slowest(db, project_id, limit, by)
+
+
+@app.get("/query/log/latency")
+def get_query_latency(
+    request: Request,
+    fingerprint: Optional[str] = None,
+    limit: int = Query(default=10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    p50/p95/p99 durations in milliseconds of the current project's statement
+    fingerprints, or of one ``fingerprint``, slowest p95 first.
+    """
+    query_log.flush()
+    project_id = request.state.user.get("project").get("project_id")
+    return latency(db, project_id, fingerprint, limit)
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Size and hit/miss counters of the table page cache."""
+    return page_cache.stats()
+
+
+@app.get("/engines/stats")
+def get_engine_stats():
+    """
+    Open engines, their pool occupancy, the process connection count and the
+    health of the read replicas seen so far.
+    """
+    return {**engine_registry.stats(), "replicas": replica_router.stats()}
+
+
 @app.get("/")
 def read_root():
     return "Server is running"
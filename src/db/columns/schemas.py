@@ -1,5 +1,5 @@
-
 from datetime import datetime
+from typing import Any, List, Optional
 from pydantic import BaseModel
 
 
@@ -8,4 +8,17 @@ class Columns(BaseModel):
     created_at: datetime
     updated_at: datetime
     column_name: str
-    table_name: str
\ No newline at end of file
+    table_name: str
+    table_id: str
+    schema_name: Optional[str] = None
+    schema_id: str
+    data_type: Optional[str] = None
+    is_nullable: Optional[bool] = None
+    ordinal_position: Optional[int] = None
+    column_default: Optional[str] = None
+    is_primary_key: Optional[bool] = None
+    indexes: Optional[List[Any]] = None
+    foreign_keys: Optional[List[Any]] = None
+
+    class Config:
+        from_attributes = True
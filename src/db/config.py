@@ -18,6 +18,22 @@ SUPPORTED_DATABASES = {
         "seed": mariadb.mariadb_seed
     }
 }
+
+
+def get_seed(source_engine, project_id):
+    """
+    Build the dialect's Seed for a project from an engine on its database.
+
+    Args:
+        source_engine (Engine): Engine connected to the project's database.
+        project_id (str): Project the metadata belongs to.
+    """
+    database_info = SUPPORTED_DATABASES.get(source_engine.dialect.name)
+    if not database_info:
+        raise ValueError(f"Unsupported database dialect: {source_engine.dialect.name}")
+    return database_info["seed"].Seed(project_id=project_id, adapter=source_engine)
+
+
 class Config:
     def __init__(self):
         self.host = None
@@ -0,0 +1,305 @@
+"""
+Migrations of the metadata database.
+
+``create_all`` creates missing tables but never changes the ones that exist,
+so the columns and unique keys added to the models after a table was created
+are added by the migrations below. They are run explicitly, before starting
+a new version of the API or the workers::
+
+    python -m src.db.migrations [--merge-duplicates]
+
+Every step checks the live schema first, so running the migrations again
+changes nothing. A unique key is only added once the rows it covers are
+unique: duplicates are reported and the migration stops, unless
+``--merge-duplicates`` is given, in which case the most recently updated row
+of each group is kept and the rows referencing the others are pointed at it.
+"""
+import argparse
+import logging
+from dataclasses import dataclass
+from itertools import groupby
+
+from sqlalchemy import and_, delete, func, inspect, select, text, update
+from sqlalchemy.schema import AddConstraint
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    name: str
+    # (table name, column name) of the model columns to add.
+    columns: tuple = ()
+    # (table name, constraint name) of the model unique keys to add.
+    unique: tuple = ()
+    # Turn the live columns of the model's ``UTCDateTime`` columns into
+    # ``timestamp with time zone`` (PostgreSQL only; other backends store
+    # UTC without a zone).
+    timezone_aware: bool = False
+
+
+MIGRATIONS = [
+    Migration(
+        "catalog unique keys",
+        # Parents first, so merging duplicate schemas happens before the
+        # tables pointed at the kept schema are checked.
+        unique=(
+            ("bus_metadata", "bus_metadata_project_id_schema_name_key"),
+            ("table_metadata", "table_metadata_schema_id_table_name_key"),
+            ("column_metadata", "column_metadata_table_id_column_name_key"),
+        ),
+    ),
+    Migration(
+        "catalog fingerprints",
+        columns=(("bus_metadata", "fingerprint"), ("table_metadata", "fingerprint")),
+    ),
+    Migration(
+        "seed job kinds",
+        columns=(("bus_seed_jobs", "kind"), ("bus_seed_jobs", "summary")),
+    ),
+    Migration(
+        "typed column metadata",
+        columns=tuple(
+            ("column_metadata", column_name)
+            for column_name in (
+                "data_type",
+                "is_nullable",
+                "ordinal_position",
+                "column_default",
+                "is_primary_key",
+                "indexes",
+                "foreign_keys",
+            )
+        ),
+    ),
+    Migration(
+        "project pool settings",
+        columns=(("bus_projects", "pool_settings"),),
+    ),
+    Migration(
+        "project statement timeout",
+        columns=(("bus_projects", "statement_timeout"),),
+    ),
+    Migration(
+        "project read replicas",
+        columns=(("bus_projects", "read_replicas"), ("bus_projects", "max_replica_lag")),
+    ),
+    Migration("timezone-aware timestamps", timezone_aware=True),
+]
+
+
+class DuplicateRows(Exception):
+    pass
+
+
+def add_column(connection, table, column):
+    """
+    Add ``column`` to ``table``. Columns with a server default are added with
+    it, and ``NOT NULL`` when the model says so, filling the existing rows.
+    """
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    definition = column.type.compile(dialect=dialect)
+    if column.server_default is not None:
+        default = dialect.ddl_compiler(dialect, None).get_column_default_string(column)
+        definition += f" DEFAULT {default}"
+        if not column.nullable:
+            definition += " NOT NULL"
+    connection.execute(
+        text(
+            f"ALTER TABLE {preparer.format_table(table)} "
+            f"ADD COLUMN {preparer.format_column(column)} {definition}"
+        )
+    )
+
+
+def make_timezone_aware(connection, table, column):
+    """Convert a PostgreSQL ``timestamp`` column holding UTC to ``timestamptz``."""
+    preparer = connection.dialect.identifier_preparer
+    name = preparer.format_column(column)
+    connection.execute(
+        text(
+            f"ALTER TABLE {preparer.format_table(table)} "
+            f"ALTER COLUMN {name} TYPE TIMESTAMP WITH TIME ZONE "
+            f"USING {name} AT TIME ZONE 'UTC'"
+        )
+    )
+
+
+def has_unique(inspector, table, columns):
+    """Whether a unique constraint or index of ``table`` covers exactly ``columns``."""
+    existing = inspector.get_unique_constraints(table.name) + [
+        index for index in inspector.get_indexes(table.name) if index["unique"]
+    ]
+    return any(set(unique["column_names"]) == set(columns) for unique in existing)
+
+
+def add_unique(connection, constraint):
+    if connection.dialect.name != "sqlite":
+        connection.execute(AddConstraint(constraint))
+        return
+    # SQLite can't add constraints to existing tables; a unique index enforces
+    # the same thing.
+    preparer = connection.dialect.identifier_preparer
+    columns = ", ".join(preparer.format_column(column) for column in constraint.columns)
+    connection.execute(
+        text(
+            f"CREATE UNIQUE INDEX {preparer.quote(constraint.name)} "
+            f"ON {preparer.format_table(constraint.table)} ({columns})"
+        )
+    )
+
+
+def duplicate_groups(connection, table, columns):
+    """
+    Primary keys of the rows of ``table`` sharing the values of ``columns``,
+    one list per group, most recently updated first.
+    """
+    [primary_key] = table.primary_key.columns
+    key = [table.c[name] for name in columns]
+    duplicated = select(*key).group_by(*key).having(func.count() > 1).subquery()
+    newest_first = [table.c.updated_at.desc()] if "updated_at" in table.c else []
+    rows = connection.execute(
+        select(primary_key, *key)
+        .join(duplicated, and_(*(table.c[name] == duplicated.c[name] for name in columns)))
+        .order_by(*key, *newest_first, primary_key.desc())
+    ).all()
+    return [
+        [row[0] for row in group]
+        for _, group in groupby(rows, key=lambda row: tuple(row[1:]))
+    ]
+
+
+def merge(connection, table, groups, tables):
+    """
+    Keep the first row of every group and point the rows of ``tables``
+    referencing the others at it.
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    [primary_key] = table.primary_key.columns
+    references = [
+        foreign_key.parent
+        for other in tables
+        for foreign_key in other.foreign_keys
+        if foreign_key.column is primary_key
+    ]
+    deleted = 0
+    for kept, *duplicates in groups:
+        for column in references:
+            connection.execute(
+                update(column.table)
+                .where(column.in_(duplicates))
+                .values({column.name: kept})
+            )
+        connection.execute(delete(table).where(primary_key.in_(duplicates)))
+        deleted += len(duplicates)
+    return deleted
+
+
+def apply(connection, migration, metadata, merge_duplicates=False):
+    """
+    Add what ``migration`` adds and is still missing.
+
+    Raises:
+        DuplicateRows: A unique key covers duplicate rows and
+            ``merge_duplicates`` is off.
+    """
+    inspector = inspect(connection)
+    tables = [
+        table for table in metadata.sorted_tables if inspector.has_table(table.name)
+    ]
+    for table_name, column_name in migration.columns:
+        if not inspector.has_table(table_name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        if column_name in existing:
+            continue
+        logger.info("%s: adding column %s.%s", migration.name, table_name, column_name)
+        table = metadata.tables[table_name]
+        add_column(connection, table, table.c[column_name])
+    if migration.timezone_aware and connection.dialect.name == "postgresql":
+        from src.mixins import UTCDateTime
+
+        for table in tables:
+            live = {
+                column["name"]: column["type"]
+                for column in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if (
+                    isinstance(column.type, UTCDateTime)
+                    and column.name in live
+                    and not getattr(live[column.name], "timezone", False)
+                ):
+                    logger.info(
+                        "%s: converting %s.%s", migration.name, table.name, column.name
+                    )
+                    make_timezone_aware(connection, table, column)
+    for table_name, constraint_name in migration.unique:
+        if not inspector.has_table(table_name):
+            continue
+        table = metadata.tables[table_name]
+        [constraint] = [
+            constraint for constraint in table.constraints if constraint.name == constraint_name
+        ]
+        columns = [column.name for column in constraint.columns]
+        if has_unique(inspector, table, columns):
+            continue
+        groups = duplicate_groups(connection, table, columns)
+        if groups and not merge_duplicates:
+            raise DuplicateRows(
+                f"{sum(len(group) for group in groups)} rows of {table_name} share "
+                f"their {', '.join(columns)} with another row; rerun with "
+                "--merge-duplicates to keep the most recently updated of each."
+            )
+        if groups:
+            logger.warning(
+                "%s: merged %d duplicate rows of %s",
+                migration.name,
+                merge(connection, table, groups, tables),
+                table_name,
+            )
+        logger.info("%s: adding unique key %s", migration.name, constraint_name)
+        add_unique(connection, constraint)
+
+
+def upgrade_metadata(engine, metadata=None, merge_duplicates=False, migrations=MIGRATIONS):
+    """Run the ``migrations`` on the metadata database, all or none."""
+    if metadata is None:
+        import src.schema  # noqa: F401 -- registers the catalog tables
+        from src.models import Base
+
+        metadata = Base.metadata
+
+    with engine.begin() as connection:
+        for migration in migrations:
+            apply(connection, migration, metadata, merge_duplicates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--merge-duplicates",
+        action="store_true",
+        help="Merge rows that would break a new unique key instead of stopping.",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    import src.schema  # noqa: F401 -- registers the catalog tables
+    from src.db.config import metadata_engine
+    from src.models import Base
+
+    Base.metadata.create_all(bind=metadata_engine)
+    try:
+        upgrade_metadata(metadata_engine, merge_duplicates=args.merge_duplicates)
+    except DuplicateRows as e:
+        logger.error("%s", e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String
 from sqlalchemy.orm import declarative_mixin
-from datetime import datetime
 import uuid
 
+from src.mixins import UTCDateTime, utcnow
+
 
 @declarative_mixin
 class UniqueIDMixin:
@@ -19,9 +20,9 @@ class TimeStampMixin:
     Mixin to add a timestamp to a SQLAlchemy model.
     """
 
-    created_at = Column(DateTime, default=datetime.utcnow(), nullable=False)
+    created_at = Column(UTCDateTime, default=utcnow, nullable=False)
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow(),
+        UTCDateTime,
+        default=utcnow,
         nullable=False,
     )
@@ -0,0 +1,89 @@
+"""
+Async access to project databases.
+
+Queries against project databases can take seconds. Running them on
+SQLAlchemy's asyncio engines (asyncpg for PostgreSQL, asyncmy for MySQL and
+MariaDB) lets one worker wait on many of them at once instead of blocking
+its event loop on each. Dialects without an async driver keep using the
+blocking engine from a worker thread. Both engines of a project live in
+``src.db.utils.engines``.
+"""
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+asyncmy",
+    "mariadb": "mariadb+asyncmy",
+}
+
+
+def async_url(db_url):
+    """
+    Translate a project's connection string to its async driver.
+
+    Returns:
+        URL: The async URL, or None when the dialect has no async driver.
+    """
+    url = make_url(db_url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name())
+    if drivername is None:
+        return None
+    query = dict(url.query)
+    if drivername == "postgresql+asyncpg" and "sslmode" in query:
+        # asyncpg spells libpq's sslmode as ssl.
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername=drivername, query=query)
+
+
+def create_project_async_engine(db_url, options):
+    """
+    Create the async engine of a project's connection string with the same
+    pool ``options`` as its blocking engine.
+
+    Returns:
+        AsyncEngine: The engine, or None when the dialect has no async driver
+        or the driver isn't installed; callers then fall back to the
+        blocking engine.
+    """
+    url = async_url(db_url)
+    if url is None:
+        return None
+    try:
+        return create_async_engine(url, **options)
+    except ImportError as e:
+        print("Async driver unavailable, using the blocking engine:", e)
+        return None
+
+
+async def run_sync(db_url, fn, pool_settings=None):
+    """
+    Run ``fn(connection)`` on a pooled connection of the project database:
+    through its async engine when there is one, else on its blocking engine
+    in a thread.
+    """
+    from src.db.utils.engines import engine_registry
+
+    entry = engine_registry.entry(db_url, pool_settings)
+    async_engine = entry.get_async()
+    if async_engine is None:
+
+        def run():
+            with entry.engine.connect() as connection:
+                return fn(connection)
+
+        return await asyncio.to_thread(run)
+    async with async_engine.connect() as connection:
+        return await connection.run_sync(fn)
+
+
+async def ping(db_url, pool_settings=None):
+    """Check the project database answers ``SELECT 1``."""
+    return await run_sync(
+        db_url,
+        lambda connection: connection.execute(text("SELECT 1")).scalar_one(),
+        pool_settings,
+    ) == 1
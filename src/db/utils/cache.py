@@ -0,0 +1,194 @@
+"""
+Result cache for table pages.
+
+Pages of ``GET /data/`` are cached per database, table, projection, filters,
+sort and page for ``PAGE_CACHE_TTL`` seconds. The cache is bounded both by
+``PAGE_CACHE_MAX_ENTRIES`` and by an estimate of the memory its rows take,
+``PAGE_CACHE_MAX_BYTES``; the least recently used pages are evicted first.
+Writes run through ``/query/execute`` invalidate the pages of the tables they
+touch. Setting ``PAGE_CACHE_TTL`` to 0 disables the cache.
+"""
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config as decouple_config
+
+PAGE_CACHE_TTL = decouple_config("PAGE_CACHE_TTL", 60, cast=int)
+PAGE_CACHE_MAX_ENTRIES = decouple_config("PAGE_CACHE_MAX_ENTRIES", 1024, cast=int)
+PAGE_CACHE_MAX_BYTES = decouple_config(
+    "PAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024, cast=int
+)
+
+_IDENTIFIER = r'[`"\[]?[\w$]+[`"\]]?'
+WRITE_TARGET_PATTERN = re.compile(
+    r"\b(?:insert\s+(?:ignore\s+)?into|replace\s+into|merge\s+into|update"
+    r"|delete\s+from|truncate(?:\s+table)?|alter\s+table"
+    r"|drop\s+table(?:\s+if\s+exists)?)"
+    rf"\s+((?:{_IDENTIFIER}\s*\.\s*)?{_IDENTIFIER})",
+    re.IGNORECASE,
+)
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+
+
+def written_tables(sql):
+    """
+    Best-effort list of the tables a statement writes to.
+
+    Returns:
+        list: ``(schema, table)`` pairs; ``schema`` is None when the table
+        isn't qualified. Empty when no write target could be found.
+    """
+    sql = STRING_LITERAL_PATTERN.sub("''", sql)
+    tables = []
+    for match in WRITE_TARGET_PATTERN.finditer(sql):
+        parts = [part.strip().strip('`"[]') for part in match.group(1).split(".")]
+        schema, table = parts if len(parts) == 2 else (None, parts[0])
+        tables.append((schema, table))
+    return tables
+
+
+def fold_name(name):
+    """
+    Case-folded schema or table name. MySQL (on most platforms) and
+    unquoted PostgreSQL identifiers ignore case, so ``Users`` and ``users``
+    are the same table to the cache; at worst a write to a quoted mixed-case
+    table also drops the pages of its lower-case namesake.
+    """
+    return name.lower() if name else name
+
+
+def row_size(row):
+    """Rough number of bytes held by one row tuple."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+def estimate_size(rows):
+    """Rough number of bytes held by a list of row tuples."""
+    return sys.getsizeof(rows) + sum(row_size(row) for row in rows)
+
+
+class PageCache:
+    """
+    LRU cache of pages with a TTL and a memory budget.
+
+    Keys start with ``(db_url, schema_name, table_name)`` so a write can drop
+    every page of a table; build them with ``key`` so names are case-folded
+    the way ``invalidate`` folds them.
+    """
+
+    def __init__(
+        self,
+        ttl=PAGE_CACHE_TTL,
+        max_entries=PAGE_CACHE_MAX_ENTRIES,
+        max_bytes=PAGE_CACHE_MAX_BYTES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.evictions = self.expirations = self.invalidations = 0
+
+    @staticmethod
+    def key(db_url, schema_name, table_name, *params):
+        return (db_url, fold_name(schema_name), fold_name(table_name), *params)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0 and self.max_bytes > 0
+
+    def _drop(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key):
+        """
+        Returns:
+            The cached value, or None on a miss or an expired entry.
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, size):
+        """Cache ``value``, evicting least recently used pages to make room."""
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, db_url, tables=None):
+        """
+        Drop the pages of ``tables`` (``(schema, table)`` pairs, a None
+        schema matching any schema) on ``db_url``, or all of its pages.
+
+        Returns:
+            int: Number of pages dropped.
+        """
+        if tables is not None:
+            tables = [(fold_name(schema), fold_name(table)) for schema, table in tables]
+        with self.lock:
+            stale = [
+                key
+                for key in self.entries
+                if key[0] == db_url
+                and (
+                    tables is None
+                    or any(
+                        key[2] == table and schema in (None, key[1])
+                        for schema, table in tables
+                    )
+                )
+            ]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+page_cache = PageCache()
@@ -0,0 +1,196 @@
+"""
+Row count strategies for table pages.
+
+``exact`` runs ``COUNT(*)``, a full scan on PostgreSQL and InnoDB.
+``estimate`` reads the planner's statistics instead (``pg_class.reltuples``
+or ``information_schema.tables.table_rows``), which is instant but only as
+fresh as the last ANALYZE. ``cached`` serves an exact count computed in the
+background and reuses it for ``COUNT_CACHE_TTL`` seconds; until the first
+count lands it answers with the estimate.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config as decouple_config
+from sqlalchemy import func, select, text
+
+COUNT_CACHE_TTL = decouple_config("COUNT_CACHE_TTL", 300, cast=int)
+# Threads running background exact counts for the cached strategy.
+COUNT_WORKERS = decouple_config("COUNT_WORKERS", 2, cast=int)
+
+PG_ESTIMATE_QUERY = text(
+    """
+    SELECT c.reltuples::bigint
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema_name AND c.relname = :table_name
+    """
+)
+MYSQL_ESTIMATE_QUERY = text(
+    """
+    SELECT table_rows
+    FROM information_schema.tables
+    WHERE table_schema = :schema_name AND table_name = :table_name
+    """
+)
+
+
+def exact_count_query(table, where=()):
+    return select(func.count()).select_from(table).where(*where)
+
+
+def exact_count(connection, table, where=()):
+    return connection.execute(exact_count_query(table, where)).scalar_one()
+
+
+def estimate_query(connection):
+    """The dialect's row estimate query, or None when it has none."""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        return PG_ESTIMATE_QUERY
+    if dialect in ("mysql", "mariadb"):
+        return MYSQL_ESTIMATE_QUERY
+    return None
+
+
+def estimate_count(connection, table):
+    """
+    Returns:
+        int: The planner's row estimate, or None when the dialect has none or
+        the table has never been analyzed (``reltuples`` is -1 on PostgreSQL).
+    """
+    query = estimate_query(connection)
+    if query is None:
+        return None
+    estimate = connection.execute(
+        query, {"schema_name": table.schema, "table_name": table.name}
+    ).scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+class RowCountCache:
+    """
+    Exact counts keyed by database and table, refreshed in the background.
+
+    A missing or expired entry schedules one refresh at a time per table; an
+    expired count keeps being served until its refresh lands.
+    """
+
+    def __init__(self, ttl=COUNT_CACHE_TTL, workers=COUNT_WORKERS):
+        self.ttl = ttl
+        self.counts = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="count"
+        )
+
+    @staticmethod
+    def key(engine, table):
+        return (str(engine.url), table.schema, table.name)
+
+    def get(self, engine, table):
+        """
+        Returns:
+            int: The cached count, or None if there is none yet. A refresh is
+            scheduled whenever the entry is missing or older than the TTL.
+        """
+        key = self.key(engine, table)
+        with self.lock:
+            entry = self.counts.get(key)
+            expired = entry is None or time.monotonic() - entry[1] > self.ttl
+            if expired and key not in self.refreshing:
+                self.refreshing.add(key)
+                self.executor.submit(self._refresh, engine, table, key)
+        return entry[0] if entry else None
+
+    def _refresh(self, engine, table, key):
+        try:
+            with engine.connect() as connection:
+                count = exact_count(connection, table)
+            with self.lock:
+                self.counts[key] = (count, time.monotonic())
+        except Exception as e:
+            print("Error refreshing row count:", key, e)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def invalidate(self, engine, table=None):
+        """Forget the counts of one table, or of every table on ``engine``."""
+        url = str(engine.url)
+        with self.lock:
+            for key in list(self.counts):
+                if key[0] == url and (
+                    table is None or key[1:] == (table.schema, table.name)
+                ):
+                    del self.counts[key]
+
+
+row_count_cache = RowCountCache()
+
+
+def count_rows(connection, engine, table, strategy="exact", where=()):
+    """
+    Count the rows of ``table`` matching ``where`` with the requested
+    strategy.
+
+    Returns:
+        tuple: ``(total, strategy)`` where ``strategy`` is the one that
+        actually produced ``total``: a missing estimate falls back to an
+        exact count, and a cold cache answers with the estimate. Filtered
+        counts are always exact, since statistics and the cache only know
+        whole tables.
+    """
+    if where:
+        return exact_count(connection, table, where), "exact"
+    if strategy == "cached":
+        total = row_count_cache.get(engine, table)
+        if total is not None:
+            return total, "cached"
+        strategy = "estimate"
+    if strategy == "estimate":
+        total = estimate_count(connection, table)
+        if total is not None:
+            return total, "estimate"
+    return exact_count(connection, table), "exact"
+
+
+def count_sql(connection, table, strategy, where=()):
+    """
+    SQL of the statement that produced a count of ``strategy``, or None for
+    cached counts, which ran nothing on ``connection``.
+    """
+    if strategy == "exact":
+        return str(exact_count_query(table, where))
+    if strategy == "estimate":
+        return str(estimate_query(connection))
+    return None
+
+
+async def page_and_total(run, fetch_page, fetch_total=None):
+    """
+    Run the page query and the count side by side, each through
+    ``run(fn)`` on its own pooled connection, so a page waits for the slower
+    of the two rather than for both.
+
+    Args:
+        run: ``run(fn)`` awaiting ``fn(connection)``, e.g. ``run_read``.
+        fetch_total: ``fetch_total(connection)`` returning ``(total,
+            strategy)``, or None to skip counting (``count=none``).
+
+    Returns:
+        tuple: ``((total, strategy), page)``; a skipped count is
+        ``(None, "none")``.
+    """
+
+    async def total():
+        if fetch_total is None:
+            return None, "none"
+        return await run(fetch_total)
+
+    return tuple(await asyncio.gather(total(), run(fetch_page)))
@@ -0,0 +1,304 @@
+"""
+Engine registry for project databases.
+
+Every request against a project database goes through one engine per
+connection string and pool options, so requests share a connection pool
+instead of each building (and leaking) its own. Connection strings are
+normalized first, so spellings of the same database (default driver or port,
+host case, query order) share one pool. Pools are sized by the ``ENGINE_*``
+settings below, which a project can override through its ``pool_settings``;
+callers pass the project's settings so they all land on the same pool.
+
+At most ``ENGINE_REGISTRY_SIZE`` engines are kept and engines unused for
+``ENGINE_IDLE_TIMEOUT`` seconds are dropped; dropped engines are disposed in
+the background, closing their idle connections. Across all engines a process
+hands out at most ``ENGINE_MAX_CONNECTIONS`` connections at a time.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config as decouple_config
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from src.db.utils.async_engine import create_project_async_engine
+
+ENGINE_POOL_SIZE = decouple_config("ENGINE_POOL_SIZE", 5, cast=int)
+ENGINE_MAX_OVERFLOW = decouple_config("ENGINE_MAX_OVERFLOW", 10, cast=int)
+# Seconds after which pooled connections are replaced; -1 keeps them forever.
+ENGINE_POOL_RECYCLE = decouple_config("ENGINE_POOL_RECYCLE", 1800, cast=int)
+ENGINE_POOL_PRE_PING = decouple_config("ENGINE_POOL_PRE_PING", True, cast=bool)
+ENGINE_REGISTRY_SIZE = decouple_config("ENGINE_REGISTRY_SIZE", 32, cast=int)
+ENGINE_IDLE_TIMEOUT = decouple_config("ENGINE_IDLE_TIMEOUT", 600, cast=int)
+# Connections checked out at once across every engine; 0 means no limit.
+ENGINE_MAX_CONNECTIONS = decouple_config("ENGINE_MAX_CONNECTIONS", 100, cast=int)
+# Seconds a blocking checkout waits for a free connection slot.
+ENGINE_CONNECTION_WAIT = decouple_config("ENGINE_CONNECTION_WAIT", 30, cast=int)
+
+POOL_SETTINGS = ("pool_size", "max_overflow", "pool_recycle", "pool_pre_ping")
+DEFAULT_PORTS = {"postgresql": 5432, "mysql": 3306, "mariadb": 3306}
+
+
+class ConnectionLimitReached(Exception):
+    """Raised when the process already holds ``ENGINE_MAX_CONNECTIONS``."""
+
+
+def normalize_url(db_url):
+    """
+    Canonical form of a connection string: explicit driver and port, lower
+    case host and sorted query parameters.
+    """
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    return url.set(
+        drivername=f"{backend}+{url.get_driver_name()}",
+        host=url.host.lower() if url.host else url.host,
+        port=url.port or (DEFAULT_PORTS.get(backend) if url.host else None),
+        query=dict(sorted(url.query.items())),
+    ).render_as_string(hide_password=False)
+
+
+def registry_key(db_url, options):
+    return normalize_url(db_url), tuple(sorted(options.items()))
+
+
+def pool_options(pool_settings=None):
+    """The default pool options overridden by a project's ``pool_settings``."""
+    options = {
+        "pool_size": ENGINE_POOL_SIZE,
+        "max_overflow": ENGINE_MAX_OVERFLOW,
+        "pool_recycle": ENGINE_POOL_RECYCLE,
+        "pool_pre_ping": ENGINE_POOL_PRE_PING,
+    }
+    options.update(
+        (name, value)
+        for name, value in (pool_settings or {}).items()
+        if name in POOL_SETTINGS and value is not None
+    )
+    return options
+
+
+class ConnectionLimiter:
+    """
+    Process-wide cap on checked-out connections, enforced from pool
+    checkout/checkin events.
+
+    Checkouts from the event loop (async engines) fail at once when the cap
+    is reached rather than block the loop; other threads wait up to
+    ``wait`` seconds for a slot.
+    """
+
+    def __init__(self, limit=ENGINE_MAX_CONNECTIONS, wait=ENGINE_CONNECTION_WAIT):
+        self.limit = limit
+        self.wait = wait
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        if self.limit <= 0:
+            return False
+        try:
+            asyncio.get_running_loop()
+            timeout = 0
+        except RuntimeError:
+            timeout = self.wait
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.in_use < self.limit, timeout):
+                raise ConnectionLimitReached(
+                    f"Connection limit of {self.limit} reached, try again later."
+                )
+            self.in_use += 1
+        return True
+
+    def release(self):
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+
+    def watch(self, engine):
+        """Count the checkouts of ``engine``'s pool against the limit."""
+
+        @event.listens_for(engine.pool, "checkout")
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            # Checkouts that fail after this point are checked in again, so
+            # only release slots that were actually taken.
+            if self.acquire():
+                connection_record.info["limited"] = True
+
+        @event.listens_for(engine.pool, "checkin")
+        def checkin(dbapi_connection, connection_record):
+            if connection_record.info.pop("limited", False):
+                self.release()
+
+
+connection_limiter = ConnectionLimiter()
+
+
+def pool_stats(pool):
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[name] = method()
+    return stats
+
+
+class EngineEntry:
+    """The engines of one connection string, sharing the same pool options."""
+
+    def __init__(self, db_url, options, limiter=connection_limiter):
+        self.db_url = db_url
+        self.options = options
+        self.limiter = limiter
+        self.engine = create_engine(db_url, **options)
+        limiter.watch(self.engine)
+        self.async_engine = None
+        self.async_loaded = False
+        # The loop the async engine's connections belong to; they can only
+        # be closed from there.
+        self.loop = None
+        self.last_used = time.monotonic()
+
+    def get_async(self):
+        if not self.async_loaded:
+            self.async_engine = create_project_async_engine(self.db_url, self.options)
+            self.async_loaded = True
+            if self.async_engine is not None:
+                self.limiter.watch(self.async_engine.sync_engine)
+                self.loop = asyncio.get_running_loop()
+        return self.async_engine
+
+    def in_use(self):
+        engines = [self.engine]
+        if self.async_engine is not None:
+            engines.append(self.async_engine.sync_engine)
+        return sum(getattr(engine.pool, "checkedout", lambda: 0)() for engine in engines)
+
+    def dispose(self, executor):
+        """Dispose the engines without blocking the caller."""
+        executor.submit(self.engine.dispose)
+        if self.async_engine is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.loop.create_task(self.async_engine.dispose())
+        elif not self.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.async_engine.dispose(), self.loop)
+
+    def stats(self):
+        stats = {
+            "url": make_url(self.db_url).render_as_string(hide_password=True),
+            "idle_seconds": round(time.monotonic() - self.last_used, 3),
+            "pool_settings": self.options,
+            "sync": pool_stats(self.engine.pool),
+        }
+        if self.async_engine is not None:
+            stats["async"] = pool_stats(self.async_engine.sync_engine.pool)
+        return stats
+
+
+class EngineRegistry:
+    """
+    Engine entries keyed by normalized connection string and pool options,
+    in LRU order.
+    """
+
+    def __init__(
+        self,
+        max_engines=ENGINE_REGISTRY_SIZE,
+        idle_timeout=ENGINE_IDLE_TIMEOUT,
+        limiter=connection_limiter,
+    ):
+        self.max_engines = max_engines
+        self.idle_timeout = idle_timeout
+        self.limiter = limiter
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.disposed = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dispose")
+
+    def _evict(self, now):
+        """Pop the entries over the size bound or idle for too long."""
+        stale = []
+        while len(self.entries) > self.max_engines:
+            stale.append(self.entries.popitem(last=False)[1])
+        if self.idle_timeout > 0:
+            for key, entry in list(self.entries.items()):
+                if now - entry.last_used > self.idle_timeout and not entry.in_use():
+                    stale.append(self.entries.pop(key))
+        return stale
+
+    def _dispose(self, stale):
+        for entry in stale:
+            entry.dispose(self.executor)
+        self.disposed += len(stale)
+
+    def entry(self, db_url, pool_settings=None):
+        """
+        Return the entry of ``db_url`` with ``pool_settings``, creating it if
+        needed.
+        """
+        options = pool_options(pool_settings)
+        key = registry_key(db_url, options)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = EngineEntry(key[0], options, self.limiter)
+            entry.last_used = now
+            self.entries.move_to_end(key)
+            stale = self._evict(now)
+        self._dispose(stale)
+        return entry
+
+    def get(self, db_url, pool_settings=None):
+        return self.entry(db_url, pool_settings).engine
+
+    def get_async(self, db_url, pool_settings=None):
+        """
+        Returns:
+            AsyncEngine: The async engine of ``db_url``, or None when its
+            dialect has no async driver. Must be called from the event loop.
+        """
+        return self.entry(db_url, pool_settings).get_async()
+
+    def dispose(self, db_url=None):
+        """Dispose and forget the engines of ``db_url``, or all of them."""
+        with self.lock:
+            if db_url is None:
+                stale = list(self.entries.values())
+                self.entries.clear()
+            else:
+                url = normalize_url(db_url)
+                stale = [
+                    self.entries.pop(key) for key in list(self.entries) if key[0] == url
+                ]
+        self._dispose(stale)
+
+    def stats(self):
+        with self.lock:
+            entries = list(self.entries.values())
+        return {
+            "engines": len(entries),
+            "max_engines": self.max_engines,
+            "idle_timeout": self.idle_timeout,
+            "disposed": self.disposed,
+            "connections_in_use": self.limiter.in_use,
+            "max_connections": self.limiter.limit,
+            "pools": [entry.stats() for entry in entries],
+        }
+
+
+engine_registry = EngineRegistry()
+
+
+def get_engine(db_url, pool_settings=None):
+    """The shared engine of a project's connection string."""
+    return engine_registry.get(db_url, pool_settings)
+
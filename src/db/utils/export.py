@@ -0,0 +1,109 @@
+"""
+Streaming table export.
+
+Rows are read ``EXPORT_BATCH_SIZE`` at a time and each batch is encoded and
+handed to the response before the next one is fetched, so exporting a table
+holds one batch in memory whatever the table's size.
+"""
+import csv
+import io
+import json
+
+from decouple import config as decouple_config
+from sqlalchemy import select
+
+from src.db.utils.formats import cut_short_on_error, json_default
+from src.db.utils.pagination import keyset_key, seek_condition
+
+EXPORT_BATCH_SIZE = decouple_config("EXPORT_BATCH_SIZE", 10000, cast=int)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def project_columns(table, column_names=None):
+    """
+    Resolve a column projection against ``table``.
+
+    Raises:
+        ValueError: If a requested column does not exist.
+    """
+    if not column_names:
+        return list(table.columns)
+    unknown = [name for name in column_names if name not in table.c]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return [table.c[name] for name in column_names]
+
+
+def export_batches(engine, table, columns, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield the rows of ``table`` as lists of mappings of at most ``batch_size``.
+
+    Drivers with server-side cursors stream a single SELECT. Others buffer
+    whole results client-side, so the table is read in keyset pages on its
+    primary key or a unique index instead. Only a keyless table on such a
+    driver is read in one go.
+    """
+    if engine.dialect.supports_server_side_cursors or keyset_key(table) is None:
+        with engine.connect() as connection:
+            result = connection.execute(
+                select(*columns), execution_options={"yield_per": batch_size}
+            )
+            for partition in result.mappings().partitions():
+                yield partition
+        return
+
+    key = keyset_key(table)
+    extra_key = [column for column in key if column not in columns]
+    query = select(*columns, *extra_key).order_by(*key)
+    page = query.limit(batch_size)
+    with engine.connect() as connection:
+        while True:
+            rows = connection.execute(page).mappings().all()
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+            page = query.where(
+                seek_condition(
+                    [(column, False) for column in key],
+                    [last[column.name] for column in key],
+                    "next",
+                )
+            ).limit(batch_size)
+
+
+def encode_ndjson(batches, columns):
+    names = [column.name for column in columns]
+    for rows in batches:
+        yield "".join(
+            json.dumps({name: row[name] for name in names}, default=json_default) + "\n"
+            for row in rows
+        ).encode()
+
+
+def encode_csv(batches, columns):
+    names = [column.name for column in columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows([row[name] for name in names] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_table(engine, table, columns, export_format, batch_size=EXPORT_BATCH_SIZE):
+    """Stream ``table`` as chunks of ``export_format`` encoded bytes."""
+    encode = encode_csv if export_format == "csv" else encode_ndjson
+    yield from cut_short_on_error(
+        encode(export_batches(engine, table, columns, batch_size), columns),
+        f"export of {table.fullname}",
+    )
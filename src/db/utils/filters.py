@@ -0,0 +1,114 @@
+"""
+Filter and sort query parameters for table pages.
+
+Filters are written ``column:operator[:value]`` and sorts ``column`` or
+``-column`` (descending), e.g.::
+
+    ?filter=age:gte:18&filter=status:in:active,trial&filter=deleted_at:is_null
+    &sort=-created_at&sort=id
+
+Both are validated against the table's columns and compiled into SQLAlchemy
+expressions, so values only ever reach the database as bound parameters.
+Values are converted to the column's Python type first, so ``age:gte:18``
+compares numbers rather than strings.
+"""
+import datetime
+import decimal
+import uuid
+
+from sqlalchemy import Boolean
+
+
+class InvalidFilter(ValueError):
+    """Raised for filters or sorts that don't match the table."""
+
+
+FILTER_OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "in": lambda column, values: column.in_(values),
+    "like": lambda column, value: column.like(value),
+    "is_null": lambda column, _: column.is_(None),
+    "not_null": lambda column, _: column.is_not(None),
+}
+# Operators that take no value.
+NULL_OPERATORS = ("is_null", "not_null")
+TRUE_VALUES = ("true", "t", "1", "yes")
+FALSE_VALUES = ("false", "f", "0", "no")
+
+
+def get_column(table, name):
+    if name not in table.c:
+        raise InvalidFilter(f"Unknown column: {name}")
+    return table.c[name]
+
+
+def coerce_value(column, raw):
+    """
+    Convert a query-string value to ``column``'s Python type. Columns whose
+    type has no known Python equivalent keep the string.
+    """
+    if isinstance(column.type, Boolean):
+        if raw.lower() in TRUE_VALUES:
+            return True
+        if raw.lower() in FALSE_VALUES:
+            return False
+        raise InvalidFilter(f"Invalid boolean for {column.name}: {raw}")
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return raw
+    try:
+        if python_type is datetime.datetime:
+            return datetime.datetime.fromisoformat(raw)
+        if python_type is datetime.date:
+            return datetime.date.fromisoformat(raw)
+        if python_type is datetime.time:
+            return datetime.time.fromisoformat(raw)
+        if python_type in (int, float, decimal.Decimal, uuid.UUID):
+            return python_type(raw)
+    except (ValueError, decimal.InvalidOperation) as e:
+        raise InvalidFilter(f"Invalid value for {column.name}: {raw}") from e
+    return raw
+
+
+def parse_filter(table, spec):
+    """Compile one ``column:operator[:value]`` filter into a WHERE clause."""
+    name, _, rest = spec.partition(":")
+    operator, _, raw = rest.partition(":")
+    column = get_column(table, name)
+    if operator not in FILTER_OPERATORS:
+        raise InvalidFilter(
+            f"Unknown filter operator: {operator}. "
+            f"Expected one of {', '.join(FILTER_OPERATORS)}"
+        )
+    if operator in NULL_OPERATORS:
+        value = None
+    elif operator == "in":
+        value = [coerce_value(column, item) for item in raw.split(",")]
+    elif operator == "like":
+        value = raw
+    else:
+        value = coerce_value(column, raw)
+    return FILTER_OPERATORS[operator](column, value)
+
+
+def parse_filters(table, specs):
+    return [parse_filter(table, spec) for spec in specs or []]
+
+
+def parse_sort(table, specs):
+    """
+    Parse ``sort`` parameters (each may hold several comma-separated
+    columns) into ``(column, descending)`` pairs.
+    """
+    sort = []
+    for spec in specs or []:
+        for name in filter(None, (part.strip() for part in spec.split(","))):
+            descending = name.startswith("-")
+            sort.append((get_column(table, name.lstrip("-")), descending))
+    return sort
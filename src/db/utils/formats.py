@@ -0,0 +1,212 @@
+"""
+Result formats for the data endpoints.
+
+``records`` is the original list of row objects. The columnar formats avoid
+repeating every column name in every row:
+
+- ``rows``: ``{"columns": [...], "rows": [[...], ...]}``
+- ``columns``: ``{"data": {"column": [...], ...}}``
+- ``arrow``: an Arrow IPC stream, one record batch per fetched batch of rows,
+  sent as each batch is written. Needs the optional ``pyarrow`` package.
+
+The JSON formats are encoded with ``json.dumps`` directly rather than through
+FastAPI's per-value ``jsonable_encoder``, which dominates the cost of
+serializing wide results.
+"""
+import base64
+import datetime
+import decimal
+import io
+import json
+import logging
+import uuid
+from itertools import batched
+
+from fastapi import HTTPException, status
+from starlette.responses import Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+RESULT_FORMATS = ("records", "rows", "columns", "arrow")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# Rows per Arrow record batch / JSON conversion step.
+FORMAT_BATCH_SIZE = 10000
+
+
+def negotiate_format(requested, accept=None):
+    """
+    An explicit ``format`` wins; otherwise Arrow is picked for clients that
+    ``Accept`` it and records for everyone else.
+    """
+    if requested:
+        return requested
+    if accept and ARROW_MEDIA_TYPE in accept:
+        return "arrow"
+    return "records"
+
+
+def cut_short_on_error(chunks, description):
+    """
+    Yield the ``chunks`` of a streamed response body, logging an error that
+    interrupts them before re-raising it. Headers are already sent by then;
+    all that is left is to cut the body short.
+    """
+    try:
+        yield from chunks
+    except Exception:
+        logger.exception("Error streaming %s", description)
+        raise
+
+
+def json_default(value):
+    """Encode the values ``json`` can't, the way ``jsonable_encoder`` does."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, memoryview)):
+        return base64.b64encode(bytes(value)).decode()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return str(value)
+
+
+def columnar_payload(keys, rows, result_format, batch_size=FORMAT_BATCH_SIZE):
+    """
+    Lay out ``rows`` (tuples in ``keys`` order) in a columnar JSON format.
+    """
+    if result_format == "rows":
+        return {"columns": list(keys), "rows": [list(row) for row in rows]}
+    data = {key: [] for key in keys}
+    columns = list(data.values())
+    for batch in batched(rows, batch_size):
+        for position, values in enumerate(zip(*batch)):
+            columns[position].extend(values)
+    return {"data": data}
+
+
+def json_response(payload):
+    return Response(
+        content=json.dumps(payload, default=json_default, separators=(",", ":")),
+        media_type="application/json",
+    )
+
+
+def arrow_type(pa, sql_type):
+    """
+    The Arrow type of a SQLAlchemy column type, or None when it has no
+    fixed Arrow equivalent and has to be inferred from the values.
+    """
+    if sql_type is None:
+        return None
+    try:
+        python_type = sql_type.python_type
+    except NotImplementedError:
+        return None
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is decimal.Decimal:
+        precision = getattr(sql_type, "precision", None)
+        if precision and precision <= 38:
+            return pa.decimal128(precision, getattr(sql_type, "scale", None) or 0)
+        return None
+    if python_type is str:
+        return pa.string()
+    if python_type is bytes:
+        return pa.binary()
+    if python_type is datetime.datetime:
+        return pa.timestamp("us", tz="UTC" if getattr(sql_type, "timezone", False) else None)
+    if python_type is datetime.date:
+        return pa.date32()
+    if python_type is datetime.time:
+        return pa.time64("us")
+    if python_type is datetime.timedelta:
+        return pa.duration("us")
+    return None
+
+
+def arrow_schema(pa, keys, types, columns, metadata=None):
+    """
+    Schema of an Arrow stream: each column's type comes from its SQLAlchemy
+    type in ``types`` and, where there is none, from its values in the first
+    batch (``columns``).
+    """
+    fields = []
+    for position, key in enumerate(keys):
+        field_type = arrow_type(pa, types[position]) if types else None
+        if field_type is None:
+            field_type = pa.array(list(columns[position])).type if columns else pa.null()
+        fields.append(pa.field(key, field_type))
+    return pa.schema(
+        fields, metadata={key: str(value) for key, value in (metadata or {}).items()}
+    )
+
+
+def drain(sink):
+    """Take the bytes written to ``sink`` so far."""
+    chunk = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return chunk
+
+
+def arrow_ipc(keys, batches, metadata=None, types=None):
+    """
+    Encode batches of row tuples as an Arrow IPC stream, sending each record
+    batch as soon as it is written. ``types`` are the SQLAlchemy types of the
+    columns, in ``keys`` order; ``metadata`` is attached to the schema.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="Arrow output requires the pyarrow package on the server.",
+        )
+
+    def stream():
+        sink = io.BytesIO()
+        writer = None
+        for rows in batches:
+            columns = list(zip(*rows)) if rows else [[] for _ in keys]
+            if writer is None:
+                schema = arrow_schema(pa, keys, types, columns, metadata)
+                writer = pa.ipc.new_stream(sink, schema)
+            writer.write_batch(
+                pa.RecordBatch.from_arrays(
+                    [
+                        pa.array(list(values), type=field.type)
+                        for values, field in zip(columns, schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            yield drain(sink)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, arrow_schema(pa, keys, types, None, metadata))
+        writer.close()
+        yield drain(sink)
+
+    return StreamingResponse(stream(), media_type=ARROW_MEDIA_TYPE)
+
+
+def format_result(keys, rows, result_format, meta, types=None):
+    """
+    Build the response for ``rows`` (tuples in ``keys`` order) plus the
+    endpoint's ``meta`` fields (totals, cursors, timings).
+
+    ``records`` returns a plain dict for FastAPI to encode as before; Arrow
+    carries ``meta`` in the stream's schema metadata and takes its column
+    types from ``types`` (SQLAlchemy types in ``keys`` order) when known.
+    """
+    if result_format == "arrow":
+        return arrow_ipc(keys, batched(rows, FORMAT_BATCH_SIZE), meta, types)
+    if result_format == "records":
+        return {"data": [dict(zip(keys, row)) for row in rows], **meta}
+    return json_response({**columnar_payload(keys, rows, result_format), **meta})
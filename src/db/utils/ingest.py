@@ -0,0 +1,763 @@
+"""
+Set-based metadata ingestion.
+
+Schemas are read from the source database with a single query, then the
+tables and columns of each schema with one more, and everything is written to
+the metadata database with bulk inserts that skip rows which already exist. A
+seed therefore costs a few round trips per schema instead of several per
+schema, table and column.
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from itertools import batched, groupby
+from operator import attrgetter
+
+from decouple import config as decouple_config
+from sqlalchemy import and_, bindparam, func, inspect, select, text, tuple_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# "bulk" uses the set-based writer below, "row" keeps the original
+# one-object-at-a-time seeders.
+SEED_MODE = decouple_config("SEED_MODE", "bulk")
+SEED_BATCH_SIZE = decouple_config("SEED_BATCH_SIZE", 5000, cast=int)
+# Number of schemas introspected concurrently by seed_catalog.
+SEED_PARALLELISM = decouple_config("SEED_PARALLELISM", 4, cast=int)
+
+# Typed column attributes captured at seed time, stored on ColumnMetadata.
+COLUMN_DETAILS = (
+    "data_type",
+    "is_nullable",
+    "ordinal_position",
+    "column_default",
+    "is_primary_key",
+    "indexes",
+    "foreign_keys",
+)
+# One catalog row per column, or per table without columns (column fields None).
+RelationRow = namedtuple(
+    "RelationRow",
+    ("table_schema", "table_name", "column_name") + COLUMN_DETAILS,
+    defaults=(None,) * len(COLUMN_DETAILS),
+)
+
+
+class SeedFailed(Exception):
+    """Raised by ``seed_catalog`` when some schemas could not be seeded."""
+
+
+def empty_column_keys():
+    """Key membership of a column that is not part of any key or index."""
+    return {"is_primary_key": False, "indexes": [], "foreign_keys": []}
+
+
+NO_KEYS = empty_column_keys()
+
+
+def table_key_maps():
+    """``{table_name: {column_name: keys}}`` filled in by the readers."""
+    return defaultdict(lambda: defaultdict(empty_column_keys))
+
+
+class TableKeys:
+    """
+    Walks a reader's ``column_keys`` stream alongside its catalog rows, which
+    come in the same table order, so only the keys of the current batch of
+    tables are held in memory.
+    """
+
+    def __init__(self, groups):
+        self.groups = iter(groups)
+        self.pending = next(self.groups, None)
+
+    def of(self, table_name):
+        """
+        Returns:
+            dict: ``{column_name: keys}`` of ``table_name``, empty for tables
+            without keys.
+        """
+        if self.pending is None or self.pending[0] != table_name:
+            return {}
+        keys = self.pending[1]
+        self.pending = next(self.groups, None)
+        return keys
+
+
+def column_details(row):
+    """Return the ``COLUMN_DETAILS`` of a relation row as a dict."""
+    return {field: getattr(row, field) for field in COLUMN_DETAILS}
+
+
+def table_fingerprint(columns):
+    """Fingerprint a table from its columns (dicts of ``column_name`` and
+    ``COLUMN_DETAILS``) in ordinal order."""
+    described = json.dumps(columns, sort_keys=True, default=str)
+    return hashlib.sha256(described.encode()).hexdigest()
+
+
+def schema_fingerprint(table_fingerprints):
+    """Fingerprint a schema from ``{table_name: table_fingerprint}``."""
+    digest = hashlib.sha256()
+    for table_name in sorted(table_fingerprints):
+        digest.update(f"{table_name}\x1f{table_fingerprints[table_name]}\x1e".encode())
+    return digest.hexdigest()
+
+
+def set_fingerprints(db, model, fingerprints):
+    """Store ``fingerprints`` ({row_id: fingerprint}) with one executemany."""
+    if not fingerprints:
+        return
+    table = model.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(fingerprint=bindparam("row_fingerprint")),
+        [
+            {"row_id": row_id, "row_fingerprint": fingerprint}
+            for row_id, fingerprint in fingerprints.items()
+        ],
+    )
+
+
+def insert_ignore(db, model, rows, batch_size=SEED_BATCH_SIZE):
+    """
+    Bulk insert ``rows`` into ``model``'s table, silently skipping rows that
+    violate a unique constraint.
+
+    Uses ``ON CONFLICT DO NOTHING`` on PostgreSQL/SQLite and ``INSERT IGNORE``
+    on MySQL/MariaDB. Rows are sent in executemany batches of ``batch_size``.
+
+    Returns:
+        int: The number of rows sent to the database.
+    """
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = pg_insert(table).on_conflict_do_nothing()
+    elif dialect in ("mysql", "mariadb"):
+        statement = mysql_insert(table).prefix_with("IGNORE")
+    elif dialect == "sqlite":
+        statement = sqlite_insert(table).on_conflict_do_nothing()
+    else:
+        raise ValueError(f"Bulk ingestion is not supported on {dialect}")
+
+    sent = 0
+    for batch in batched(rows, batch_size):
+        db.execute(statement, list(batch))
+        sent += len(batch)
+    return sent
+
+
+class MetadataWriter:
+    """
+    Writes one catalog level at a time into ``bus_metadata``,
+    ``table_metadata`` and ``column_metadata`` for a single project.
+
+    Every ``write_*`` call commits its own transaction and returns the ids of
+    the stored rows so the next level can reference them.
+    """
+
+    def __init__(self, db, project_id):
+        self.db = db
+        self.project_id = project_id
+
+    def write_schemas(self, schema_names):
+        """
+        Returns:
+            dict: ``{schema_name: schema_id}`` for every schema of the project.
+        """
+        from src.schema import SchemaMetadata
+
+        insert_ignore(
+            self.db,
+            SchemaMetadata,
+            (
+                {"schema_name": schema_name, "project_id": self.project_id}
+                for schema_name in schema_names
+            ),
+        )
+        self.db.commit()
+        stored = self.db.execute(
+            select(SchemaMetadata.schema_name, SchemaMetadata.id).where(
+                SchemaMetadata.project_id == self.project_id
+            )
+        )
+        return dict(stored.all())
+
+    def write_relations(
+        self, schema_ids, relations, batch_size=SEED_BATCH_SIZE, progress=None
+    ):
+        """
+        Write tables and their columns from a single stream of catalog rows.
+
+        Rows are consumed in batches of ``batch_size``: the batch's new tables
+        are inserted and resolved to ids first, then its columns and the
+        fingerprints of the tables it completes, and the batch is committed.
+        Memory use is bounded by the batch size plus one id and fingerprint
+        per table. The schemas' fingerprints are stored last, so a re-sync
+        only diffs what changed since the seed.
+
+        Args:
+            schema_ids (dict): ``{schema_name: schema_id}`` from ``write_schemas``.
+            relations: Rows with ``table_schema``, ``table_name`` and
+                ``column_name`` attributes, ordered by table. ``column_name``
+                is ``None`` for tables without columns.
+            progress: Optional ``progress(tables, columns)`` callback, called
+                with each batch's counts before the batch is committed.
+
+        Returns:
+            tuple: ``(tables_written, columns_sent)``.
+        """
+        from src.models import ColumnMetadata
+        from src.schema import SchemaMetadata, TableMetadata
+
+        table_ids = {}
+        columns_sent = 0
+        table_fingerprints = defaultdict(dict)
+        # The table being streamed and its columns so far; tables arrive in
+        # order, so a table is complete once the next one starts.
+        current, current_columns = None, []
+
+        def fingerprint_current():
+            if current in table_ids:
+                schema_name, table_name = current
+                table_fingerprints[schema_name][table_name] = table_fingerprint(
+                    current_columns
+                )
+                return {table_ids[current]: table_fingerprints[schema_name][table_name]}
+            return {}
+
+        for batch in batched(relations, batch_size):
+            tables_before = len(table_ids)
+            new_tables = defaultdict(set)
+            for row in batch:
+                key = (row.table_schema, row.table_name)
+                if row.table_schema in schema_ids and key not in table_ids:
+                    new_tables[row.table_schema].add(row.table_name)
+
+            insert_ignore(
+                self.db,
+                TableMetadata,
+                (
+                    {
+                        "table_name": table_name,
+                        "schema_name": schema_name,
+                        "schema_id": schema_ids[schema_name],
+                    }
+                    for schema_name, table_names in new_tables.items()
+                    for table_name in table_names
+                ),
+            )
+            for schema_name, table_names in new_tables.items():
+                stored = self.db.execute(
+                    select(TableMetadata.table_name, TableMetadata.id).where(
+                        TableMetadata.schema_id == schema_ids[schema_name],
+                        TableMetadata.table_name.in_(table_names),
+                    )
+                )
+                for table_name, table_id in stored:
+                    table_ids[(schema_name, table_name)] = table_id
+
+            batch_columns = insert_ignore(
+                self.db,
+                ColumnMetadata,
+                (
+                    {
+                        "column_name": row.column_name,
+                        "table_name": row.table_name,
+                        "schema_name": row.table_schema,
+                        "table_id": table_ids[(row.table_schema, row.table_name)],
+                        "schema_id": schema_ids[row.table_schema],
+                        **column_details(row),
+                    }
+                    for row in batch
+                    if row.column_name is not None
+                    and (row.table_schema, row.table_name) in table_ids
+                ),
+            )
+            columns_sent += batch_columns
+
+            completed = {}
+            for row in batch:
+                key = (row.table_schema, row.table_name)
+                if key != current:
+                    completed.update(fingerprint_current())
+                    current, current_columns = key, []
+                if row.column_name is not None:
+                    current_columns.append(
+                        {"column_name": row.column_name, **column_details(row)}
+                    )
+            set_fingerprints(self.db, TableMetadata, completed)
+            if progress is not None:
+                progress(len(table_ids) - tables_before, batch_columns)
+            self.db.commit()
+
+        set_fingerprints(self.db, TableMetadata, fingerprint_current())
+        set_fingerprints(
+            self.db,
+            SchemaMetadata,
+            {
+                schema_id: schema_fingerprint(table_fingerprints[schema_name])
+                for schema_name, schema_id in schema_ids.items()
+            },
+        )
+        self.db.commit()
+        return len(table_ids), columns_sent
+
+
+class InformationSchemaReader:
+    """
+    Reads the catalog through the standard ``information_schema`` views.
+
+    Every catalog reader exposes ``schema_names(source_db)`` and
+    ``relations(source_db, schema_name)``; the latter returns one
+    ``RelationRow``-shaped row per column (or per table without columns)
+    ordered by table. Key membership is streamed alongside, one batch of
+    tables at a time.
+    """
+
+    def __init__(self, schema_filter, batch_size=SEED_BATCH_SIZE):
+        """
+        Args:
+            schema_filter: SQL expression on ``SchemaInfo`` selecting the
+                schemas to read.
+            batch_size (int): Rows fetched from the source per round trip.
+        """
+        self.schema_filter = schema_filter
+        self.batch_size = batch_size
+
+    def schema_names(self, source_db):
+        from src.models import SchemaInfo
+
+        return (
+            source_db.execute(select(SchemaInfo.schema_name).where(self.schema_filter))
+            .scalars()
+            .all()
+        )
+
+    def catalog_size(self, source_db, schema_names):
+        """
+        Returns:
+            tuple: ``(tables, columns)`` in the given schemas.
+        """
+        from src.models import TableInfo, ColumnInfo
+
+        tables = source_db.execute(
+            select(func.count()).where(TableInfo.table_schema.in_(schema_names))
+        ).scalar_one()
+        columns = source_db.execute(
+            select(func.count()).where(ColumnInfo.table_schema.in_(schema_names))
+        ).scalar_one()
+        return tables, columns
+
+    def table_names(self, source_db, schema_name):
+        """Stream the table names of a schema in table order."""
+        from src.models import TableInfo
+
+        return source_db.execute(
+            select(TableInfo.table_name)
+            .where(TableInfo.table_schema == schema_name)
+            .order_by(TableInfo.table_name),
+            execution_options={"yield_per": self.batch_size},
+        ).scalars()
+
+    def column_keys(self, source_db, schema_name, table_names):
+        """
+        Stream primary key, index and foreign key membership of the columns
+        of ``table_names``. Tables are reflected ``batch_size`` at a time with
+        SQLAlchemy's multi-table reflection, which issues a fixed number of
+        catalog queries per batch on PostgreSQL.
+
+        Yields:
+            tuple: ``(table_name, {column_name: {"is_primary_key": bool,
+            "indexes": [...], "foreign_keys": [...]}})`` for the tables with
+            keys, in the order of ``table_names``.
+        """
+        for table_batch in batched(table_names, self.batch_size):
+            # A fresh inspector per batch, so its reflection cache doesn't grow.
+            inspector = inspect(source_db.connection())
+            options = {"schema": schema_name, "filter_names": list(table_batch)}
+            keys = table_key_maps()
+            for (_, table_name), primary_key in inspector.get_multi_pk_constraint(
+                **options
+            ).items():
+                for position, column_name in enumerate(
+                    primary_key["constrained_columns"], start=1
+                ):
+                    keys[table_name][column_name]["is_primary_key"] = True
+                    keys[table_name][column_name]["indexes"].append(
+                        {
+                            "name": primary_key["name"],
+                            "unique": True,
+                            "primary": True,
+                            "position": position,
+                        }
+                    )
+            for (_, table_name), indexes in inspector.get_multi_indexes(
+                **options
+            ).items():
+                for index in indexes:
+                    for position, column_name in enumerate(
+                        index["column_names"], start=1
+                    ):
+                        if column_name is None:
+                            # expression index
+                            continue
+                        keys[table_name][column_name]["indexes"].append(
+                            {
+                                "name": index["name"],
+                                "unique": bool(index["unique"]),
+                                "primary": False,
+                                "position": position,
+                            }
+                        )
+            for (_, table_name), foreign_keys in inspector.get_multi_foreign_keys(
+                **options
+            ).items():
+                for foreign_key in foreign_keys:
+                    for column_name, referred_column in zip(
+                        foreign_key["constrained_columns"],
+                        foreign_key["referred_columns"],
+                    ):
+                        keys[table_name][column_name]["foreign_keys"].append(
+                            {
+                                "name": foreign_key["name"],
+                                "schema": foreign_key["referred_schema"] or schema_name,
+                                "table": foreign_key["referred_table"],
+                                "column": referred_column,
+                            }
+                        )
+            for table_name in table_batch:
+                if table_name in keys:
+                    yield table_name, dict(keys[table_name])
+
+    def relations(self, source_db, schema_name):
+        from src.models import TableInfo, ColumnInfo
+
+        keys = TableKeys(
+            self.column_keys(
+                source_db, schema_name, self.table_names(source_db, schema_name)
+            )
+        )
+        query = (
+            select(
+                TableInfo.table_schema,
+                TableInfo.table_name,
+                ColumnInfo.column_name,
+                ColumnInfo.data_type,
+                ColumnInfo.is_nullable,
+                ColumnInfo.ordinal_position,
+                ColumnInfo.column_default,
+            )
+            .outerjoin(
+                ColumnInfo,
+                and_(
+                    ColumnInfo.table_schema == TableInfo.table_schema,
+                    ColumnInfo.table_name == TableInfo.table_name,
+                ),
+            )
+            .where(TableInfo.table_schema == schema_name)
+            .order_by(TableInfo.table_name, ColumnInfo.ordinal_position)
+        )
+        rows = source_db.execute(
+            query, execution_options={"yield_per": self.batch_size}
+        )
+        for table_name, table_rows in groupby(rows, key=attrgetter("table_name")):
+            table_keys = keys.of(table_name)
+            for row in table_rows:
+                yield relation_row(row.table_schema, row, table_keys)
+
+
+def relation_row(table_schema, column, table_keys):
+    """
+    Build a ``RelationRow`` from an ``information_schema.columns`` row and the
+    ``{column_name: keys}`` of its table from a reader's ``column_keys``.
+    """
+    if column.column_name is None:
+        return RelationRow(table_schema, column.table_name, None)
+    keys = table_keys.get(column.column_name, NO_KEYS)
+    return RelationRow(
+        table_schema,
+        column.table_name,
+        column.column_name,
+        data_type=column.data_type,
+        is_nullable=(column.is_nullable or "").upper() == "YES",
+        ordinal_position=column.ordinal_position,
+        column_default=column.column_default,
+        is_primary_key=keys["is_primary_key"],
+        indexes=keys["indexes"],
+        foreign_keys=keys["foreign_keys"],
+    )
+
+
+def stream_schema_columns(
+    source_db, schema_name, batch_size=SEED_BATCH_SIZE, server_side=None
+):
+    """
+    Stream every column of a schema from one ``TABLE_SCHEMA``-filtered scan of
+    ``information_schema.columns``, ordered by table and ordinal position.
+
+    Drivers with server-side cursors fetch ``batch_size`` rows at a time.
+    Others, such as mysql-connector, buffer a whole result client-side, so
+    the scan is paged by ``(table_name, ordinal_position)`` keyset instead.
+    Either way at most ``batch_size`` rows are held at once. Callers that
+    run other queries on the session between rows pass ``server_side=False``
+    to get the paged scan, which keeps no result open.
+    """
+    from src.models import ColumnInfo
+
+    query = (
+        select(
+            ColumnInfo.table_name,
+            ColumnInfo.column_name,
+            ColumnInfo.data_type,
+            ColumnInfo.is_nullable,
+            ColumnInfo.ordinal_position,
+            ColumnInfo.column_default,
+        )
+        .where(ColumnInfo.table_schema == schema_name)
+        .order_by(ColumnInfo.table_name, ColumnInfo.ordinal_position)
+    )
+    if server_side is None:
+        server_side = source_db.get_bind().dialect.supports_server_side_cursors
+    if server_side:
+        yield from source_db.execute(
+            query, execution_options={"yield_per": batch_size}
+        )
+        return
+
+    page = query.limit(batch_size)
+    while True:
+        rows = source_db.execute(page).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        page = query.limit(batch_size).where(
+            tuple_(ColumnInfo.table_name, ColumnInfo.ordinal_position)
+            > tuple_(last.table_name, last.ordinal_position)
+        )
+
+
+def read_schema_columns(source_db, schema_name):
+    """
+    Read every column of a schema and group it by table in memory.
+
+    Returns:
+        dict: ``{table_name: [column_row, ...]}`` with columns in ordinal order.
+    """
+    columns = stream_schema_columns(source_db, schema_name)
+    return {
+        table_name: list(table_columns)
+        for table_name, table_columns in groupby(columns, key=attrgetter("table_name"))
+    }
+
+
+# MySQL/MariaDB reflect keys table by table; these read them for a batch of
+# tables with one scan each.
+MYSQL_INDEXES_QUERY = text(
+    """
+    SELECT table_name AS table_name,
+           column_name AS column_name,
+           index_name AS index_name,
+           non_unique AS non_unique,
+           seq_in_index AS seq_in_index
+    FROM information_schema.statistics
+    WHERE table_schema = :schema_name
+      AND table_name IN :table_names
+    ORDER BY table_name, index_name, seq_in_index
+    """
+).bindparams(bindparam("table_names", expanding=True))
+MYSQL_FOREIGN_KEYS_QUERY = text(
+    """
+    SELECT table_name AS table_name,
+           column_name AS column_name,
+           constraint_name AS constraint_name,
+           referenced_table_schema AS referenced_table_schema,
+           referenced_table_name AS referenced_table_name,
+           referenced_column_name AS referenced_column_name
+    FROM information_schema.key_column_usage
+    WHERE table_schema = :schema_name
+      AND table_name IN :table_names
+      AND referenced_table_name IS NOT NULL
+    ORDER BY table_name, constraint_name, ordinal_position
+    """
+).bindparams(bindparam("table_names", expanding=True))
+
+
+class GroupedColumnsReader(InformationSchemaReader):
+    """
+    ``information_schema`` reader for MySQL/MariaDB.
+
+    Instead of joining ``tables`` and ``columns`` (or querying columns per
+    table), it reads the schema's table names and then streams all of its
+    columns in one ``TABLE_SCHEMA``-filtered scan. Only the table names and
+    the keys of one batch of tables are held in memory; tables the scan never
+    reaches have no columns.
+    """
+
+    def column_keys(self, source_db, schema_name, table_names):
+        for table_batch in batched(table_names, self.batch_size):
+            params = {"schema_name": schema_name, "table_names": list(table_batch)}
+            keys = table_key_maps()
+            self._read_keys(source_db, params, keys)
+            for table_name in table_batch:
+                if table_name in keys:
+                    yield table_name, dict(keys[table_name])
+
+    def _read_keys(self, source_db, params, keys):
+        for index in source_db.execute(MYSQL_INDEXES_QUERY, params):
+            column_keys = keys[index.table_name][index.column_name]
+            primary = index.index_name == "PRIMARY"
+            column_keys["is_primary_key"] = column_keys["is_primary_key"] or primary
+            column_keys["indexes"].append(
+                {
+                    "name": index.index_name,
+                    "unique": not index.non_unique,
+                    "primary": primary,
+                    "position": index.seq_in_index,
+                }
+            )
+        for foreign_key in source_db.execute(MYSQL_FOREIGN_KEYS_QUERY, params):
+            keys[foreign_key.table_name][foreign_key.column_name][
+                "foreign_keys"
+            ].append(
+                {
+                    "name": foreign_key.constraint_name,
+                    "schema": foreign_key.referenced_table_schema,
+                    "table": foreign_key.referenced_table_name,
+                    "column": foreign_key.referenced_column_name,
+                }
+            )
+
+    def relations(self, source_db, schema_name):
+        table_names = self.table_names(source_db, schema_name).all()
+        keys = TableKeys(self.column_keys(source_db, schema_name, table_names))
+        empty_tables = dict.fromkeys(table_names)
+        # Key batches are read between pages of the scan, so it must not
+        # hold a streaming result open.
+        columns = stream_schema_columns(
+            source_db, schema_name, self.batch_size, server_side=False
+        )
+        for table_name, table_columns in groupby(columns, key=attrgetter("table_name")):
+            if table_name not in empty_tables:
+                continue
+            del empty_tables[table_name]
+            table_keys = keys.of(table_name)
+            for column in table_columns:
+                yield relation_row(schema_name, column, table_keys)
+        for table_name in empty_tables:
+            yield RelationRow(schema_name, table_name, None)
+
+
+def seed_schema(
+    source_engine,
+    metadata_engine,
+    project_id,
+    reader,
+    schema_name,
+    schema_id,
+    job=None,
+):
+    """
+    Seed the tables and columns of one schema on sessions owned by the caller's
+    thread, so several schemas can be ingested concurrently.
+
+    Returns:
+        tuple: ``(schema_name, tables_written, columns_sent)``.
+    """
+    with Session(metadata_engine) as db, Session(source_engine) as source_db:
+        progress = None
+        if job is not None:
+            job.schema_started(db, schema_name)
+            progress = partial(job.batch_written, db, schema_name)
+        writer = MetadataWriter(db, project_id)
+        tables, columns = writer.write_relations(
+            {schema_name: schema_id},
+            reader.relations(source_db, schema_name),
+            progress=progress,
+        )
+        if job is not None:
+            job.schema_finished(db, schema_name)
+        return schema_name, tables, columns
+
+
+def seed_catalog(
+    source_engine,
+    metadata_engine,
+    project_id,
+    reader,
+    parallelism=SEED_PARALLELISM,
+    job=None,
+):
+    """
+    Seed a project's metadata: write every schema with one bulk insert, then
+    fan each schema's tables and columns out to a bounded pool of per-schema
+    workers.
+
+    Every worker opens its own source and metadata sessions, so
+    ``parallelism`` should not exceed either engine's pool capacity
+    (``pool_size + max_overflow``, 15 by default).
+
+    Args:
+        source_engine (Engine): Engine on the project's database.
+        metadata_engine (Engine): Engine on the metadata database.
+        project_id (str): Project the metadata belongs to.
+        reader: Catalog reader for the source dialect, e.g.
+            ``InformationSchemaReader``.
+        parallelism (int): Maximum number of schemas ingested at once.
+        job (SeedJobTracker): Optional tracker recording progress. Schemas
+            its job already completed are skipped, which resumes the job.
+
+    Raises:
+        SeedFailed: After every schema was tried, naming each one that
+            failed with its error; the job records it as its ``error``.
+    """
+    completed = set()
+    with Session(metadata_engine) as db, Session(source_engine) as source_db:
+        schema_names = reader.schema_names(source_db)
+        schema_ids = MetadataWriter(db, project_id).write_schemas(schema_names)
+        if job is not None:
+            completed = job.start(
+                {name: schema_ids[name] for name in schema_names},
+                *reader.catalog_size(source_db, schema_names),
+            )
+
+    errors = {}
+    with ThreadPoolExecutor(
+        max_workers=max(1, parallelism), thread_name_prefix="seed"
+    ) as executor:
+        futures = {
+            executor.submit(
+                seed_schema,
+                source_engine,
+                metadata_engine,
+                project_id,
+                reader,
+                schema_name,
+                schema_ids[schema_name],
+                job,
+            ): schema_name
+            for schema_name in schema_names
+            if schema_name not in completed
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.exception("Seeding schema %s failed", futures[future])
+                if job is not None:
+                    job.schema_failed(futures[future], e)
+                errors[futures[future]] = e
+    if errors:
+        raise SeedFailed(
+            "; ".join(f"{name}: {error}" for name, error in sorted(errors.items()))
+        ) from next(iter(errors.values()))
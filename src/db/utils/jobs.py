@@ -0,0 +1,287 @@
+"""
+Seed job tracking.
+
+A ``SeedJob`` row records how far a project's seed got: totals and done
+counters for schemas, tables and columns, and one ``SeedCheckpoint`` per
+schema. Counters are bumped in the same transaction as the metadata batch they
+describe, so after a crash the job reflects exactly what was stored and a
+resumed run only has to redo the schemas that had not completed.
+
+Re-syncs are tracked as jobs of kind ``resync``. They apply their changes in a
+single transaction, so they have no checkpoints; a finished re-sync stores its
+counters and the tables it changed in ``summary``.
+"""
+from datetime import timedelta
+
+from decouple import config as decouple_config
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from src.db.utils.ingest import insert_ignore
+from src.mixins import utcnow
+
+# A running job that has not reported progress for this long is assumed to
+# have crashed and may be resumed.
+SEED_JOB_STALE_SECONDS = decouple_config("SEED_JOB_STALE_SECONDS", 300, cast=int)
+
+
+def create_seed_job(db, project_id, kind="seed"):
+    """Create a pending seed (or ``resync``) job for a project."""
+    from src.schema import SeedJob
+
+    job = SeedJob(project_id=project_id, kind=kind, status="pending")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def latest_seed_job(db, project_id, kind="seed"):
+    """Return the project's most recent job of ``kind``, or None."""
+    from src.schema import SeedJob
+
+    query = (
+        select(SeedJob)
+        .where(SeedJob.project_id == project_id, SeedJob.kind == kind)
+        .order_by(SeedJob.created_at.desc())
+        .limit(1)
+    )
+    return db.execute(query).scalars().first()
+
+
+def can_resume(job, now=None):
+    """
+    A job can be resumed when it failed, never started, or is running but has
+    stopped reporting progress.
+    """
+    if job.status in ("failed", "pending"):
+        return True
+    if job.status != "running":
+        return False
+    now = now or utcnow()
+    return now - job.updated_at > timedelta(seconds=SEED_JOB_STALE_SECONDS)
+
+
+class SeedJobTracker:
+    """
+    Writes the progress of one ``SeedJob``.
+
+    Methods called from seed workers take the worker's metadata session and
+    leave the commit to the caller, so progress lands atomically with the
+    batch it counts. The others open their own session.
+    """
+
+    def __init__(self, metadata_engine, job_id):
+        self.metadata_engine = metadata_engine
+        self.job_id = job_id
+
+    def _update_job(self, db, **values):
+        from src.schema import SeedJob
+
+        db.execute(
+            update(SeedJob)
+            .where(SeedJob.id == self.job_id)
+            .values(updated_at=utcnow(), **values)
+        )
+
+    def _update_checkpoint(self, db, schema_name, **values):
+        from src.schema import SeedCheckpoint
+
+        db.execute(
+            update(SeedCheckpoint)
+            .where(
+                SeedCheckpoint.job_id == self.job_id,
+                SeedCheckpoint.schema_name == schema_name,
+            )
+            .values(updated_at=utcnow(), **values)
+        )
+
+    def claim(self, now=None):
+        """
+        Atomically mark the job running if ``can_resume`` allows it, keeping
+        the original start time on resume. Seeds may be delivered more than
+        once; only the run that claims the job goes ahead.
+
+        Returns:
+            bool: Whether this run claimed the job.
+        """
+        from src.schema import SeedJob
+
+        now = now or utcnow()
+        stale = now - timedelta(seconds=SEED_JOB_STALE_SECONDS)
+        with Session(self.metadata_engine) as db:
+            result = db.execute(
+                update(SeedJob)
+                .where(
+                    SeedJob.id == self.job_id,
+                    or_(
+                        SeedJob.status.in_(("pending", "failed")),
+                        and_(SeedJob.status == "running", SeedJob.updated_at < stale),
+                    ),
+                )
+                .values(
+                    status="running",
+                    started_at=func.coalesce(SeedJob.started_at, now),
+                    finished_at=None,
+                    error=None,
+                    updated_at=now,
+                )
+            )
+            db.commit()
+        return result.rowcount == 1
+
+    def start(self, schema_ids, tables_total, columns_total):
+        """
+        Record the catalog size and create a checkpoint per schema.
+
+        Returns:
+            set: Names of schemas already completed by an earlier run.
+        """
+        from src.schema import SeedCheckpoint
+
+        with Session(self.metadata_engine) as db:
+            insert_ignore(
+                db,
+                SeedCheckpoint,
+                (
+                    {
+                        "job_id": self.job_id,
+                        "schema_name": schema_name,
+                        "schema_id": schema_id,
+                        "status": "pending",
+                    }
+                    for schema_name, schema_id in schema_ids.items()
+                ),
+            )
+            completed = set(
+                db.execute(
+                    select(SeedCheckpoint.schema_name).where(
+                        SeedCheckpoint.job_id == self.job_id,
+                        SeedCheckpoint.status == "completed",
+                    )
+                ).scalars()
+            )
+            self._update_job(
+                db,
+                schemas_total=len(schema_ids),
+                tables_total=tables_total,
+                columns_total=columns_total,
+            )
+            db.commit()
+        return completed
+
+    def schema_started(self, db, schema_name):
+        """
+        Mark a schema running. Counts left by an interrupted earlier attempt
+        are taken back off the job, since the schema is ingested again.
+        """
+        from src.schema import SeedCheckpoint, SeedJob
+
+        checkpoint = db.execute(
+            select(SeedCheckpoint.tables_done, SeedCheckpoint.columns_done).where(
+                SeedCheckpoint.job_id == self.job_id,
+                SeedCheckpoint.schema_name == schema_name,
+            )
+        ).one()
+        self._update_job(
+            db,
+            tables_done=SeedJob.tables_done - checkpoint.tables_done,
+            columns_done=SeedJob.columns_done - checkpoint.columns_done,
+        )
+        self._update_checkpoint(
+            db, schema_name, status="running", tables_done=0, columns_done=0, error=None
+        )
+        db.commit()
+
+    def batch_written(self, db, schema_name, tables, columns):
+        """Count a written batch of ``tables`` new tables and ``columns`` columns."""
+        from src.schema import SeedCheckpoint, SeedJob
+
+        self._update_job(
+            db,
+            tables_done=SeedJob.tables_done + tables,
+            columns_done=SeedJob.columns_done + columns,
+        )
+        self._update_checkpoint(
+            db,
+            schema_name,
+            tables_done=SeedCheckpoint.tables_done + tables,
+            columns_done=SeedCheckpoint.columns_done + columns,
+        )
+
+    def schema_finished(self, db, schema_name):
+        from src.schema import SeedJob
+
+        self._update_checkpoint(
+            db, schema_name, status="completed", finished_at=utcnow()
+        )
+        self._update_job(db, schemas_done=SeedJob.schemas_done + 1)
+        db.commit()
+
+    def schema_failed(self, schema_name, error):
+        with Session(self.metadata_engine) as db:
+            self._update_checkpoint(db, schema_name, status="failed", error=str(error))
+            db.commit()
+
+    def finish(self, error=None, summary=None):
+        with Session(self.metadata_engine) as db:
+            self._update_job(
+                db,
+                status="failed" if error else "completed",
+                finished_at=utcnow(),
+                error=str(error) if error else None,
+                summary=summary,
+            )
+            db.commit()
+
+
+def run_seed_job(seed, job_id=None):
+    """
+    Run ``seed.insert_metadata`` and record its outcome on the seed job.
+    Without a ``job_id`` the seed runs untracked.
+
+    Returns:
+        bool: False when the job was already claimed by another run.
+    """
+    if job_id is None:
+        seed.insert_metadata()
+        return True
+    tracker = SeedJobTracker(seed.metadata_engine, job_id)
+    if not tracker.claim():
+        print("Seed job already claimed:", job_id)
+        return False
+    try:
+        seed.insert_metadata(job=tracker)
+    except Exception as e:
+        print("Error in seed job:", job_id, e)
+        tracker.finish(error=e)
+        return True
+    tracker.finish()
+    return True
+
+
+def run_resync_job(seed, job_id):
+    """
+    Run ``seed.resync_metadata`` and record its outcome on the re-sync job.
+
+    Returns:
+        bool: False when the job was already claimed by another run.
+    """
+    tracker = SeedJobTracker(seed.metadata_engine, job_id)
+    if not tracker.claim():
+        print("Resync job already claimed:", job_id)
+        return False
+    changed_tables = set()
+    try:
+        counters = seed.resync_metadata(changed_tables.update)
+    except Exception as e:
+        print("Error in resync job:", job_id, e)
+        tracker.finish(error=e)
+        return True
+    tracker.finish(
+        summary={
+            **counters,
+            "changed_tables": [list(table) for table in sorted(changed_tables)],
+        }
+    )
+    return True
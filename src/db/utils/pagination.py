@@ -0,0 +1,180 @@
+"""
+Keyset pagination for table pages.
+
+A page is fetched by seeking past the last row of the previous page on a
+unique key, ``WHERE key > :last ORDER BY key LIMIT n``, so page N costs the
+same index seek as page 1 instead of scanning and discarding N * limit rows
+the way ``OFFSET`` does. Cursors handed to clients are opaque, URL-safe
+encodings of the key values of a page's first or last row; values are
+converted back to their column's Python type when a cursor is decoded, so
+dates, decimals and UUIDs compare as such rather than as strings.
+
+Pages are seeked on an *order*: a list of ``(column, descending)`` pairs made
+of the requested sort followed by the unique key as a tie-breaker.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from sqlalchemy import and_, or_
+
+from src.db.utils.filters import InvalidFilter, coerce_value
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that are malformed or belong to another key."""
+
+
+def keyset_key(table):
+    """
+    Pick the columns to page ``table`` by: its primary key, else the first
+    unique index over non-nullable columns.
+
+    Returns:
+        list: Columns of the key, or None when the table has no usable key
+        and has to be paged with OFFSET.
+    """
+    primary_key = list(table.primary_key.columns)
+    if primary_key:
+        return primary_key
+    for index in sorted(table.indexes, key=lambda index: index.name or ""):
+        columns = list(index.columns)
+        if index.unique and columns and not any(column.nullable for column in columns):
+            return columns
+    return None
+
+
+def keyset_order(table, sort=()):
+    """
+    Combine a requested sort with the table's unique key into a keyset order.
+
+    Args:
+        sort: ``(column, descending)`` pairs.
+
+    Returns:
+        list: ``(column, descending)`` pairs, or None when the table has no
+        usable key or a sort column is nullable (NULLs can't be seeked past).
+    """
+    key = keyset_key(table)
+    if key is None or any(column.nullable for column, _ in sort):
+        return None
+    sorted_names = {column.name for column, _ in sort}
+    return list(sort) + [
+        (column, False) for column in key if column.name not in sorted_names
+    ]
+
+
+def _signature(order):
+    return [column.name for column, _ in order], [bool(desc) for _, desc in order]
+
+
+def _cursor_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(order, row, direction):
+    """Encode the order values of ``row`` as an opaque cursor."""
+    names, descending = _signature(order)
+    payload = {
+        "k": names,
+        "o": descending,
+        "v": [row[name] for name in names],
+        "d": direction,
+    }
+    raw = json.dumps(payload, default=_cursor_default, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, order):
+    """
+    Returns:
+        tuple: ``(values, direction)`` where direction is ``"next"`` or
+        ``"prev"``.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        signature = [payload["k"], payload["o"]]
+        values, direction = payload["v"], payload["d"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if signature != list(_signature(order)) or len(values) != len(order):
+        raise InvalidCursor("Cursor does not belong to this table and sort")
+    if direction not in ("next", "prev"):
+        raise InvalidCursor("Invalid cursor")
+    try:
+        # JSON keeps numbers and booleans; everything else was encoded as a string.
+        values = [
+            coerce_value(column, value) if isinstance(value, str) else value
+            for (column, _), value in zip(order, values)
+        ]
+    except InvalidFilter as e:
+        raise InvalidCursor("Invalid cursor") from e
+    return values, direction
+
+
+def seek_condition(order, values, direction):
+    """
+    ``(k1, k2, ...) > (v1, v2, ...)`` (or ``<`` going back), spelled out as
+    ``k1 > v1 OR (k1 = v1 AND k2 > v2) ...`` so mixed sort directions work
+    and MySQL can use the index too.
+    """
+    clauses = []
+    for position, (column, descending) in enumerate(order):
+        equal = [order[i][0] == values[i] for i in range(position)]
+        forward = (direction == "next") != bool(descending)
+        past = column > values[position] if forward else column < values[position]
+        clauses.append(and_(*equal, past))
+    return or_(*clauses)
+
+
+def order_by(order, direction="next"):
+    """ORDER BY clauses walking ``order`` forwards, or backwards for ``prev``."""
+    return [
+        column.desc() if (direction == "prev") != bool(descending) else column.asc()
+        for column, descending in order
+    ]
+
+
+def keyset_page(query, order, limit, cursor=None):
+    """
+    Restrict ``query`` to one keyset page.
+
+    One row more than ``limit`` is fetched so ``paginate_rows`` can tell
+    whether another page follows.
+
+    Returns:
+        tuple: ``(query, direction, has_cursor)``.
+    """
+    direction = "next"
+    if cursor:
+        values, direction = decode_cursor(cursor, order)
+        query = query.where(seek_condition(order, values, direction))
+    query = query.order_by(*order_by(order, direction))
+    return query.limit(limit + 1), direction, bool(cursor)
+
+
+def paginate_rows(rows, order, limit, direction, has_cursor):
+    """
+    Trim the extra row fetched by ``keyset_page`` and build the cursors.
+
+    Returns:
+        tuple: ``(rows, next_cursor, prev_cursor)``. A cursor is None when
+        there is no page in that direction.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows = rows[::-1]
+        has_next, has_prev = has_cursor, has_more
+    else:
+        has_next, has_prev = has_more, has_cursor
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(order, rows[-1], "next")
+    if rows and has_prev:
+        prev_cursor = encode_cursor(order, rows[0], "prev")
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,228 @@
+"""
+Timeouts and cancellation for ad-hoc queries.
+
+Every statement run by ``/query/execute`` gets an id and is registered with
+the id of the database session running it (``pg_backend_pid()`` or
+``CONNECTION_ID()``), so it can be cancelled from another request with
+``pg_cancel_backend`` or ``KILL QUERY``. Statements are also bounded by a
+timeout applied on their connection: ``statement_timeout`` on PostgreSQL,
+``max_execution_time`` on MySQL (SELECTs only) and ``max_statement_time``
+on MariaDB.
+"""
+import asyncio
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from decouple import config as decouple_config
+from sqlalchemy import text
+
+from src.mixins import utcnow
+
+# Default statement timeout in seconds for projects without their own; 0
+# means no timeout.
+QUERY_TIMEOUT = decouple_config("QUERY_TIMEOUT", 300, cast=int)
+# Seconds between checks for clients that went away mid-query.
+QUERY_DISCONNECT_POLL = decouple_config("QUERY_DISCONNECT_POLL", 0.5, cast=float)
+
+QUERY_ID_PATTERN = re.compile(r"[A-Za-z0-9_.:-]{1,64}")
+
+
+def effective_timeout(request_timeout=None, project_timeout=None):
+    """
+    A request may shorten its project's timeout (or ``QUERY_TIMEOUT``) but
+    not extend it.
+
+    Returns:
+        int: Seconds, or None for no timeout.
+    """
+    limits = [
+        timeout
+        for timeout in (request_timeout, project_timeout or QUERY_TIMEOUT)
+        if timeout
+    ]
+    return min(limits) if limits else None
+
+
+def is_mariadb(connection):
+    return getattr(connection.dialect, "is_mariadb", False)
+
+
+def backend_id(connection):
+    """Id of the database session behind ``connection``, or None."""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        return connection.execute(text("SELECT pg_backend_pid()")).scalar_one()
+    if dialect in ("mysql", "mariadb"):
+        return connection.execute(text("SELECT CONNECTION_ID()")).scalar_one()
+    return None
+
+
+def apply_timeout(connection, seconds):
+    """
+    Bound the statements run next on ``connection`` to ``seconds``.
+
+    Returns:
+        callable: Restores the session's default; call it before the
+        connection goes back to the pool. PostgreSQL's setting is local to
+        the transaction and needs no reset.
+    """
+    dialect = connection.dialect.name
+    if not seconds or dialect not in ("postgresql", "mysql", "mariadb"):
+        return lambda: None
+    if dialect == "postgresql":
+        connection.execute(
+            text("SELECT set_config('statement_timeout', :timeout, true)"),
+            {"timeout": str(int(seconds * 1000))},
+        )
+        return lambda: None
+    if is_mariadb(connection):
+        setting, value = "max_statement_time", float(seconds)
+    else:
+        setting, value = "max_execution_time", int(seconds * 1000)
+    connection.execute(text(f"SET SESSION {setting} = {value}"))
+
+    def reset():
+        connection.execute(text(f"SET SESSION {setting} = DEFAULT"))
+
+    return reset
+
+
+@dataclass
+class RunningQuery:
+    id: str
+    user_id: str
+    project_id: str
+    db_url: str
+    sql: str
+    timeout: int = None
+    pool_settings: dict = None
+    backend_id: int = None
+    started_at: datetime = field(default_factory=utcnow)
+    cancelled: bool = False
+
+    def summary(self):
+        return {
+            "query_id": self.id,
+            "project_id": self.project_id,
+            "query": self.sql,
+            "timeout": self.timeout,
+            "started_at": self.started_at,
+            "elapsed_seconds": (utcnow() - self.started_at).total_seconds(),
+            "cancelled": self.cancelled,
+        }
+
+
+class QueryRegistry:
+    """
+    The queries running in this process, by user and id. Ids only have to
+    be unique per user, so clients may pick their own without seeing or
+    clashing with other users' queries.
+    """
+
+    def __init__(self):
+        self.queries = {}
+        self.lock = threading.Lock()
+
+    def new_id(self, requested=None):
+        """
+        Raises:
+            ValueError: If ``requested`` isn't a valid id.
+        """
+        if requested is None:
+            return uuid.uuid4().hex
+        if not isinstance(requested, str) or not QUERY_ID_PATTERN.fullmatch(requested):
+            raise ValueError(
+                "query_id must be 1 to 64 letters, digits or any of '_.:-'."
+            )
+        return requested
+
+    def register(self, query):
+        """
+        Raises:
+            ValueError: If the user already runs a query with the same id.
+        """
+        key = (query.user_id, query.id)
+        with self.lock:
+            if key in self.queries:
+                raise ValueError(f"Query {query.id} is already running.")
+            self.queries[key] = query
+
+    def unregister(self, query):
+        with self.lock:
+            if self.queries.get((query.user_id, query.id)) is query:
+                del self.queries[(query.user_id, query.id)]
+
+    def get(self, user_id, query_id):
+        with self.lock:
+            return self.queries.get((user_id, query_id))
+
+    def for_user(self, user_id):
+        with self.lock:
+            return [query for query in self.queries.values() if query.user_id == user_id]
+
+
+query_registry = QueryRegistry()
+
+
+@contextmanager
+def tracked(connection, query):
+    """
+    Run the statements of the block as ``query``: register it with its
+    session id, apply its timeout and unregister it when done.
+    """
+    query_registry.register(query)
+    reset = None
+    try:
+        query.backend_id = backend_id(connection)
+        reset = apply_timeout(connection, query.timeout)
+        yield
+    finally:
+        query_registry.unregister(query)
+        try:
+            if reset:
+                reset()
+        except Exception as e:
+            # A session we can't reset must not be reused with the timeout.
+            print("Error resetting statement timeout:", e)
+            connection.invalidate()
+
+
+def cancel_query(engine, query):
+    """
+    Cancel ``query`` from a separate connection of the same database.
+
+    Returns:
+        bool: Whether a cancel request could be sent.
+    """
+    if query.backend_id is None:
+        return False
+    query.cancelled = True
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT pg_cancel_backend(:pid)"), {"pid": query.backend_id}
+            )
+        else:
+            connection.execute(text(f"KILL QUERY {int(query.backend_id)}"))
+    return True
+
+
+async def cancel_on_disconnect(request, awaitable, on_disconnect, interval=QUERY_DISCONNECT_POLL):
+    """
+    Await ``awaitable``, calling ``on_disconnect()`` if the client of
+    ``request`` goes away first. The awaitable is still awaited afterwards so
+    its connection is released cleanly.
+    """
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=interval)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            print("Client disconnected, cancelling query")
+            await on_disconnect()
+            return await task
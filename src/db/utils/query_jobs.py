@@ -0,0 +1,353 @@
+"""
+Asynchronous query jobs.
+
+Queries too slow to run inside a request can be submitted as jobs instead. A
+job runs on a background thread of the API process and spills its rows to a
+row store on local disk under ``QUERY_JOB_DIR``; clients poll the job and
+then read the stored result page by page, at any offset, without running the
+query again.
+
+A row store is two files: ``rows`` holds each row as a JSON array and
+``index`` the end offset of each row as an unsigned 64-bit integer, so a page
+is located with one read of the memory-mapped index. The job's state is kept
+in a ``job.json`` manifest next to them, so any API process on the host can
+report on it and serve its pages.
+
+Jobs are deleted ``QUERY_JOB_TTL`` seconds after they finish. The stored
+results of a user may take up to ``QUERY_JOB_USER_QUOTA`` bytes; jobs that
+would go over it fail and new ones are refused.
+"""
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from decouple import config as decouple_config
+from sqlalchemy import text
+
+from src.db.utils.formats import json_default
+from src.db.utils.queries import tracked
+from src.db.utils.results import QUERY_BATCH_SIZE, execute
+from src.mixins import utcnow
+
+QUERY_JOB_DIR = decouple_config(
+    "QUERY_JOB_DIR", os.path.join(tempfile.gettempdir(), "bus-query-jobs")
+)
+QUERY_JOB_TTL = decouple_config("QUERY_JOB_TTL", 3600, cast=int)
+QUERY_JOB_USER_QUOTA = decouple_config(
+    "QUERY_JOB_USER_QUOTA", 1024 * 1024 * 1024, cast=int
+)
+QUERY_JOB_WORKERS = decouple_config("QUERY_JOB_WORKERS", 2, cast=int)
+# Statement timeout in seconds for jobs of projects without their own.
+QUERY_JOB_TIMEOUT = decouple_config("QUERY_JOB_TIMEOUT", 3600, cast=int)
+
+MANIFEST = "job.json"
+ROWS = "rows"
+INDEX = "index"
+OFFSET_SIZE = array("Q").itemsize
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+FINISHED = ("completed", "failed", "cancelled")
+
+
+class QuotaExceeded(Exception):
+    """Raised when a user's stored results would go over their quota."""
+
+
+class RowWriter:
+    """Appends rows to a row store."""
+
+    def __init__(self, path):
+        self.rows = open(os.path.join(path, ROWS), "wb")
+        self.index = open(os.path.join(path, INDEX), "wb")
+        self.offset = 0
+        self.count = 0
+
+    @property
+    def size(self):
+        return self.offset + self.count * OFFSET_SIZE
+
+    def append(self, rows):
+        chunks = []
+        offsets = array("Q")
+        for row in rows:
+            data = json.dumps(
+                list(row), default=json_default, separators=(",", ":")
+            ).encode()
+            chunks.append(data)
+            self.offset += len(data)
+            offsets.append(self.offset)
+        self.rows.write(b"".join(chunks))
+        self.index.write(offsets.tobytes())
+        self.count += len(offsets)
+
+    def close(self):
+        self.rows.close()
+        self.index.close()
+
+
+def read_rows(path, skip, limit):
+    """
+    Rows ``skip`` to ``skip + limit`` of the row store at ``path``.
+
+    Returns:
+        list: The rows, as lists.
+    """
+    with open(os.path.join(path, INDEX), "rb") as index_file:
+        count = os.fstat(index_file.fileno()).st_size // OFFSET_SIZE
+        stop = min(skip + limit, count)
+        if skip >= stop:
+            return []
+        # The end offset of the row before the page is where the page starts.
+        first = max(skip - 1, 0)
+        offsets = array("Q")
+        with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            offsets.frombytes(index[first * OFFSET_SIZE : stop * OFFSET_SIZE])
+    start = offsets[0] if skip else 0
+    ends = offsets[1:] if skip else offsets
+    with open(os.path.join(path, ROWS), "rb") as rows_file, mmap.mmap(
+        rows_file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        page = data[start : ends[-1]]
+    rows = []
+    position = 0
+    for end in ends:
+        rows.append(json.loads(page[position : end - start]))
+        position = end - start
+    return rows
+
+
+def directory_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                # Deleted by a concurrent sweep.
+                pass
+    return size
+
+
+def user_key(user_id):
+    return re.sub(r"[^\w-]", "_", str(user_id))
+
+
+def timestamp(moment):
+    return moment.isoformat() if moment else None
+
+
+def parse_timestamp(value):
+    moment = datetime.fromisoformat(value)
+    # Manifests written before timestamps carried their zone are in UTC.
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class QueryJobStore:
+    """Query jobs and their stored results, one directory per job."""
+
+    def __init__(
+        self,
+        root=QUERY_JOB_DIR,
+        ttl=QUERY_JOB_TTL,
+        quota=QUERY_JOB_USER_QUOTA,
+        workers=QUERY_JOB_WORKERS,
+        batch_size=QUERY_BATCH_SIZE,
+    ):
+        self.root = root
+        self.ttl = ttl
+        self.quota = quota
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="query-job"
+        )
+
+    def path(self, user_id, job_id=None):
+        path = os.path.join(self.root, user_key(user_id))
+        return os.path.join(path, job_id) if job_id else path
+
+    def write_manifest(self, path, manifest):
+        # Replace the file in one step so readers never see half a manifest.
+        temporary = os.path.join(path, f".{MANIFEST}.{threading.get_ident()}")
+        with open(temporary, "w") as f:
+            json.dump(manifest, f, default=json_default)
+        os.replace(temporary, os.path.join(path, MANIFEST))
+
+    def read_manifest(self, path):
+        try:
+            with open(os.path.join(path, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def usage(self, user_id):
+        """Bytes taken by the stored results of ``user_id``."""
+        return directory_size(self.path(user_id))
+
+    def expired(self, manifest, now):
+        if manifest["status"] in FINISHED:
+            return parse_timestamp(manifest["expires_at"]) <= now
+        # A job that stopped reporting progress died with its process.
+        updated = parse_timestamp(manifest["updated_at"])
+        return updated + timedelta(seconds=self.ttl) <= now
+
+    def submit(self, engine, query):
+        """
+        Start running ``query`` (a ``RunningQuery``, whose id becomes the job
+        id) on ``engine`` in the background.
+
+        Raises:
+            QuotaExceeded: If the user's stored results are already at quota.
+
+        Returns:
+            dict: The job's manifest.
+        """
+        self.sweep()
+        if self.usage(query.user_id) >= self.quota:
+            raise QuotaExceeded(
+                "Stored query results are over quota; delete some jobs first."
+            )
+        path = self.path(query.user_id, query.id)
+        os.makedirs(path)
+        now = utcnow()
+        manifest = {
+            "job_id": query.id,
+            "user_id": query.user_id,
+            "project_id": query.project_id,
+            "query": query.sql,
+            "status": "pending",
+            "columns": None,
+            "row_count": 0,
+            "bytes": 0,
+            "error": None,
+            "created_at": timestamp(now),
+            "updated_at": timestamp(now),
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": None,
+        }
+        self.write_manifest(path, manifest)
+        self.executor.submit(self.run, engine, query, path, dict(manifest))
+        return manifest
+
+    def run(self, engine, query, path, manifest):
+        """Run a job's query and spill its rows into the job's row store."""
+        manifest.update(status="running", started_at=timestamp(utcnow()))
+        manifest["updated_at"] = manifest["started_at"]
+        self.write_manifest(path, manifest)
+        writer = RowWriter(path)
+        try:
+            with engine.connect() as connection, tracked(connection, query):
+                result = execute(connection, text(query.sql), query.sql)
+                if not result.returns_rows:
+                    raise ValueError("Query jobs only run statements that return rows.")
+                manifest["columns"] = list(result.keys())
+                # What the user's other results took when this job started;
+                # the quota is checked against it plus what this job wrote.
+                stored = self.usage(query.user_id)
+                for batch in result.partitions(self.batch_size):
+                    writer.append(batch)
+                    if stored + writer.size > self.quota:
+                        raise QuotaExceeded(
+                            "Result is over the stored results quota."
+                        )
+                    manifest.update(
+                        row_count=writer.count,
+                        bytes=writer.size,
+                        updated_at=timestamp(utcnow()),
+                    )
+                    self.write_manifest(path, manifest)
+            writer.close()
+            manifest.update(row_count=writer.count, bytes=writer.size, status="completed")
+        except Exception as e:
+            print("Error in query job:", query.id, e)
+            writer.close()
+            for name in (ROWS, INDEX):
+                try:
+                    os.remove(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+            manifest.update(
+                status="cancelled" if query.cancelled else "failed",
+                error=str(e),
+                bytes=0,
+            )
+        finished = utcnow()
+        manifest.update(
+            finished_at=timestamp(finished),
+            updated_at=timestamp(finished),
+            expires_at=timestamp(finished + timedelta(seconds=self.ttl)),
+        )
+        if os.path.isdir(path):
+            self.write_manifest(path, manifest)
+
+    def get(self, user_id, job_id, now=None):
+        """
+        Returns:
+            dict: The manifest of one of the user's jobs, or None if it
+            doesn't exist or has expired.
+        """
+        if not JOB_ID_PATTERN.match(job_id or ""):
+            return None
+        manifest = self.read_manifest(self.path(user_id, job_id))
+        if manifest is None or self.expired(manifest, now or utcnow()):
+            return None
+        return manifest
+
+    def for_user(self, user_id):
+        """Manifests of the user's jobs, newest first."""
+        self.sweep()
+        try:
+            job_ids = os.listdir(self.path(user_id))
+        except FileNotFoundError:
+            return []
+        manifests = [self.get(user_id, job_id) for job_id in job_ids]
+        return sorted(
+            (manifest for manifest in manifests if manifest),
+            key=lambda manifest: manifest["created_at"],
+            reverse=True,
+        )
+
+    def rows(self, user_id, job_id, skip, limit):
+        """Rows ``skip`` to ``skip + limit`` of a completed job's result."""
+        return read_rows(self.path(user_id, job_id), skip, limit)
+
+    def delete(self, user_id, job_id):
+        shutil.rmtree(self.path(user_id, job_id), ignore_errors=True)
+
+    def sweep(self, now=None):
+        """
+        Delete expired jobs and their results.
+
+        Returns:
+            int: Number of jobs deleted.
+        """
+        now = now or utcnow()
+        deleted = 0
+        try:
+            users = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        for user in users:
+            user_path = os.path.join(self.root, user)
+            for job_id in os.listdir(user_path):
+                path = os.path.join(user_path, job_id)
+                manifest = self.read_manifest(path)
+                if manifest is None:
+                    # Directories without a manifest are half-created jobs.
+                    stale = os.path.getmtime(path) + self.ttl <= time.time()
+                else:
+                    stale = self.expired(manifest, now)
+                if stale:
+                    shutil.rmtree(path, ignore_errors=True)
+                    deleted += 1
+        return deleted
+
+
+query_job_store = QueryJobStore()
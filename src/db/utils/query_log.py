@@ -0,0 +1,234 @@
+"""
+Slow-query log.
+
+Every statement run through ``/query/execute`` and ``/data/``, page counts
+included, is recorded with a fingerprint of its normalized SQL (literals and
+parameters replaced by ``?``), its project and user, how long it ran, the
+rows it returned and the bytes of the response body as sent. Pages served
+from the page cache are recorded too, with source ``cache``. Records are buffered in memory and written to the
+``bus_query_log`` table every ``QUERY_LOG_FLUSH_INTERVAL`` seconds by a
+background thread; the table keeps only the newest ``QUERY_LOG_SIZE`` rows.
+Setting ``QUERY_LOG_SIZE`` to 0 turns the log off.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from decouple import config as decouple_config
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from src.mixins import utcnow
+
+QUERY_LOG_SIZE = decouple_config("QUERY_LOG_SIZE", 10000, cast=int)
+QUERY_LOG_FLUSH_INTERVAL = decouple_config("QUERY_LOG_FLUSH_INTERVAL", 5, cast=float)
+
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+PARAMETER_PATTERN = re.compile(r"(?<!:):\w+|%\(\w+\)s|%s|\$\d+")
+NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+SPACE_PATTERN = re.compile(r"\s+")
+
+RANKINGS = ("mean", "max", "total", "count")
+PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+
+def normalize_sql(sql):
+    """
+    ``sql`` with comments dropped, literals and bind parameters replaced by
+    ``?``, lists of them collapsed to ``(?+)`` and whitespace squeezed.
+    """
+    sql = COMMENT_PATTERN.sub(" ", sql)
+    sql = STRING_PATTERN.sub("?", sql)
+    sql = PARAMETER_PATTERN.sub("?", sql)
+    sql = NUMBER_PATTERN.sub("?", sql)
+    sql = LIST_PATTERN.sub("(?+)", sql)
+    return SPACE_PATTERN.sub(" ", sql).strip().rstrip(";").strip().lower()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def percentile(values, fraction):
+    """Linearly interpolated percentile of the sorted ``values``."""
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+@dataclass
+class LoggedStatement:
+    source: str
+    sql: str
+    project_id: str = None
+    user_id: str = None
+    rows: int = None
+    bytes: int = None
+    error: str = None
+    duration_ms: float = None
+    started: float = field(default_factory=time.perf_counter)
+    recorded_at: datetime = field(default_factory=utcnow)
+
+    def finish(self, rows=None, error=None):
+        """Stop the clock; only the first call counts."""
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self.started) * 1000
+            self.rows = rows
+            self.error = error
+
+    def row(self):
+        statement = normalize_sql(self.sql)
+        return {
+            "fingerprint": fingerprint(statement),
+            "statement": statement,
+            "source": self.source,
+            "project_id": self.project_id,
+            "user_id": self.user_id,
+            "duration_ms": self.duration_ms,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "error": self.error,
+            "recorded_at": self.recorded_at,
+        }
+
+
+class QueryLogBuffer:
+    """
+    Statements waiting to be written to the query log. At most ``size`` are
+    held, so a metadata database that is down costs the oldest records
+    rather than memory.
+    """
+
+    def __init__(self, size=QUERY_LOG_SIZE, flush_interval=QUERY_LOG_FLUSH_INTERVAL):
+        self.size = size
+        self.flush_interval = flush_interval
+        self.pending = deque(maxlen=max(size, 1))
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def record(self, statement):
+        """Queue a finished statement; unfinished ones are dropped."""
+        if not self.enabled or statement.duration_ms is None:
+            return
+        with self.lock:
+            self.pending.append(statement)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="query-log", daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self, engine=None):
+        """
+        Write the pending statements and drop the rows that fell out of the
+        ring.
+
+        Returns:
+            int: Number of statements written.
+        """
+        from src.schema import QueryLog
+
+        if engine is None:
+            from src.db.config import metadata_engine as engine
+
+        with self.lock:
+            statements = list(self.pending)
+            self.pending.clear()
+        if not statements:
+            return 0
+        try:
+            with Session(engine) as db:
+                db.execute(insert(QueryLog), [statement.row() for statement in statements])
+                newest = db.execute(select(func.max(QueryLog.id))).scalar()
+                db.execute(delete(QueryLog).where(QueryLog.id <= newest - self.size))
+                db.commit()
+        except Exception as e:
+            print("Error writing query log:", e)
+            return 0
+        return len(statements)
+
+
+query_log = QueryLogBuffer()
+
+
+def slowest(db, project_id, limit=10, by="mean"):
+    """
+    The ``limit`` fingerprints of a project ranked by mean, max or total
+    duration, or by how often they ran.
+    """
+    from src.schema import QueryLog
+
+    duration = QueryLog.duration_ms
+    metrics = {
+        "count": func.count(),
+        "mean": func.avg(duration),
+        "max": func.max(duration),
+        "total": func.sum(duration),
+    }
+    query = (
+        select(
+            QueryLog.fingerprint,
+            func.max(QueryLog.statement).label("statement"),
+            *(metric.label(name) for name, metric in metrics.items()),
+            func.sum(QueryLog.rows).label("rows"),
+            func.sum(QueryLog.bytes).label("bytes"),
+            func.count(QueryLog.error).label("errors"),
+            func.count(case((QueryLog.source == "cache", 1))).label("cache_hits"),
+            func.max(QueryLog.recorded_at).label("last_seen"),
+        )
+        .where(QueryLog.project_id == project_id)
+        .group_by(QueryLog.fingerprint)
+        .order_by(metrics[by].desc())
+        .limit(limit)
+    )
+    return [dict(row) for row in db.execute(query).mappings()]
+
+
+def latency(db, project_id, fingerprint=None, limit=10):
+    """
+    p50/p95/p99 durations of a project's fingerprints, slowest p95 first.
+    The ring holds at most ``QUERY_LOG_SIZE`` rows, so the percentiles are
+    computed here rather than with dialect-specific SQL.
+    """
+    from src.schema import QueryLog
+
+    query = (
+        select(QueryLog.fingerprint, QueryLog.statement, QueryLog.duration_ms)
+        .where(QueryLog.project_id == project_id)
+        .order_by(QueryLog.fingerprint, QueryLog.duration_ms)
+    )
+    if fingerprint:
+        query = query.where(QueryLog.fingerprint == fingerprint)
+    groups = {}
+    for row in db.execute(query):
+        group = groups.setdefault(
+            row.fingerprint,
+            {"fingerprint": row.fingerprint, "statement": row.statement, "durations": []},
+        )
+        group["durations"].append(row.duration_ms)
+    stats = []
+    for group in groups.values():
+        durations = group.pop("durations")
+        group["count"] = len(durations)
+        for name, fraction in PERCENTILES:
+            group[name] = percentile(durations, fraction)
+        group["max"] = durations[-1]
+        stats.append(group)
+    stats.sort(key=lambda group: group["p95"], reverse=True)
+    return stats[:limit]
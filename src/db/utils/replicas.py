@@ -0,0 +1,268 @@
+"""
+Read-replica routing.
+
+Projects may register read replicas next to their primary database. Reads
+that can't change anything (``/data/`` pages and counts, exports, query jobs
+and the read-only statements of ``/query/execute``) are sent to a replica;
+everything else stays on the primary.
+
+Replicas are checked in the background at most every
+``REPLICA_CHECK_INTERVAL`` seconds for whether they answer and how far they
+lag behind. A read goes to the healthy replica, within the project's lag
+tolerance (``max_replica_lag``, else ``REPLICA_MAX_LAG``), with the fewest
+reads in flight, and to the primary when there is none, including before a
+replica's first check has finished. A replica that can't be connected to is
+left out for ``REPLICA_RETRY_AFTER`` seconds and the read is retried on the
+primary.
+"""
+import itertools
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from decouple import config as decouple_config
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from src.db.utils.async_engine import run_sync
+from src.db.utils.cache import STRING_LITERAL_PATTERN
+from src.db.utils.engines import get_engine
+from src.db.utils.results import is_read_only
+
+REPLICA_CHECK_INTERVAL = decouple_config("REPLICA_CHECK_INTERVAL", 10, cast=int)
+# Seconds a replica may lag behind its primary; 0 ignores lag.
+REPLICA_MAX_LAG = decouple_config("REPLICA_MAX_LAG", 30, cast=int)
+REPLICA_RETRY_AFTER = decouple_config("REPLICA_RETRY_AFTER", 30, cast=int)
+
+# Reads that still take locks or change state.
+LOCKING_PATTERN = re.compile(
+    r"\bfor\s+(?:no\s+key\s+)?(?:update|share|key\s+share)\b"
+    r"|\block\s+in\s+share\s+mode\b|\binto\b"
+    r"|\b(?:nextval|setval|get_lock|pg_advisory_\w*)\s*\(",
+    re.IGNORECASE,
+)
+PG_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+def is_replica_safe(sql):
+    """Whether ``sql`` is read-only and takes no locks, so a replica can run it."""
+    return is_read_only(sql) and not LOCKING_PATTERN.search(
+        STRING_LITERAL_PATTERN.sub("''", sql)
+    )
+
+
+def replication_lag(connection):
+    """
+    Seconds the database of ``connection`` is behind its primary.
+
+    Returns:
+        float: 0 for databases that aren't replicas, None when replication
+        is stopped.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        return float(connection.execute(PG_LAG_QUERY).scalar_one())
+    if dialect in ("mysql", "mariadb"):
+        try:
+            status = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+        except DBAPIError:
+            # Servers older than MySQL 8.0.22 / MariaDB 10.5.1.
+            status = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+        if status is None:
+            return 0.0
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+    connection.execute(text("SELECT 1"))
+    return 0.0
+
+
+@dataclass
+class ReplicaState:
+    url: str
+    healthy: bool = False
+    lag: float = None
+    error: str = None
+    checked_at: float = 0
+    checking: bool = False
+    failed_until: float = 0
+    in_flight: int = 0
+
+    def available(self, now, max_lag):
+        return (
+            self.healthy
+            and self.failed_until <= now
+            and (max_lag <= 0 or self.lag <= max_lag)
+        )
+
+    def stats(self, now):
+        return {
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "healthy": self.healthy and self.failed_until <= now,
+            "lag_seconds": self.lag,
+            "error": self.error,
+            "in_flight": self.in_flight,
+            "checked_seconds_ago": (
+                round(now - self.checked_at, 3) if self.checked_at else None
+            ),
+        }
+
+
+class ReplicaRouter:
+    """Health, lag and load of the read replicas of every project."""
+
+    def __init__(
+        self,
+        check_interval=REPLICA_CHECK_INTERVAL,
+        max_lag=REPLICA_MAX_LAG,
+        retry_after=REPLICA_RETRY_AFTER,
+    ):
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.retry_after = retry_after
+        self.replicas = {}
+        self.lock = threading.Lock()
+        self.turns = itertools.count()
+        self.executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="replica-check"
+        )
+
+    def _state(self, url):
+        state = self.replicas.get(url)
+        if state is None:
+            state = self.replicas[url] = ReplicaState(url)
+        return state
+
+    def check(self, url, pool_settings=None):
+        """Measure whether a replica answers and how far it lags."""
+        try:
+            with get_engine(url, pool_settings).connect() as connection:
+                lag = replication_lag(connection)
+            error = None if lag is not None else "Replication is stopped."
+        except Exception as e:
+            lag, error = None, str(e)
+        with self.lock:
+            state = self._state(url)
+            state.lag = lag
+            state.error = error
+            state.healthy = error is None
+            state.checked_at = time.monotonic()
+            state.checking = False
+        if error:
+            print("Replica check failed:", make_url(url).render_as_string(), error)
+        return state
+
+    def refresh(self, urls, pool_settings=None):
+        """Schedule checks of the replicas not checked for a while."""
+        now = time.monotonic()
+        with self.lock:
+            for url in urls:
+                state = self._state(url)
+                if state.checking or now - state.checked_at < self.check_interval:
+                    continue
+                state.checking = True
+                self.executor.submit(self.check, url, pool_settings)
+
+    def choose(self, project):
+        """
+        Returns:
+            str: Connection string of the replica that should serve a read of
+            ``project`` (a ``ProjectConnection``), or its primary's.
+        """
+        replicas = project.read_replicas or []
+        if not replicas:
+            return project.db_url
+        self.refresh(replicas, project.pool_settings)
+        max_lag = (
+            project.max_replica_lag
+            if project.max_replica_lag is not None
+            else self.max_lag
+        )
+        now = time.monotonic()
+        with self.lock:
+            candidates = [
+                self.replicas[url]
+                for url in replicas
+                if self.replicas[url].available(now, max_lag)
+            ]
+            if not candidates:
+                return project.db_url
+            # Ties on load go round-robin.
+            turn = next(self.turns)
+            best = min(
+                enumerate(candidates),
+                key=lambda item: (
+                    item[1].in_flight,
+                    (item[0] - turn) % len(candidates),
+                ),
+            )[1]
+            return best.url
+
+    @contextmanager
+    def reading(self, url):
+        """Count a read in flight on ``url`` while the block runs."""
+        with self.lock:
+            state = self.replicas.get(url)
+            if state is not None:
+                state.in_flight += 1
+        try:
+            yield
+        finally:
+            if state is not None:
+                with self.lock:
+                    state.in_flight -= 1
+
+    def failed(self, url, error):
+        """Leave a replica out for ``retry_after`` seconds."""
+        with self.lock:
+            state = self._state(url)
+            state.failed_until = time.monotonic() + self.retry_after
+            state.error = str(error)
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            return [state.stats(now) for state in self.replicas.values()]
+
+
+replica_router = ReplicaRouter()
+
+
+async def run_read(project, fn, url=None):
+    """
+    Run the read ``fn(connection)`` like ``run_sync``, on ``url`` or the
+    replica picked for ``project``. Reads that could not reach their replica,
+    because connecting failed or the connection dropped, are retried on the
+    primary.
+    """
+    url = url or replica_router.choose(project)
+    if url == project.db_url:
+        return await run_sync(url, fn, project.pool_settings)
+
+    started = False
+
+    def read(connection):
+        nonlocal started
+        started = True
+        return fn(connection)
+
+    try:
+        with replica_router.reading(url):
+            return await run_sync(url, read, project.pool_settings)
+    except (OperationalError, InterfaceError) as e:
+        if started and not e.connection_invalidated:
+            raise
+        print("Replica unavailable, reading from the primary:", e)
+        replica_router.failed(url, e)
+    return await run_sync(project.db_url, fn, project.pool_settings)
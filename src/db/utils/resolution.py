@@ -0,0 +1,154 @@
+"""
+Per-project resolution cache.
+
+Data requests resolve their project's connection string and the name of the
+requested schema from the metadata database before touching the project's
+own database. Both rarely change, so they are cached in-process for
+``RESOLUTION_CACHE_TTL`` seconds. Concurrent misses on the same key share a
+single metadata query, and updating or deleting a project through the ORM
+drops its entries once the transaction commits.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, NamedTuple, Optional
+
+from decouple import config as decouple_config
+from sqlalchemy import and_, event, select
+from sqlalchemy.orm import Session
+
+RESOLUTION_CACHE_TTL = decouple_config("RESOLUTION_CACHE_TTL", 300, cast=int)
+
+PROJECTS_TABLE = "bus_projects"
+
+
+class ProjectConnection(NamedTuple):
+    db_url: str
+    pool_settings: Optional[dict]
+    statement_timeout: Optional[int]
+    read_replicas: Optional[List[str]] = None
+    max_replica_lag: Optional[int] = None
+
+
+class ResolutionCache:
+    """
+    TTL cache with single-flight loading.
+
+    Keys are tuples whose second item is the project id, so every entry of a
+    project can be invalidated at once.
+    """
+
+    def __init__(self, ttl=RESOLUTION_CACHE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        # Bumped by every invalidation, so a load that started before one
+        # doesn't store what it read.
+        self.generation = 0
+
+    def get(self, key, load):
+        """
+        Return the cached value of ``key``, calling ``load()`` on a miss.
+        Callers missing on a key that is already loading wait for that load
+        instead of starting their own. None is returned but never cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+                generation = self.generation
+        if not leader:
+            return future.result()
+
+        try:
+            value = load()
+        except Exception as e:
+            with self.lock:
+                self.inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self.lock:
+            if value is not None and self.ttl > 0 and generation == self.generation:
+                self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, project_id=None):
+        """Drop the entries of one project, or all of them."""
+        with self.lock:
+            self.generation += 1
+            for key in list(self.entries):
+                if project_id is None or key[1] == project_id:
+                    del self.entries[key]
+
+
+resolution_cache = ResolutionCache()
+
+
+def project_connection(db, project_id):
+    """
+    Returns:
+        ProjectConnection: The project's connection string, pool settings,
+        statement timeout and read replicas, or None if it doesn't exist.
+    """
+    from src.projects.models import ProjectModel
+
+    def load():
+        row = db.execute(
+            select(
+                ProjectModel.db_connection_string,
+                ProjectModel.pool_settings,
+                ProjectModel.statement_timeout,
+                ProjectModel.read_replicas,
+                ProjectModel.max_replica_lag,
+            ).where(ProjectModel.id == project_id)
+        ).first()
+        return ProjectConnection(*row) if row else None
+
+    return resolution_cache.get(("connection", project_id), load)
+
+
+def schema_name(db, project_id, schema_id):
+    """Name of a project's schema, or None if it doesn't exist."""
+    from src.schema import SchemaMetadata
+
+    return resolution_cache.get(
+        ("schema_name", project_id, schema_id),
+        lambda: db.execute(
+            select(SchemaMetadata.schema_name).where(
+                and_(
+                    SchemaMetadata.project_id == project_id,
+                    SchemaMetadata.id == schema_id,
+                )
+            )
+        ).scalars().first(),
+    )
+
+
+def invalidate_project(project_id):
+    resolution_cache.invalidate(project_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_projects(session, flush_context):
+    changed = session.info.setdefault("changed_projects", set())
+    for instance in (*session.dirty, *session.deleted):
+        if getattr(instance, "__tablename__", None) == PROJECTS_TABLE:
+            changed.add(instance.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_projects(session):
+    for project_id in session.info.pop("changed_projects", ()):
+        invalidate_project(project_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_projects(session):
+    session.info.pop("changed_projects", None)
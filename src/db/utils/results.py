@@ -0,0 +1,239 @@
+"""
+Bounded results for ad-hoc queries.
+
+``/query/execute`` reads results through a server-side cursor, batch by
+batch, and stops once a request's row or byte budget is spent instead of
+loading everything the SQL returns. A cut-off result is marked ``truncated``
+and, for read-only statements with a top-level ``ORDER BY``, comes with a
+continuation handle that runs the query again and resumes after the rows
+already returned. Handles are signed and only valid for the user and project
+they were issued to, so they can't carry other SQL. Without an ``ORDER BY``
+the next run may return rows in another order, so no handle is offered.
+Clients that want everything can stream the result as NDJSON, or run it as a
+query job, instead.
+
+Only plain queries are read through a server-side cursor: on psycopg2 a
+streamed statement becomes ``DECLARE ... CURSOR FOR``, which PostgreSQL
+rejects for writes, DDL and utility statements such as ``SHOW``. Those run
+as ordinary statements and report their ``rowcount``.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import re
+from contextlib import nullcontext
+from typing import List, NamedTuple, Optional
+
+from decouple import config as decouple_config
+
+from src.db.utils.cache import STRING_LITERAL_PATTERN, row_size, written_tables
+from src.db.utils.formats import cut_short_on_error, json_default
+from src.db.utils.queries import tracked
+
+QUERY_MAX_ROWS = decouple_config("QUERY_MAX_ROWS", 10000, cast=int)
+QUERY_MAX_BYTES = decouple_config("QUERY_MAX_BYTES", 16 * 1024 * 1024, cast=int)
+QUERY_BATCH_SIZE = decouple_config("QUERY_BATCH_SIZE", 1000, cast=int)
+SECRET_KEY = decouple_config(
+    "SECRET_KEY", "90ded69acb971f4f6f9a6913428503503eac012275cd9f2b13c37a0ba43f35c6"
+)
+
+READ_STATEMENT_PATTERN = re.compile(
+    r"^\s*(?:select|with|show|values|table|explain|describe|desc)\b", re.IGNORECASE
+)
+# Statements PostgreSQL accepts in DECLARE CURSOR.
+CURSOR_STATEMENT_PATTERN = re.compile(r"^\s*(?:select|with|values|table)\b", re.IGNORECASE)
+PARENTHESIZED_PATTERN = re.compile(r"\([^()]*\)")
+ORDER_BY_PATTERN = re.compile(r"\border\s+by\b", re.IGNORECASE)
+
+
+class InvalidContinuation(ValueError):
+    """Raised for continuation handles that can't be decoded."""
+
+
+def is_read_only(sql):
+    """
+    Whether ``sql`` looks like a statement that is safe to run again to
+    continue a truncated result.
+    """
+    return bool(READ_STATEMENT_PATTERN.match(sql)) and not written_tables(sql)
+
+
+def is_ordered(sql):
+    """Whether ``sql`` has an ``ORDER BY`` outside any parentheses."""
+    sql = STRING_LITERAL_PATTERN.sub("''", sql)
+    while True:
+        outer = PARENTHESIZED_PATTERN.sub(" ", sql)
+        if outer == sql:
+            return bool(ORDER_BY_PATTERN.search(sql))
+        sql = outer
+
+
+def streams_rows(sql):
+    """Whether ``sql`` is a plain query that can run on a server-side cursor."""
+    return bool(CURSOR_STATEMENT_PATTERN.match(sql)) and not written_tables(sql)
+
+
+def execute(connection, statement, sql):
+    """
+    Execute ``statement`` (the compiled ``sql``), through a server-side
+    cursor when ``streams_rows`` allows it.
+    """
+    if streams_rows(sql):
+        connection = connection.execution_options(stream_results=True)
+    return connection.execute(statement)
+
+
+class Executed(NamedTuple):
+    keys: Optional[List[str]]
+    rows: list
+    truncated: bool
+    rowcount: Optional[int] = None
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(raw):
+    return hmac.new(SECRET_KEY.encode(), raw, hashlib.sha256).digest()
+
+
+def encode_continuation(sql, offset, user_id, project_id):
+    raw = json.dumps(
+        {"q": sql, "o": offset, "u": user_id, "p": project_id}, separators=(",", ":")
+    ).encode()
+    return f"{_b64encode(raw)}.{_b64encode(_signature(raw))}"
+
+
+def decode_continuation(handle, user_id, project_id):
+    """
+    Returns:
+        tuple: ``(sql, offset)``.
+
+    Raises:
+        InvalidContinuation: If the handle is malformed, wasn't signed here or
+            was issued to another user or project.
+    """
+    try:
+        encoded, signature = handle.split(".")
+        raw = _b64decode(encoded)
+        if not hmac.compare_digest(_b64decode(signature), _signature(raw)):
+            raise InvalidContinuation("Invalid continuation")
+        payload = json.loads(raw)
+        sql, offset = payload["q"], payload["o"]
+        issued_to = payload["u"], payload["p"]
+    except (AttributeError, binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidContinuation("Invalid continuation") from e
+    if issued_to != (user_id, project_id):
+        raise InvalidContinuation("Invalid continuation")
+    if not isinstance(sql, str) or not isinstance(offset, int) or offset < 0:
+        raise InvalidContinuation("Invalid continuation")
+    return sql, offset
+
+
+def take_rows(result, max_rows, max_bytes, skip=0, batch_size=QUERY_BATCH_SIZE):
+    """
+    Read rows from ``result`` in batches until it is exhausted or a budget
+    is spent, after skipping the first ``skip`` rows. The result is closed,
+    which ends the query on the server.
+
+    Returns:
+        tuple: ``(rows, truncated)``. ``truncated`` is True only if at least
+        one more row was left.
+    """
+    rows = []
+    size = 0
+    truncated = False
+    try:
+        for batch in result.partitions(batch_size):
+            if skip:
+                dropped = min(skip, len(batch))
+                batch = batch[dropped:]
+                skip -= dropped
+            for row in batch:
+                row = tuple(row)
+                row_bytes = row_size(row)
+                if len(rows) >= max_rows or (rows and size + row_bytes > max_bytes):
+                    truncated = True
+                    break
+                rows.append(row)
+                size += row_bytes
+            if truncated:
+                break
+    finally:
+        result.close()
+    return rows, truncated
+
+
+def execute_bounded(
+    connection, statement, sql, max_rows, max_bytes, skip=0, batch_size=QUERY_BATCH_SIZE
+):
+    """
+    Run ``statement`` and read its rows within the budgets, as
+    ``take_rows`` does. Anything but a read-only statement is committed.
+
+    Returns:
+        Executed: ``keys`` is None for statements without rows, whose
+        ``rowcount`` is reported instead.
+    """
+    result = execute(connection, statement, sql)
+    if result.returns_rows:
+        keys = list(result.keys())
+        executed = Executed(keys, *take_rows(result, max_rows, max_bytes, skip, batch_size))
+    else:
+        executed = Executed(None, [], False, result.rowcount)
+    if not is_read_only(sql):
+        connection.commit()
+    return executed
+
+
+def stream_ndjson(
+    engine, statement, on_commit=None, batch_size=QUERY_BATCH_SIZE, query=None
+):
+    """
+    Run ``statement`` and stream its rows as NDJSON, one object per row,
+    through a server-side cursor when the statement allows one. Anything but
+    a read-only statement is committed and ``on_commit`` is called;
+    statements without rows send a single message line with their
+    ``rowcount``. With a ``RunningQuery`` the statement is tracked and
+    bounded by its timeout.
+    """
+    sql = str(statement)
+
+    def commit():
+        connection.commit()
+        if on_commit:
+            on_commit()
+
+    with engine.connect() as connection, (
+        tracked(connection, query) if query else nullcontext()
+    ):
+        result = execute(connection, statement, sql)
+        if not result.returns_rows:
+            commit()
+            yield (
+                json.dumps(
+                    {"message": "Query executed successfully.", "rowcount": result.rowcount}
+                )
+                + "\n"
+            ).encode()
+            return
+        keys = list(result.keys())
+        yield from cut_short_on_error(
+            (
+                "".join(
+                    json.dumps(dict(zip(keys, row)), default=json_default) + "\n"
+                    for row in batch
+                ).encode()
+                for batch in result.partitions(batch_size)
+            ),
+            "query results",
+        )
+        if not is_read_only(sql):
+            commit()
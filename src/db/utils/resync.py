@@ -0,0 +1,508 @@
+"""
+Incremental catalog re-sync.
+
+The source catalog is fingerprinted per table (its ordered columns with their
+types, nullability, defaults and keys) and per schema (its table fingerprints) and compared with the fingerprints stored on
+``bus_metadata`` / ``table_metadata``. Only schemas and tables whose
+fingerprint differs are diffed further, and only the resulting inserts,
+renames, updates and deletes are written back. Schemas are read and diffed
+one at a time, so only one schema of the catalog is held in memory.
+
+Metadata seeded before fingerprints existed has ``NULL`` fingerprints, so the
+first re-sync of such a project compares every table once and stores them.
+"""
+from collections import defaultdict
+from functools import partial
+from itertools import batched
+
+from sqlalchemy import bindparam, delete, select, update
+
+from .ingest import (
+    COLUMN_DETAILS,
+    SEED_BATCH_SIZE,
+    column_details,
+    insert_ignore,
+    schema_fingerprint,
+    set_fingerprints,
+    table_fingerprint,
+)
+
+
+def read_source_schema(source_db, reader, schema_name):
+    """
+    Read one schema of the source catalog from the reader's relations stream.
+
+    Args:
+        source_db (Session): Session on the project's database.
+        reader: Catalog reader for the source dialect.
+
+    Returns:
+        dict: ``{table_name: [column, ...]}`` with columns in ordinal order,
+        each a dict of ``column_name`` and ``COLUMN_DETAILS``.
+    """
+    tables = {}
+    for row in reader.relations(source_db, schema_name):
+        columns = tables.setdefault(row.table_name, [])
+        if row.column_name is not None:
+            columns.append({"column_name": row.column_name, **column_details(row)})
+    return tables
+
+
+def match_renames(dropped, added):
+    """
+    Pair dropped and added objects that share a fingerprint.
+
+    Args:
+        dropped (dict): ``{old_name: fingerprint}`` of stored objects that are
+            gone from the source.
+        added (dict): ``{new_name: fingerprint}`` of source objects that are
+            not stored yet.
+
+    Returns:
+        dict: ``{old_name: new_name}`` for fingerprints that occur exactly once
+        on each side. Ambiguous matches are treated as drop + add.
+    """
+    dropped_by_fingerprint = defaultdict(list)
+    for name, fingerprint in dropped.items():
+        if fingerprint:
+            dropped_by_fingerprint[fingerprint].append(name)
+    added_by_fingerprint = defaultdict(list)
+    for name, fingerprint in added.items():
+        added_by_fingerprint[fingerprint].append(name)
+
+    renames = {}
+    for fingerprint, old_names in dropped_by_fingerprint.items():
+        new_names = added_by_fingerprint.get(fingerprint, [])
+        if len(old_names) == 1 and len(new_names) == 1:
+            renames[old_names[0]] = new_names[0]
+    return renames
+
+
+class CatalogResync:
+    """
+    Applies the difference between a source catalog and the stored metadata
+    of one project inside a single transaction.
+
+    ``changed_tables`` collects the ``(schema_name, table_name)`` pairs whose
+    stored metadata was added, renamed, updated or deleted, under their old
+    and new names, for callers to invalidate caches with.
+    """
+
+    def __init__(self, db, project_id):
+        self.db = db
+        self.project_id = project_id
+        self.changed_tables = set()
+        self.summary = {
+            "schemas_added": 0,
+            "schemas_renamed": 0,
+            "schemas_deleted": 0,
+            "schemas_unchanged": 0,
+            "tables_added": 0,
+            "tables_renamed": 0,
+            "tables_deleted": 0,
+            "tables_updated": 0,
+            "columns_added": 0,
+            "columns_updated": 0,
+            "columns_deleted": 0,
+        }
+
+    def run(self, schema_names, read_schema):
+        """
+        Stored schemas are diffed as their source schema is read; new schemas
+        are read again once renames have been matched, to insert them.
+
+        Args:
+            schema_names: Names of the source schemas.
+            read_schema: ``read_schema(schema_name)`` returning a schema's
+                tables as built by ``read_source_schema``.
+
+        Returns:
+            dict: Counters describing the applied changes.
+        """
+        from src.schema import SchemaMetadata
+
+        stored = {
+            row.schema_name: row
+            for row in self.db.execute(
+                select(
+                    SchemaMetadata.id,
+                    SchemaMetadata.schema_name,
+                    SchemaMetadata.fingerprint,
+                ).where(SchemaMetadata.project_id == self.project_id)
+            )
+        }
+
+        schema_names = list(schema_names)
+        added = {}
+        fingerprints = {}
+        for name in schema_names:
+            tables = read_schema(name)
+            table_fingerprints = {
+                table_name: table_fingerprint(columns)
+                for table_name, columns in tables.items()
+            }
+            fingerprint = schema_fingerprint(table_fingerprints)
+            row = stored.get(name)
+            if row is None:
+                added[name] = fingerprint
+            elif row.fingerprint == fingerprint:
+                self.summary["schemas_unchanged"] += 1
+            else:
+                self._sync_tables(
+                    {name: row.id}, {name: tables}, {name: table_fingerprints}
+                )
+                fingerprints[row.id] = fingerprint
+
+        source_names = set(schema_names)
+        dropped = {
+            name: row.fingerprint
+            for name, row in stored.items()
+            if name not in source_names
+        }
+        for old_name, new_name in match_renames(dropped, added).items():
+            self._note_schema_tables(stored[old_name].id, old_name, new_name)
+            self._rename_schema(stored[old_name].id, new_name)
+            del dropped[old_name]
+            del added[new_name]
+            self.summary["schemas_renamed"] += 1
+
+        for name in dropped:
+            self._note_schema_tables(stored[name].id, name)
+        self._delete_schemas([stored[name].id for name in dropped])
+        self.summary["schemas_deleted"] += len(dropped)
+
+        schema_ids = self._insert_schemas(added)
+        self.summary["schemas_added"] += len(added)
+        for name, schema_id in schema_ids.items():
+            tables = read_schema(name)
+            table_fingerprints = {
+                table_name: table_fingerprint(columns)
+                for table_name, columns in tables.items()
+            }
+            self._sync_tables(
+                {name: schema_id}, {name: tables}, {name: table_fingerprints}
+            )
+            fingerprints[schema_id] = schema_fingerprint(table_fingerprints)
+
+        set_fingerprints(self.db, SchemaMetadata, fingerprints)
+        self.db.commit()
+        return self.summary
+
+    def _note_schema_tables(self, schema_id, *schema_names):
+        """Record every stored table of a schema as changed under ``schema_names``."""
+        from src.schema import TableMetadata
+
+        table_names = self.db.execute(
+            select(TableMetadata.table_name).where(TableMetadata.schema_id == schema_id)
+        ).scalars()
+        for table_name in table_names:
+            self.changed_tables.update(
+                (schema_name, table_name) for schema_name in schema_names
+            )
+
+    def _sync_tables(self, schema_ids, catalog, table_fingerprints):
+        """Diff the tables of every schema in ``schema_ids`` ({name: id})."""
+        from src.models import ColumnMetadata
+        from src.schema import TableMetadata
+
+        stored_tables = defaultdict(dict)
+        for id_batch in batched(schema_ids.values(), SEED_BATCH_SIZE):
+            rows = self.db.execute(
+                select(
+                    TableMetadata.id,
+                    TableMetadata.schema_id,
+                    TableMetadata.table_name,
+                    TableMetadata.fingerprint,
+                ).where(TableMetadata.schema_id.in_(id_batch))
+            )
+            for row in rows:
+                stored_tables[row.schema_id][row.table_name] = row
+
+        new_tables = []
+        changed_tables = {}
+        deleted_table_ids = []
+        fingerprints = {}
+        for schema_name, schema_id in schema_ids.items():
+            stored = stored_tables[schema_id]
+            source = table_fingerprints[schema_name]
+            dropped = {
+                name: row.fingerprint
+                for name, row in stored.items()
+                if name not in source
+            }
+            added = {
+                name: fingerprint
+                for name, fingerprint in source.items()
+                if name not in stored
+            }
+            for old_name, new_name in match_renames(dropped, added).items():
+                self._rename_table(stored[old_name].id, new_name)
+                self.changed_tables.update(
+                    ((schema_name, old_name), (schema_name, new_name))
+                )
+                del dropped[old_name]
+                del added[new_name]
+                self.summary["tables_renamed"] += 1
+
+            deleted_table_ids.extend(stored[name].id for name in dropped)
+            new_tables.extend((schema_name, schema_id, name) for name in added)
+            self.changed_tables.update((schema_name, name) for name in dropped)
+            self.changed_tables.update((schema_name, name) for name in added)
+            for name, row in stored.items():
+                if name in source and row.fingerprint != source[name]:
+                    changed_tables[row.id] = catalog[schema_name][name]
+                    fingerprints[row.id] = source[name]
+                    self.changed_tables.add((schema_name, name))
+
+        self._delete_tables(deleted_table_ids)
+        self.summary["tables_deleted"] += len(deleted_table_ids)
+
+        insert_ignore(
+            self.db,
+            TableMetadata,
+            (
+                {
+                    "table_name": table_name,
+                    "schema_name": schema_name,
+                    "schema_id": schema_id,
+                    "fingerprint": table_fingerprints[schema_name][table_name],
+                }
+                for schema_name, schema_id, table_name in new_tables
+            ),
+        )
+        self.summary["tables_added"] += len(new_tables)
+        new_table_ids = self._table_ids(new_tables)
+        insert_ignore(
+            self.db,
+            ColumnMetadata,
+            (
+                self._column_row(column, table_name, schema_name, table_id, schema_id)
+                for (schema_name, schema_id, table_name), table_id in new_table_ids
+                for column in catalog[schema_name][table_name]
+            ),
+        )
+        self.summary["columns_added"] += sum(
+            len(catalog[schema_name][table_name])
+            for schema_name, _, table_name in new_tables
+        )
+
+        self._sync_columns(changed_tables)
+        set_fingerprints(self.db, TableMetadata, fingerprints)
+        self.summary["tables_updated"] += len(changed_tables)
+
+    def _sync_columns(self, changed_tables):
+        """Diff the columns of ``changed_tables`` ({table_id: [column]})."""
+        from src.models import ColumnMetadata
+        from src.schema import TableMetadata
+
+        stored_columns = defaultdict(dict)
+        table_info = {}
+        for id_batch in batched(changed_tables, SEED_BATCH_SIZE):
+            rows = self.db.execute(
+                select(
+                    TableMetadata.id,
+                    TableMetadata.table_name,
+                    TableMetadata.schema_name,
+                    TableMetadata.schema_id,
+                ).where(TableMetadata.id.in_(id_batch))
+            )
+            table_info.update({row.id: row for row in rows})
+            rows = self.db.execute(
+                select(
+                    ColumnMetadata.id, ColumnMetadata.table_id, ColumnMetadata.column_name
+                ).where(ColumnMetadata.table_id.in_(id_batch))
+            )
+            for row in rows:
+                stored_columns[row.table_id][row.column_name] = row.id
+
+        new_columns = []
+        updated_columns = []
+        deleted_column_ids = []
+        for table_id, columns in changed_tables.items():
+            stored = stored_columns[table_id]
+            table = table_info[table_id]
+            column_names = {column["column_name"] for column in columns}
+            deleted_column_ids.extend(
+                column_id
+                for column_name, column_id in stored.items()
+                if column_name not in column_names
+            )
+            for column in columns:
+                if column["column_name"] in stored:
+                    updated_columns.append(
+                        {
+                            "row_id": stored[column["column_name"]],
+                            **{f"row_{field}": column[field] for field in COLUMN_DETAILS},
+                        }
+                    )
+                else:
+                    new_columns.append(
+                        self._column_row(
+                            column,
+                            table.table_name,
+                            table.schema_name,
+                            table_id,
+                            table.schema_id,
+                        )
+                    )
+
+        for id_batch in batched(deleted_column_ids, SEED_BATCH_SIZE):
+            self.db.execute(
+                delete(ColumnMetadata)
+                .where(ColumnMetadata.id.in_(id_batch))
+                .execution_options(synchronize_session=False)
+            )
+        insert_ignore(self.db, ColumnMetadata, new_columns)
+        if updated_columns:
+            columns_table = ColumnMetadata.__table__
+            self.db.execute(
+                update(columns_table)
+                .where(columns_table.c.id == bindparam("row_id"))
+                .values({field: bindparam(f"row_{field}") for field in COLUMN_DETAILS}),
+                updated_columns,
+            )
+        self.summary["columns_deleted"] += len(deleted_column_ids)
+        self.summary["columns_updated"] += len(updated_columns)
+        self.summary["columns_added"] += len(new_columns)
+
+    def _insert_schemas(self, added):
+        """Insert ``added`` ({name: fingerprint}) and return {name: id}."""
+        from src.schema import SchemaMetadata
+
+        if not added:
+            return {}
+        insert_ignore(
+            self.db,
+            SchemaMetadata,
+            (
+                {"schema_name": name, "project_id": self.project_id}
+                for name in added
+            ),
+        )
+        rows = self.db.execute(
+            select(SchemaMetadata.schema_name, SchemaMetadata.id).where(
+                SchemaMetadata.project_id == self.project_id,
+                SchemaMetadata.schema_name.in_(list(added)),
+            )
+        )
+        return dict(rows.all())
+
+    def _table_ids(self, tables):
+        """Resolve ``(schema_name, schema_id, table_name)`` tuples to table ids."""
+        from src.schema import TableMetadata
+
+        wanted = set(tables)
+        resolved = []
+        schema_ids = {schema_id for _, schema_id, _ in tables}
+        for id_batch in batched(schema_ids, SEED_BATCH_SIZE):
+            rows = self.db.execute(
+                select(
+                    TableMetadata.id,
+                    TableMetadata.schema_name,
+                    TableMetadata.schema_id,
+                    TableMetadata.table_name,
+                ).where(TableMetadata.schema_id.in_(id_batch))
+            )
+            for row in rows:
+                key = (row.schema_name, row.schema_id, row.table_name)
+                if key in wanted:
+                    resolved.append((key, row.id))
+        return resolved
+
+    def _rename_schema(self, schema_id, new_name):
+        from src.models import ColumnMetadata
+        from src.schema import SchemaMetadata, TableMetadata
+
+        for model, key in (
+            (SchemaMetadata, SchemaMetadata.id),
+            (TableMetadata, TableMetadata.schema_id),
+            (ColumnMetadata, ColumnMetadata.schema_id),
+        ):
+            self.db.execute(
+                update(model)
+                .where(key == schema_id)
+                .values(schema_name=new_name)
+                .execution_options(synchronize_session=False)
+            )
+
+    def _rename_table(self, table_id, new_name):
+        from src.models import ColumnMetadata
+        from src.schema import TableMetadata
+
+        for model, key in (
+            (TableMetadata, TableMetadata.id),
+            (ColumnMetadata, ColumnMetadata.table_id),
+        ):
+            self.db.execute(
+                update(model)
+                .where(key == table_id)
+                .values(table_name=new_name)
+                .execution_options(synchronize_session=False)
+            )
+
+    def _delete_schemas(self, schema_ids):
+        from src.models import ColumnMetadata
+        from src.schema import SchemaMetadata, TableMetadata
+
+        for id_batch in batched(schema_ids, SEED_BATCH_SIZE):
+            for model, key in (
+                (ColumnMetadata, ColumnMetadata.schema_id),
+                (TableMetadata, TableMetadata.schema_id),
+                (SchemaMetadata, SchemaMetadata.id),
+            ):
+                self.db.execute(
+                    delete(model)
+                    .where(key.in_(id_batch))
+                    .execution_options(synchronize_session=False)
+                )
+
+    def _delete_tables(self, table_ids):
+        from src.models import ColumnMetadata
+        from src.schema import TableMetadata
+
+        for id_batch in batched(table_ids, SEED_BATCH_SIZE):
+            for model, key in (
+                (ColumnMetadata, ColumnMetadata.table_id),
+                (TableMetadata, TableMetadata.id),
+            ):
+                self.db.execute(
+                    delete(model)
+                    .where(key.in_(id_batch))
+                    .execution_options(synchronize_session=False)
+                )
+
+    @staticmethod
+    def _column_row(column, table_name, schema_name, table_id, schema_id):
+        return {
+            **column,
+            "table_name": table_name,
+            "schema_name": schema_name,
+            "table_id": table_id,
+            "schema_id": schema_id,
+        }
+
+
+def resync_catalog(source_db, db, project_id, reader, on_commit=None):
+    """
+    Bring a project's stored metadata in line with its source catalog.
+
+    Args:
+        source_db (Session): Session on the project's database.
+        db (Session): Session on the metadata database.
+        project_id (str): Project the metadata belongs to.
+        reader: Catalog reader for the source dialect, e.g.
+            ``InformationSchemaReader``.
+        on_commit: Optional ``on_commit(changed_tables)`` callback, called
+            with the ``(schema_name, table_name)`` pairs that changed once the
+            re-sync is committed.
+
+    Returns:
+        dict: Counters describing the applied changes.
+    """
+    resync = CatalogResync(db, project_id)
+    summary = resync.run(
+        reader.schema_names(source_db), partial(read_source_schema, source_db, reader)
+    )
+    if on_commit is not None:
+        on_commit(resync.changed_tables)
+    return summary
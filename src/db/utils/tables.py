@@ -0,0 +1,124 @@
+import functools
+import re
+from collections import defaultdict
+
+from sqlalchemy import Column, Index, MetaData, PrimaryKeyConstraint, Table, select
+from sqlalchemy.orm import Session
+
+from src.db.utils.engines import get_engine
+from sqlalchemy.types import ARRAY, NullType
+
+TYPE_MODIFIERS = re.compile(r"\(.*?\)")
+
+
+def column_type(dialect, data_type):
+    """
+    Maps a stored ``data_type`` string onto the dialect's SQLAlchemy type,
+    e.g. ``character varying(255)`` -> ``VARCHAR``. Types the dialect does not
+    know about come back as ``NullType``, which still selects fine.
+    """
+    if not data_type:
+        return NullType()
+    name = TYPE_MODIFIERS.sub("", data_type).strip().lower()
+    is_array = name.endswith("[]")
+    type_class = dialect.ischema_names.get(name.removesuffix("[]").strip())
+    if type_class is None:
+        return NullType()
+    if is_array:
+        return ARRAY(type_class)
+    return type_class()
+
+
+def stored_columns(db, schema_id, table_name):
+    """Returns the stored columns of a table in ordinal order."""
+    from src.models import ColumnMetadata
+
+    query = (
+        select(ColumnMetadata)
+        .where(
+            ColumnMetadata.schema_id == schema_id,
+            ColumnMetadata.table_name == table_name,
+        )
+        .order_by(ColumnMetadata.ordinal_position, ColumnMetadata.column_name)
+    )
+    return db.execute(query).scalars().all()
+
+
+def table_from_metadata(engine, schema_name, table_name, columns):
+    """
+    Builds a ``Table`` from stored column metadata so that serving a page does
+    not have to reflect the target catalog. The primary key and unique indexes
+    are attached too, with their columns in index-key order, so the table
+    exposes the same keys as a reflected one. Returns None when
+    the columns were seeded before types were captured, so the caller can fall
+    back to reflection.
+    """
+    if not columns or any(column.data_type is None for column in columns):
+        return None
+    # Key columns are sorted by their position in the index; keys stored
+    # before positions were captured keep ordinal order, as the sort is stable.
+    primary_positions = {}
+    unique_indexes = defaultdict(list)
+    for column in columns:
+        for index in column.indexes or []:
+            position = index.get("position") or 0
+            if index.get("primary"):
+                primary_positions[column.column_name] = position
+            elif index.get("unique"):
+                unique_indexes[index["name"]].append((position, column.column_name))
+    primary_key = sorted(
+        (column.column_name for column in columns if column.is_primary_key),
+        key=lambda column_name: primary_positions.get(column_name, 0),
+    )
+    table = Table(
+        table_name,
+        MetaData(),
+        *(
+            Column(
+                column.column_name,
+                column_type(engine.dialect, column.data_type),
+                nullable=column.is_nullable is not False,
+            )
+            for column in columns
+        ),
+        PrimaryKeyConstraint(*primary_key),
+        schema=schema_name,
+    )
+    for name, keyed in unique_indexes.items():
+        keyed.sort(key=lambda key: key[0])
+        Index(name, *(table.c[column_name] for _, column_name in keyed), unique=True)
+    return table
+
+
+# Cache for table metadata
+# The key will be a tuple: (db_url, schema_id, schema_name, table_name, pool_settings)
+@functools.lru_cache(maxsize=128)
+def get_table(
+    db_url: str, schema_id: str, schema_name: str, table_name: str, pool_settings: tuple = ()
+) -> Table:
+    """
+    Builds and caches a Table object from the column metadata stored at seed
+    time, reflecting the live table only for projects seeded before column
+    types were captured.
+    The db_url is part of the key to ensure we cache per-database;
+    pool_settings are passed as sorted items so they can be part of it too.
+    Cleared when a re-sync changes the stored metadata.
+    """
+    from src.db.config import metadata_engine
+
+    engine = get_engine(db_url, dict(pool_settings)) # This will be fast (from cache)
+    with Session(metadata_engine) as db:
+        columns = stored_columns(db, schema_id, table_name)
+    table = table_from_metadata(engine, schema_name, table_name, columns)
+    if table is not None:
+        return table
+    print(f"--- REFLECTING NEW TABLE {schema_name}.{table_name} ---")
+    metadata = MetaData()
+    # Autoload the table structure ONCE
+    table = Table(
+        table_name, 
+        metadata, 
+        schema=schema_name, 
+        autoload_with=engine
+    )
+    return table
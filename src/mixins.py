@@ -1,9 +1,40 @@
 from sqlalchemy import Column, String, DateTime
 from sqlalchemy.orm import declarative_mixin
-from datetime import datetime
+from sqlalchemy.types import TypeDecorator
+from datetime import datetime, timezone
 import uuid
 
 
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    ``DateTime(timezone=True)`` that always returns aware UTC datetimes,
+    including on backends that store naive ones, such as SQLite. Naive
+    values are taken to be UTC.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        value = value.astimezone(timezone.utc)
+        if dialect.name == "postgresql":
+            return value
+        return value.replace(tzinfo=None)
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+
 @declarative_mixin
 class UniqueIDMixin:
     """
@@ -19,9 +50,9 @@ class TimeStampMixin:
     Mixin to add a timestamp to a SQLAlchemy model.
     """
 
-    created_at = Column(DateTime, default=datetime.utcnow(), nullable=False)
+    created_at = Column(UTCDateTime, default=utcnow, nullable=False)
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow(),
+        UTCDateTime,
+        default=utcnow,
         nullable=False,
     )
@@ -7,6 +7,8 @@ from sqlalchemy import (
     Integer,
     Boolean,
     ForeignKey,
+    JSON,
+    Text,
     UniqueConstraint,
 )
 from sqlalchemy.ext.declarative import declarative_base
@@ -133,6 +135,21 @@ class ColumnMetadata(Base, UniqueIDMixin, TimeStampMixin):
     table_id = Column(String(255), ForeignKey("table_metadata.id"), nullable=False)
     schema_name = Column(String(255))
     schema_id = Column(String(255), ForeignKey("bus_metadata.id"), nullable=False)
+    data_type = Column(String(255))
+    is_nullable = Column(Boolean)
+    ordinal_position = Column(Integer)
+    column_default = Column(Text)
+    is_primary_key = Column(Boolean, default=False)
+    # [{"name": ..., "unique": bool, "primary": bool, "position": int}] for
+    # indexes covering the column, with the column's position in the index key
+    indexes = Column(JSON)
+    # [{"name": ..., "schema": ..., "table": ..., "column": ...}] referenced by the column
+    foreign_keys = Column(JSON)
+    __table_args__ = (
+        UniqueConstraint(
+            "table_id", "column_name", name="column_metadata_table_id_column_name_key"
+        ),
+    )
 
 
 class UserModel(Base, UniqueIDMixin, TimeStampMixin):
@@ -147,6 +164,14 @@ class ProjectModel(Base, UniqueIDMixin, TimeStampMixin):
     __tablename__ = "bus_projects"
     project_name = Column(String(255), nullable=False)
     db_connection_string = Column(String(255), nullable=False)
+    # Overrides of the ENGINE_* pool defaults, e.g. {"pool_size": 10}.
+    pool_settings = Column(JSON, nullable=True)
+    # Seconds a query may run; falls back to QUERY_TIMEOUT.
+    statement_timeout = Column(Integer, nullable=True)
+    # Connection strings of read replicas serving the project's reads.
+    read_replicas = Column(JSON, nullable=True)
+    # Seconds a replica may lag behind; falls back to REPLICA_MAX_LAG.
+    max_replica_lag = Column(Integer, nullable=True)
     created_by = Column(
         String(255),
         ForeignKey("bus_users.id"),
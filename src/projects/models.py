@@ -8,6 +8,7 @@ from sqlalchemy import (
     Integer,
     Boolean,
     ForeignKey,
+    JSON,
     UniqueConstraint,
 )
 from sqlalchemy.ext.declarative import declarative_base
@@ -33,6 +34,14 @@ class ProjectModel(Base, UniqueIDMixin, TimeStampMixin):
     __tablename__ = "bus_projects"
     project_name = Column(String(255), nullable=False)
     db_connection_string = Column(String(255), nullable=False)
+    # Overrides of the ENGINE_* pool defaults, e.g. {"pool_size": 10}.
+    pool_settings = Column(JSON, nullable=True)
+    # Seconds a query may run; falls back to QUERY_TIMEOUT.
+    statement_timeout = Column(Integer, nullable=True)
+    # Connection strings of read replicas serving the project's reads.
+    read_replicas = Column(JSON, nullable=True)
+    # Seconds a replica may lag behind; falls back to REPLICA_MAX_LAG.
+    max_replica_lag = Column(Integer, nullable=True)
     created_by = Column(
         String(255),
         ForeignKey("bus_users.id"),
@@ -1,21 +1,27 @@
 
 
+import asyncio
 import datetime
 from typing import List
 
-from fastapi import BackgroundTasks, Depends, status, HTTPException, Request
-from sqlalchemy import select, text
+from fastapi import Depends, status, HTTPException, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import create_engine
 from fastapi import APIRouter
-import functools
 
-from src.projects.schemas import UserProjectResponse,ProjectCreate
+from src.projects.schemas import UserProjectResponse,ProjectCreate, SeedJobResponse
 
 
 
 from .models import ProjectModel, UserProjectsModel
-from src.db.config import config
+from src.db.config import config, get_seed
+from src.db.utils.async_engine import ping
+from src.db.utils.cache import page_cache
+from src.db.utils.engines import get_engine
+from src.db.utils.resolution import invalidate_project
+from src.db.utils.tables import get_table
+from src.db.utils.jobs import can_resume, create_seed_job, latest_seed_job
+from src.worker import BrokerNotConfigured, check_broker, enqueue_resync, enqueue_seed
 
 from src.db import metadata_engine, engine
 from decouple import config as decouple_config
@@ -44,15 +50,6 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-@functools.lru_cache(maxsize=32)
-def get_engine(db_url: str):
-    """
-    Creates and caches a SQLAlchemy engine for a given database URL.
-    We are NOT using NullPool here, so it will use the default QueuePool.
-    """
-    print(f"--- CREATING NEW ENGINE for {db_url} ---")
-    #TODO: Consider adding pool_size and max_overflow parameters based on expected load
-    return create_engine(db_url) 
 
 async def get_db():
     db = Session(metadata_engine)
@@ -70,6 +67,25 @@ async def get_source_db():
         db.close()
 
 
+def get_user_project(db, project_id, user_id):
+    """Return the user's membership of a project with the project loaded, or raise 404"""
+    query = (
+        select(UserProjectsModel)
+        .options(joinedload(UserProjectsModel.project))
+        .where(
+            UserProjectsModel.project_id == project_id,
+            UserProjectsModel.user_id == user_id,
+        )
+    )
+    user_project = db.execute(query).scalars().first()
+    if not user_project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found",
+        )
+    return user_project
+
+
 @project_router.get("/project/{project_id}", response_model=UserProjectResponse)
 def get_project_by_id(
     request: Request,
@@ -124,10 +140,9 @@ def get_user_projects(
 
 
 @project_router.post("/project/new", response_model=UserProjectResponse)
-def create_project(
+async def create_project(
     request: Request, 
     form_data: ProjectCreate, 
-     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     # print("proj",form_data.db_connection_string)
@@ -148,10 +163,16 @@ def create_project(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token",
             )
-        config.set_config(
-            form_data.db_connection_string, form_data.database_dialect
-        )
-        db_connection_string  = config.adapter.get_connection_string()
+
+        def connection_string():
+            # Refuse before creating a project that could never be seeded.
+            check_broker()
+            config.set_config(
+                form_data.db_connection_string, form_data.database_dialect
+            )
+            return config.adapter.get_connection_string()
+
+        db_connection_string = await asyncio.to_thread(connection_string)
 
         print("db_connection_string", db_connection_string)
         if not db_connection_string:
@@ -159,48 +180,195 @@ def create_project(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid database connection string",
             )
-        engine = get_engine(db_connection_string)
+        pool_settings = (
+            form_data.pool_settings.model_dump(exclude_none=True)
+            if form_data.pool_settings
+            else None
+        )
         # Test the connection
-        with Session(engine) as test_db:
-            query = text("SELECT 1")
-            data = test_db.execute(query).scalar_one()
-            if data != 1:
+        if not await ping(db_connection_string, pool_settings):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to connect to the provided database.",
+            )
+        else:
+            print("Successfully connected to the provided database.")
+        for replica_url in form_data.read_replicas or []:
+            if not await ping(replica_url, pool_settings):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to connect to the provided database.",
+                    detail="Failed to connect to a read replica.",
                 )
-            else:
-                print("Successfully connected to the provided database.")
-        new_project = ProjectModel(
-            project_name=form_data.project_name,
-            db_connection_string=db_connection_string,
-            created_by=user_id,
-        )
-        db.add(new_project)
-        db.commit()
-        db.refresh(new_project)
 
-        new_user_project = UserProjectsModel(
-            project_id=new_project.id,
-            user_id=user_id,
-        )
-        db.add(new_user_project)
-        db.commit()
-        db.refresh(new_user_project)
-        config.adapter.create_connection()
-        config.adapter.get_connection_string
-        background_tasks.add_task(config.adapter.initialize_metadata,project_id=new_project.id)
-        return new_user_project
+        def save():
+            new_project = ProjectModel(
+                project_name=form_data.project_name,
+                db_connection_string=db_connection_string,
+                pool_settings=pool_settings,
+                statement_timeout=form_data.statement_timeout,
+                read_replicas=form_data.read_replicas,
+                max_replica_lag=form_data.max_replica_lag,
+                created_by=user_id,
+            )
+            db.add(new_project)
+            db.commit()
+            db.refresh(new_project)
+
+            new_user_project = UserProjectsModel(
+                project_id=new_project.id,
+                user_id=user_id,
+            )
+            db.add(new_user_project)
+            db.commit()
+            db.refresh(new_user_project)
+            config.adapter.create_connection()
+            seed_job = create_seed_job(db, new_project.id)
+            engine = get_engine(db_connection_string, pool_settings)
+            enqueue_seed(new_project.id, seed_job.id, engine.dialect.name)
+            # Load the project and user here rather than on the event loop.
+            return UserProjectResponse.model_validate(new_user_project)
+
+        return await asyncio.to_thread(save)
+    except BrokerNotConfigured as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print("e", e)
-        db.rollback()
+        await asyncio.to_thread(db.rollback)
         if config.adapter:
             config.adapter.close_connection()
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# Re-sync jobs whose changed tables this process already dropped from its caches.
+invalidated_resyncs = set()
+
+
+def invalidate_resync(job, db_url):
+    """Drop this process's cached definitions and pages of the tables a
+    completed re-sync changed, once per job."""
+    if job.id in invalidated_resyncs:
+        return
+    tables = [tuple(table) for table in job.summary["changed_tables"]]
+    if tables:
+        get_table.cache_clear()
+        page_cache.invalidate(db_url, tables)
+    # Dropped schemas must stop resolving.
+    invalidate_project(job.project_id)
+    invalidated_resyncs.add(job.id)
+
+
+@project_router.post(
+    "/project/{project_id}/resync",
+    response_model=SeedJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def resync_project(
+    request: Request,
+    project_id: str,
+    db: Session = Depends(get_db),
+):
+    """Queue a re-sync of the project's stored metadata with its database"""
+    try:
+        user_id = request.state.user.get("user_id")
+        user_project = get_user_project(db, project_id, user_id)
+        check_broker()
+        resync_job = latest_seed_job(db, project_id, kind="resync")
+        if resync_job is None or resync_job.status in ("completed", "failed"):
+            resync_job = create_seed_job(db, project_id, kind="resync")
+        elif not can_resume(resync_job):
+            # Already running.
+            return resync_job
+        engine = get_engine(
+            user_project.project.db_connection_string,
+            user_project.project.pool_settings,
+        )
+        enqueue_resync(project_id, resync_job.id, engine.dialect.name)
+        return resync_job
+    except HTTPException:
+        raise
+    except BrokerNotConfigured as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        print("e", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@project_router.get("/project/{project_id}/resync", response_model=SeedJobResponse)
+def get_resync_status(
+    request: Request,
+    project_id: str,
+    db: Session = Depends(get_db),
+):
+    """Get the status and summary of the project's latest re-sync"""
+    user_id = request.state.user.get("user_id")
+    user_project = get_user_project(db, project_id, user_id)
+    resync_job = latest_seed_job(db, project_id, kind="resync")
+    if not resync_job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No resync job found for this project",
+        )
+    if resync_job.status == "completed":
+        invalidate_resync(resync_job, user_project.project.db_connection_string)
+    return resync_job
+
+
+@project_router.get("/project/{project_id}/seed", response_model=SeedJobResponse)
+def get_seed_status(
+    request: Request,
+    project_id: str,
+    db: Session = Depends(get_db),
+):
+    """Get progress, throughput and per-schema checkpoints of the project's latest seed"""
+    user_id = request.state.user.get("user_id")
+    get_user_project(db, project_id, user_id)
+    seed_job = latest_seed_job(db, project_id)
+    if not seed_job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No seed job found for this project",
+        )
+    return seed_job
+
+
+@project_router.post("/project/{project_id}/seed/resume", response_model=SeedJobResponse)
+def resume_seed(
+    request: Request,
+    project_id: str,
+    db: Session = Depends(get_db),
+):
+    """Resume the project's latest seed from its last completed schema"""
+    try:
+        user_id = request.state.user.get("user_id")
+        user_project = get_user_project(db, project_id, user_id)
+        seed_job = latest_seed_job(db, project_id)
+        if not seed_job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No seed job found for this project",
+            )
+        if not can_resume(seed_job):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Seed job is {seed_job.status} and cannot be resumed",
+            )
+        engine = get_engine(
+            user_project.project.db_connection_string,
+            user_project.project.pool_settings,
+        )
+        enqueue_seed(project_id, seed_job.id, engine.dialect.name)
+        return seed_job
+    except HTTPException:
+        raise
+    except BrokerNotConfigured as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        print("e", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @project_router.get("/project/select/{project_id}")
-def select_project(
+async def select_project(
     request: Request,
     project_id: str,
     db: Session = Depends(get_db),
@@ -222,7 +390,9 @@ def select_project(
             )
         )
 
-        project = db.execute(project_query).scalars().first()
+        project = await asyncio.to_thread(
+            lambda: db.execute(project_query).scalars().first()
+        )
         if not project:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -249,21 +419,15 @@ def select_project(
             },
             expires_delta=access_token_expires,
         )
-        engine = get_engine(project.project.db_connection_string)
-        with Session(engine) as target_db:
-            
-            
-            query = text("SELECT 1")
-            data = target_db.execute(query).scalar_one()
-            print("data", data)
-            if data != 1:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to connect to the project's database.",
-                )
-            else:
-                print("Successfully connected to the project's database.")
-                return {"project_token": access_token}
+        db_url = project.project.db_connection_string
+        if not await ping(db_url, project.project.pool_settings):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to connect to the project's database.",
+            )
+        else:
+            print("Successfully connected to the project's database.")
+            return {"project_token": access_token}
     except Exception as e:
         print("e", e)
         raise HTTPException(status_code=400, detail=str(e))
@@ -1,12 +1,22 @@
 #pydantic schemas
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 from fastapi.security import OAuth2PasswordBearer
 from src.users.schemas import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
+class PoolSettings(BaseModel):
+    """Connection pool overrides for a project's database."""
+
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    pool_recycle: Optional[int] = None
+    pool_pre_ping: Optional[bool] = None
+
+
 class ProjectBase(BaseModel):
     """Base Project model."""
 
@@ -14,6 +24,10 @@ class ProjectBase(BaseModel):
     project_name: str
     db_connection_string: str
     created_by: str
+    pool_settings: Optional[PoolSettings] = None
+    statement_timeout: Optional[int] = None
+    read_replicas: Optional[List[str]] = None
+    max_replica_lag: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -24,6 +38,10 @@ class ProjectCreate(BaseModel):
     project_name: str
     db_connection_string: str
     database_dialect: str
+    pool_settings: Optional[PoolSettings] = None
+    statement_timeout: Optional[int] = None
+    read_replicas: Optional[List[str]] = None
+    max_replica_lag: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -50,3 +68,40 @@ class UserProjectResponse(BaseModel):
     class Config:
         from_attributes = True
         orm_mode = True
+
+
+class SeedCheckpointResponse(BaseModel):
+    schema_name: str
+    status: str
+    tables_done: int
+    columns_done: int
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class SeedJobResponse(BaseModel):
+    id: str
+    project_id: str
+    kind: str
+    status: str
+    schemas_total: int
+    schemas_done: int
+    tables_total: int
+    tables_done: int
+    columns_total: int
+    columns_done: int
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime
+    elapsed_seconds: float
+    tables_per_second: float
+    columns_per_second: float
+    error: Optional[str] = None
+    summary: Optional[dict] = None
+    checkpoints: List[SeedCheckpointResponse]
+
+    class Config:
+        from_attributes = True
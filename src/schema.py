@@ -1,6 +1,15 @@
 # sqlalchemy models
-from sqlalchemy import Column, ForeignKey, String, UniqueConstraint
-from src.mixins import UniqueIDMixin, TimeStampMixin
+from sqlalchemy import (
+    Column,
+    Float,
+    ForeignKey,
+    Integer,
+    JSON,
+    String,
+    Text,
+    UniqueConstraint,
+)
+from src.mixins import UniqueIDMixin, TimeStampMixin, UTCDateTime, utcnow
 from sqlalchemy.orm import Mapped, relationship
 from typing import List
 # reuse the project's shared Base so all models share the same MetaData
@@ -11,15 +20,17 @@ class TableMetadata(Base, UniqueIDMixin, TimeStampMixin):
     __tablename__ = "table_metadata"
     table_name = Column(String(255))
     schema_name = Column(String(255))
+    # sha256 of the table's column list, maintained by the re-sync engine
+    fingerprint = Column(String(64))
     schema_id = Column(String(255), ForeignKey("bus_metadata.id"), nullable=False)
     schema: Mapped["SchemaMetadata"] = relationship(
         "SchemaMetadata", back_populates="tables"
     )
-    # __table_args__ = (
-    #     UniqueConstraint(
-    #         "table_name", "schema_name", name="table_name_schema_name_unique_constraint"
-    #     ),
-    # )
+    __table_args__ = (
+        UniqueConstraint(
+            "schema_id", "table_name", name="table_metadata_schema_id_table_name_key"
+        ),
+    )
 
 class SchemaMetadata(Base, UniqueIDMixin, TimeStampMixin):
     # from src.db.tables.models import TableMetadata
@@ -27,6 +38,104 @@ class SchemaMetadata(Base, UniqueIDMixin, TimeStampMixin):
 
     schema_name = Column(String(255))
     project_id = Column(String(255), nullable=False)
+    # sha256 of the schema's table fingerprints, maintained by the re-sync engine
+    fingerprint = Column(String(64))
+    __table_args__ = (
+        UniqueConstraint(
+            "project_id", "schema_name", name="bus_metadata_project_id_schema_name_key"
+        ),
+    )
     tables: Mapped[List["TableMetadata"]] = relationship(
         back_populates="schema", cascade="all, delete-orphan"
-    )    
\ No newline at end of file
+    )    
+
+
+class SeedJob(Base, UniqueIDMixin, TimeStampMixin):
+    """
+    A metadata seed or re-sync of one project. ``updated_at`` is bumped with
+    every progress update, so a running job whose ``updated_at`` stops moving
+    has crashed and can be resumed.
+    """
+
+    __tablename__ = "bus_seed_jobs"
+    project_id = Column(String(255), nullable=False, index=True)
+    # seed | resync
+    kind = Column(String(32), nullable=False, default="seed", server_default="seed")
+    # pending -> running -> completed | failed
+    status = Column(String(32), nullable=False, default="pending")
+    schemas_total = Column(Integer, nullable=False, default=0)
+    schemas_done = Column(Integer, nullable=False, default=0)
+    tables_total = Column(Integer, nullable=False, default=0)
+    tables_done = Column(Integer, nullable=False, default=0)
+    columns_total = Column(Integer, nullable=False, default=0)
+    columns_done = Column(Integer, nullable=False, default=0)
+    started_at = Column(UTCDateTime)
+    finished_at = Column(UTCDateTime)
+    error = Column(Text)
+    # Counters and changed tables of a completed re-sync.
+    summary = Column(JSON)
+    checkpoints: Mapped[List["SeedCheckpoint"]] = relationship(
+        back_populates="job",
+        cascade="all, delete-orphan",
+        order_by="SeedCheckpoint.schema_name",
+    )
+
+    @property
+    def elapsed_seconds(self):
+        if not self.started_at:
+            return 0.0
+        return ((self.finished_at or utcnow()) - self.started_at).total_seconds()
+
+    @property
+    def tables_per_second(self):
+        elapsed = self.elapsed_seconds
+        return self.tables_done / elapsed if elapsed else 0.0
+
+    @property
+    def columns_per_second(self):
+        elapsed = self.elapsed_seconds
+        return self.columns_done / elapsed if elapsed else 0.0
+
+
+class SeedCheckpoint(Base, UniqueIDMixin, TimeStampMixin):
+    """Progress of one schema within a seed job."""
+
+    __tablename__ = "bus_seed_checkpoints"
+    job_id = Column(String(255), ForeignKey("bus_seed_jobs.id"), nullable=False)
+    schema_name = Column(String(255), nullable=False)
+    schema_id = Column(String(255), ForeignKey("bus_metadata.id"))
+    # pending -> running -> completed | failed
+    status = Column(String(32), nullable=False, default="pending")
+    tables_done = Column(Integer, nullable=False, default=0)
+    columns_done = Column(Integer, nullable=False, default=0)
+    finished_at = Column(UTCDateTime)
+    error = Column(Text)
+    job: Mapped["SeedJob"] = relationship("SeedJob", back_populates="checkpoints")
+    __table_args__ = (
+        UniqueConstraint(
+            "job_id", "schema_name", name="bus_seed_checkpoints_job_id_schema_name_key"
+        ),
+    )
+
+
+class QueryLog(Base):
+    """
+    One statement run against a project database. The table is a ring
+    buffer: only the newest ``QUERY_LOG_SIZE`` rows are kept.
+    """
+
+    __tablename__ = "bus_query_log"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Hash of the normalized statement, shared by statements differing only
+    # in their literals.
+    fingerprint = Column(String(16), nullable=False, index=True)
+    statement = Column(Text, nullable=False)
+    # execute | data, or cache for pages served from the page cache
+    source = Column(String(16), nullable=False)
+    project_id = Column(String(255), index=True)
+    user_id = Column(String(255))
+    duration_ms = Column(Float, nullable=False)
+    rows = Column(Integer)
+    bytes = Column(Integer)
+    error = Column(Text)
+    recorded_at = Column(UTCDateTime, nullable=False)
@@ -1,5 +1,6 @@
 from sqlalchemy import create_engine as create_engine
 from .mysql_seed import Seed
+from src.db.utils.jobs import run_seed_job
 class MySQLAdapter:
     def __init__(self):
         self.connection = None
@@ -61,13 +62,18 @@ class MySQLAdapter:
             print("Error creating tables:", e)
             raise e
 
-    def initialize_metadata(self, project_id):
+    def initialize_metadata(self, project_id, job_id=None):
        
-        # Logic to initialize metadata for the project
+        # Logic to initialize metadata for the project, tracked as seed job job_id
         seed_data = Seed(project_id=project_id, adapter=self.connection)
-        seed_data.insert_metadata()
+        run_seed_job(seed_data, job_id)
             
 
+    def resync_metadata(self, project_id):
+        # Logic to apply catalog changes since the last seed/re-sync
+        seed_data = Seed(project_id=project_id, adapter=self.connection)
+        return seed_data.resync_metadata()
+
     def close_connection(self):
         # Logic to close the MySQL connection
         if self.connection:
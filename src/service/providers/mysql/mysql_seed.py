@@ -6,6 +6,13 @@ from sqlalchemy import create_engine, select, Table, MetaData, and_
 from fastapi import (
     Depends,
 )
+from src.db.utils.ingest import (
+    SEED_MODE,
+    GroupedColumnsReader,
+    read_schema_columns,
+    seed_catalog,
+)
+from src.db.utils.resync import resync_catalog
 
 # SUPPORTED_DATABASES = {
 #     "PostgreSQL": "PostgreSQL",
@@ -91,15 +98,10 @@ class Seed:
         finally:
             self.source_db.close()
 
-    async def insert_columns(self,source_db, table, schema, db):
-        from src.models import ColumnInfo, ColumnMetadata
+    async def insert_columns(self,source_db, table, schema, db, columns_result):
+        from src.models import ColumnMetadata
         try:
             print("insert_columns", table, schema)
-            columns_query = select(ColumnInfo.column_name, ColumnInfo.table_name).where(
-                ColumnInfo.table_name == table.table_name,
-            )
-            print("columns_query", columns_query)
-            columns_result = source_db.execute(columns_query).all()
             print("columns_result", columns_result)
             for column in columns_result:
                 # Check if column already exists
@@ -172,6 +174,9 @@ class Seed:
         )
 
         tables_result = source_db.execute(tables_query).all()
+        # One TABLE_SCHEMA-scoped scan for the whole schema instead of one
+        # unscoped information_schema.columns query per table.
+        schema_columns = read_schema_columns(source_db, schema_data.schema_name)
         for table in tables_result:
             # Check if table already exists
             existing_table = (
@@ -188,7 +193,13 @@ class Seed:
             #     table_name=existing_table.table_name, schema_name=existing_table.schema_name)
             if existing_table:
                 asyncio.create_task(
-                    self.insert_columns(source_db, existing_table, schema_data, db)
+                    self.insert_columns(
+                        source_db,
+                        existing_table,
+                        schema_data,
+                        db,
+                        schema_columns.get(existing_table.table_name, []),
+                    )
                 )
                 # Insert table if it does not exist
             else:
@@ -201,12 +212,27 @@ class Seed:
                 db.commit()
                 db.refresh(table_data)
                 
-                await self.insert_columns(source_db, table_data, schema_data, db)
+                await self.insert_columns(
+                    source_db,
+                    table_data,
+                    schema_data,
+                    db,
+                    schema_columns.get(table_data.table_name, []),
+                )
                 
 
-    def insert_metadata(self):
+    def insert_metadata(self, job=None):
         print("Inserting metadata on startup")
         print("self.adapter", self.adapter.url.database)
+        if SEED_MODE == "bulk":
+            seed_catalog(
+                self.adapter,
+                self.metadata_engine,
+                self.project_id,
+                self.catalog_reader(),
+                job=job,
+            )
+            return
         # db:Session = self.get_db(metadata_engine)
         # source_db:Session = self.get_source_db(self.adapter)
         with Session(self.metadata_engine) as db, Session(self.adapter) as source_db:
@@ -251,3 +277,17 @@ class Seed:
             # else:
             #     print("PostgreSQL or other db")
             #     asyncio.run(self.insert_schema(source_db, db))
+
+    def schema_filter(self):
+        from src.models import SchemaInfo
+
+        return SchemaInfo.schema_name == self.adapter.url.database
+
+    def catalog_reader(self):
+        return GroupedColumnsReader(self.schema_filter())
+
+    def resync_metadata(self, on_commit=None):
+        with Session(self.metadata_engine) as db, Session(self.adapter) as source_db:
+            return resync_catalog(
+                source_db, db, self.project_id, self.catalog_reader(), on_commit
+            )
@@ -0,0 +1,133 @@
+from decouple import config as decouple_config
+from sqlalchemy import bindparam, text
+
+from src.db.utils.ingest import SEED_BATCH_SIZE
+
+# Set to False to introspect PostgreSQL through information_schema instead.
+PG_CATALOG_INTROSPECTION = decouple_config(
+    "PG_CATALOG_INTROSPECTION", True, cast=bool
+)
+
+# information_schema.schemata lists the schemas the current user owns or has
+# privileges on; has_schema_privilege keeps pg_catalog reads equivalent.
+SCHEMAS_QUERY = text(
+    """
+    SELECT n.nspname AS schema_name
+    FROM pg_catalog.pg_namespace n
+    WHERE n.nspname NOT IN :exclude_schemas
+      AND n.nspname NOT LIKE 'pg\\_toast%'
+      AND n.nspname NOT LIKE 'pg\\_temp\\_%'
+      AND has_schema_privilege(n.oid, 'USAGE')
+    ORDER BY n.nspname
+    """
+).bindparams(bindparam("exclude_schemas", expanding=True))
+
+# One row per live column of every table, partition, view, materialized view
+# and foreign table in a schema, ordered by table, with the column's type,
+# default and key membership. The LEFT JOINs keep relations without columns
+# as a single row with NULL column fields.
+RELATIONS_QUERY = text(
+    """
+    SELECT n.nspname AS table_schema,
+           c.relname AS table_name,
+           a.attname AS column_name,
+           format_type(a.atttypid, a.atttypmod) AS data_type,
+           NOT a.attnotnull AS is_nullable,
+           a.attnum AS ordinal_position,
+           pg_get_expr(d.adbin, d.adrelid) AS column_default,
+           COALESCE(
+               (SELECT bool_or(i.indisprimary)
+                FROM pg_catalog.pg_index i
+                WHERE i.indrelid = c.oid AND a.attnum = ANY(i.indkey)),
+               false
+           ) AS is_primary_key,
+           COALESCE(
+               (SELECT json_agg(json_build_object(
+                           'name', ic.relname,
+                           'unique', i.indisunique,
+                           'primary', i.indisprimary,
+                           'position', array_position(i.indkey::int2[], a.attnum)))
+                FROM pg_catalog.pg_index i
+                JOIN pg_catalog.pg_class ic ON ic.oid = i.indexrelid
+                WHERE i.indrelid = c.oid AND a.attnum = ANY(i.indkey)),
+               '[]'::json
+           ) AS indexes,
+           COALESCE(
+               (SELECT json_agg(json_build_object(
+                           'name', con.conname,
+                           'schema', fn.nspname,
+                           'table', fc.relname,
+                           'column', fa.attname))
+                FROM pg_catalog.pg_constraint con
+                CROSS JOIN LATERAL unnest(con.conkey, con.confkey)
+                    AS k(attnum, confattnum)
+                JOIN pg_catalog.pg_class fc ON fc.oid = con.confrelid
+                JOIN pg_catalog.pg_namespace fn ON fn.oid = fc.relnamespace
+                JOIN pg_catalog.pg_attribute fa
+                  ON fa.attrelid = con.confrelid AND fa.attnum = k.confattnum
+                WHERE con.conrelid = c.oid
+                  AND con.contype = 'f'
+                  AND k.attnum = a.attnum),
+               '[]'::json
+           ) AS foreign_keys
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_attribute a
+      ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_catalog.pg_attrdef d
+      ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE n.nspname = :schema_name
+      AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+      AND has_table_privilege(c.oid, 'SELECT')
+    ORDER BY c.relname, a.attnum
+    """
+)
+
+# Size of the catalog RELATIONS_QUERY reads, for seed progress reporting.
+CATALOG_SIZE_QUERY = text(
+    """
+    SELECT count(DISTINCT c.oid) AS tables,
+           count(a.attnum) AS columns
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_attribute a
+      ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname IN :schema_names
+      AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+      AND has_table_privilege(c.oid, 'SELECT')
+    """
+).bindparams(bindparam("schema_names", expanding=True))
+
+
+class PgCatalogReader:
+    """
+    Reads a PostgreSQL catalog straight from ``pg_namespace``, ``pg_class``,
+    ``pg_attribute``, ``pg_attrdef``, ``pg_index`` and ``pg_constraint``.
+
+    Each schema is read with a single joined query streamed through a
+    server-side cursor, instead of going through the much slower
+    ``information_schema`` views.
+    """
+
+    def __init__(self, exclude_schemas, batch_size=SEED_BATCH_SIZE):
+        self.exclude_schemas = list(exclude_schemas)
+        self.batch_size = batch_size
+
+    def schema_names(self, source_db):
+        result = source_db.execute(
+            SCHEMAS_QUERY, {"exclude_schemas": self.exclude_schemas}
+        )
+        return result.scalars().all()
+
+    def catalog_size(self, source_db, schema_names):
+        size = source_db.execute(
+            CATALOG_SIZE_QUERY, {"schema_names": list(schema_names)}
+        ).one()
+        return size.tables, size.columns
+
+    def relations(self, source_db, schema_name):
+        return source_db.execute(
+            RELATIONS_QUERY,
+            {"schema_name": schema_name},
+            execution_options={"yield_per": self.batch_size},
+        )
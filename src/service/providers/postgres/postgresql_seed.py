@@ -6,6 +6,14 @@ from sqlalchemy import create_engine, select, Table, MetaData, and_
 from fastapi import (
     Depends,
 )
+from src.db.utils.ingest import (
+    SEED_BATCH_SIZE,
+    SEED_MODE,
+    InformationSchemaReader,
+    seed_catalog,
+)
+from src.db.utils.resync import resync_catalog
+from .postgresql_catalog import PG_CATALOG_INTROSPECTION, PgCatalogReader
 
 # SUPPORTED_DATABASES = {
 #     "PostgreSQL": "PostgreSQL",
@@ -99,8 +107,9 @@ class Seed:
                 ColumnInfo.table_name == table.table_name,
             )
             print("columns_query", columns_query)
-            columns_result = source_db.execute(columns_query).all()
-            print("columns_result", columns_result)
+            columns_result = source_db.execute(
+                columns_query, execution_options={"yield_per": SEED_BATCH_SIZE}
+            )
             for column in columns_result:
                 # Check if column already exists
                 existing_column = (
@@ -205,10 +214,35 @@ class Seed:
                 await self.insert_columns(source_db, table_data, schema_data, db)
                 
 
-    def insert_metadata(self):
+    def insert_metadata(self, job=None):
         print("Inserting metadata on startup")
         print("self.adapter", self.adapter.url.database)
+        if SEED_MODE == "bulk":
+            seed_catalog(
+                self.adapter,
+                self.metadata_engine,
+                self.project_id,
+                self.catalog_reader(),
+                job=job,
+            )
+            return
         # db:Session = self.get_db(metadata_engine)
         # source_db:Session = self.get_source_db(self.adapter)
         with Session(self.metadata_engine) as db, Session(self.adapter) as source_db:
             asyncio.run(self.insert_schema(source_db, db))
+
+    def schema_filter(self):
+        from src.models import SchemaInfo
+
+        return SchemaInfo.schema_name.notin_(exclude_schemas)
+
+    def catalog_reader(self):
+        if PG_CATALOG_INTROSPECTION:
+            return PgCatalogReader(exclude_schemas)
+        return InformationSchemaReader(self.schema_filter())
+
+    def resync_metadata(self, on_commit=None):
+        with Session(self.metadata_engine) as db, Session(self.adapter) as source_db:
+            return resync_catalog(
+                source_db, db, self.project_id, self.catalog_reader(), on_commit
+            )
@@ -0,0 +1,126 @@
+"""
+Celery worker for metadata seeding and re-syncs.
+
+Seeds and re-syncs run out of the API process, on one queue per dialect so a
+backlog of large MySQL projects cannot hold up PostgreSQL onboarding. Start a
+worker with:
+
+    celery -A src.worker worker -Q seed.postgresql,seed.mysql,seed.mariadb
+
+Seeding needs a broker: with the default ``memory://`` broker, which no
+worker process can read from, seeds are refused rather than run in the API
+process. ``CELERY_TASK_ALWAYS_EAGER`` runs tasks inline and is for tests only.
+"""
+from celery import Celery
+from decouple import config as decouple_config
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+CELERY_BROKER_URL = decouple_config("CELERY_BROKER_URL", "memory://")
+CELERY_RESULT_BACKEND = decouple_config("CELERY_RESULT_BACKEND", "cache+memory://")
+# Run tasks inline in the calling process. For tests only.
+CELERY_TASK_ALWAYS_EAGER = decouple_config(
+    "CELERY_TASK_ALWAYS_EAGER", False, cast=bool
+)
+CELERY_WORKER_CONCURRENCY = decouple_config("CELERY_WORKER_CONCURRENCY", 2, cast=int)
+
+celery_app = Celery("bus", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.update(
+    task_always_eager=CELERY_TASK_ALWAYS_EAGER,
+    worker_concurrency=CELERY_WORKER_CONCURRENCY,
+    # Seeds are long; don't let one worker reserve several of them.
+    worker_prefetch_multiplier=1,
+    # Redeliver seeds whose worker died; the job claim keeps this idempotent.
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    task_default_queue="seed.postgresql",
+)
+
+
+class BrokerNotConfigured(Exception):
+    pass
+
+
+def seed_queue(dialect):
+    """Name of the queue seeding projects of ``dialect``."""
+    return f"seed.{dialect}"
+
+
+def seed_task_id(project_id, job_id):
+    """
+    Deterministic task id for a project's seed job, so re-enqueuing the same
+    job is recognisable in the result backend and by ``celery inspect``.
+    """
+    return f"seed:{project_id}:{job_id}"
+
+
+def resync_task_id(project_id, job_id):
+    """Deterministic task id for a project's re-sync job, like ``seed_task_id``."""
+    return f"resync:{project_id}:{job_id}"
+
+
+def project_seed(project_id):
+    """The dialect's seed of a project, on the project's pooled engine."""
+    from src.db.config import get_seed, metadata_engine
+    from src.db.utils.engines import get_engine
+    from src.projects.models import ProjectModel
+
+    with Session(metadata_engine) as db:
+        project = db.execute(
+            select(
+                ProjectModel.db_connection_string, ProjectModel.pool_settings
+            ).where(ProjectModel.id == project_id)
+        ).one()
+    source_engine = get_engine(project.db_connection_string, project.pool_settings)
+    return get_seed(source_engine, project_id)
+
+
+@celery_app.task(name="seed_project")
+def seed_project(project_id, job_id):
+    """
+    Seed a project's metadata as seed job ``job_id``. Runs only if the job can
+    be claimed, so duplicate deliveries of the same job are no-ops.
+    """
+    from src.db.utils.jobs import run_seed_job
+
+    return run_seed_job(project_seed(project_id), job_id)
+
+
+@celery_app.task(name="resync_project")
+def resync_project(project_id, job_id):
+    """Re-sync a project's metadata as job ``job_id``, claimed like a seed."""
+    from src.db.utils.jobs import run_resync_job
+
+    return run_resync_job(project_seed(project_id), job_id)
+
+
+def check_broker():
+    """
+    Raises:
+        BrokerNotConfigured: No worker could ever receive a seed.
+    """
+    conf = celery_app.conf
+    if not conf.task_always_eager and conf.broker_url.startswith("memory://"):
+        raise BrokerNotConfigured(
+            "Seeding needs a Celery broker; set CELERY_BROKER_URL and start a worker."
+        )
+
+
+def enqueue_seed(project_id, job_id, dialect):
+    """Queue a project's seed on its dialect's queue."""
+    check_broker()
+    seed_project.apply_async(
+        args=(project_id, job_id),
+        task_id=seed_task_id(project_id, job_id),
+        queue=seed_queue(dialect),
+    )
+
+
+def enqueue_resync(project_id, job_id, dialect):
+    """Queue a project's re-sync on its dialect's queue."""
+    check_broker()
+    resync_project.apply_async(
+        args=(project_id, job_id),
+        task_id=resync_task_id(project_id, job_id),
+        queue=seed_queue(dialect),
+    )
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from src.db.utils.async_engine import async_url, ping, run_sync
+from src.db.utils.engines import engine_registry
+
+
+@pytest.mark.parametrize(
+    "db_url, expected",
+    [
+        (
+            "postgresql+psycopg2://u:p@db/app?sslmode=require",
+            "postgresql+asyncpg://u:p@db/app?ssl=require",
+        ),
+        ("mysql+mysqlconnector://u:p@db/app", "mysql+asyncmy://u:p@db/app"),
+        ("mariadb+mariadbconnector://u:p@db/app", "mariadb+asyncmy://u:p@db/app"),
+    ],
+)
+def test_async_url(db_url, expected):
+    """Test connection strings are moved to their async drivers."""
+    assert async_url(db_url).render_as_string(hide_password=False) == expected
+
+
+def test_blocking_fallback(tmp_path):
+    """Test dialects without an async driver run on the blocking engine."""
+    db_url = f"sqlite:///{tmp_path / 'app.db'}"
+
+    async def run():
+        assert engine_registry.get_async(db_url) is None
+        assert await ping(db_url)
+        return await run_sync(
+            db_url, lambda connection: connection.execute(text("SELECT 2")).scalar_one()
+        )
+
+    try:
+        assert asyncio.run(run()) == 2
+    finally:
+        engine_registry.dispose(db_url)
@@ -0,0 +1,91 @@
+import pytest
+
+from src.db.utils.cache import PageCache, estimate_size, written_tables
+
+
+def key(table, page=1, schema="public", db_url="db"):
+    return (db_url, schema, table, page)
+
+
+def test_lru_eviction_by_entries():
+    """Test the least recently used page is evicted first."""
+    cache = PageCache(ttl=60, max_entries=2, max_bytes=10**6)
+    cache.set(key("a"), "a", 1)
+    cache.set(key("b"), "b", 1)
+    cache.get(key("a"))
+    cache.set(key("c"), "c", 1)
+
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_budget():
+    """Test pages are evicted to stay within the byte budget."""
+    cache = PageCache(ttl=60, max_entries=100, max_bytes=100)
+    cache.set(key("a"), "a", 60)
+    cache.set(key("b"), "b", 60)
+    cache.set(key("huge"), "huge", 101)
+
+    assert cache.get(key("a")) is None
+    assert cache.get(key("b")) == "b"
+    assert cache.get(key("huge")) is None
+    assert cache.stats()["bytes"] == 60
+
+
+def test_ttl(monkeypatch):
+    """Test expired pages are misses."""
+    now = [1000.0]
+    monkeypatch.setattr("src.db.utils.cache.time.monotonic", lambda: now[0])
+    cache = PageCache(ttl=10, max_entries=10, max_bytes=10**6)
+    cache.set(key("a"), "a", 1)
+    now[0] += 11
+
+    assert cache.get(key("a")) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_tables():
+    """Test invalidation drops every page of the written table only."""
+    cache = PageCache(ttl=60, max_entries=10, max_bytes=10**6)
+    cache.set(key("users", 1), 1, 1)
+    cache.set(key("users", 2), 2, 1)
+    cache.set(key("users", schema="other"), 3, 1)
+    cache.set(key("orders"), 4, 1)
+    cache.set(key("users", db_url="other"), 5, 1)
+
+    assert cache.invalidate("db", [("public", "users")]) == 2
+    assert cache.invalidate("db", [(None, "users")]) == 1
+    assert cache.get(key("orders")) == 4
+    assert cache.invalidate("db") == 1
+    assert cache.get(key("users", db_url="other")) == 5
+
+
+def test_invalidate_ignores_case():
+    """Test a write to ``Shop.Users`` drops the pages cached under ``shop.users``."""
+    cache = PageCache(ttl=60, max_entries=10, max_bytes=10**6)
+    cache.set(PageCache.key("db", "shop", "users", 1), 1, 1)
+    cache.set(PageCache.key("db", "Shop", "Orders", 1), 2, 1)
+
+    assert cache.invalidate("db", [("Shop", "Users")]) == 1
+    assert cache.invalidate("db", [(None, "orders")]) == 1
+
+
+@pytest.mark.parametrize(
+    "sql, tables",
+    [
+        ("INSERT INTO public.users (id) VALUES (1)", [("public", "users")]),
+        ("update `shop`.`orders` set x = 1", [("shop", "orders")]),
+        ('DELETE FROM "Users" WHERE name = \'update logs\'', [(None, "Users")]),
+        ("TRUNCATE TABLE logs", [(None, "logs")]),
+        ("CREATE INDEX i ON users (id)", []),
+    ],
+)
+def test_written_tables(sql, tables):
+    """Test write targets are found and string literals are ignored."""
+    assert written_tables(sql) == tables
+
+
+def test_estimate_size_grows_with_rows():
+    """Test the size estimate accounts for row values."""
+    assert estimate_size([(1, "a" * 100)] * 2) > estimate_size([(1, "a")])
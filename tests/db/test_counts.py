@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, func, select
+
+from src.db.utils.counts import RowCountCache, count_rows, count_sql, page_and_total
+
+metadata = MetaData()
+items = Table("items", metadata, Column("id", Integer, primary_key=True))
+
+
+def make_engine(tmp_path, rows):
+    engine = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(items.insert(), [{"id": i} for i in range(rows)])
+    return engine
+
+
+def test_estimate_falls_back_to_exact_without_statistics(tmp_path):
+    engine = make_engine(tmp_path, 3)
+    with engine.connect() as connection:
+        assert count_rows(connection, engine, items, "estimate") == (3, "exact")
+
+
+def test_count_sql_names_the_statement_run(tmp_path):
+    """Test counts are logged as the statement that produced them."""
+    engine = make_engine(tmp_path, 3)
+    with engine.connect() as connection:
+        assert count_sql(connection, items, "exact", [items.c.id > 1]) == str(
+            select(func.count()).select_from(items).where(items.c.id > 1)
+        )
+        # SQLite has no estimates, and cached counts run nothing.
+        assert count_sql(connection, items, "cached") is None
+
+
+def test_cache_serves_background_count_until_invalidated(tmp_path):
+    """Test a cold cache schedules a count and later requests reuse it."""
+    engine = make_engine(tmp_path, 5)
+    cache = RowCountCache(ttl=60, workers=1)
+
+    assert cache.get(engine, items) is None
+    cache.executor.shutdown(wait=True)
+    with engine.begin() as connection:
+        connection.execute(items.insert(), [{"id": 100}])
+
+    assert cache.get(engine, items) == 5
+    cache.invalidate(engine, items)
+    assert cache.key(engine, items) not in cache.counts
+
+
+def connection_runner(engine):
+    async def run(fn):
+        def read():
+            with engine.connect() as connection:
+                return fn(connection)
+
+        return await asyncio.to_thread(read)
+
+    return run
+
+
+def test_page_and_total_run_concurrently(tmp_path):
+    """Test the count and the page run at the same time on their own connections."""
+    engine = make_engine(tmp_path, 4)
+    # Each query waits for the other to start, so running them one after
+    # the other breaks the barrier.
+    started = threading.Barrier(2, timeout=5)
+    connections = []
+
+    def fetch_page(connection):
+        started.wait()
+        connections.append(connection)
+        return connection.execute(select(items.c.id).limit(2)).scalars().all()
+
+    def fetch_total(connection):
+        started.wait()
+        connections.append(connection)
+        return count_rows(connection, engine, items)
+
+    total, page = asyncio.run(
+        page_and_total(connection_runner(engine), fetch_page, fetch_total)
+    )
+
+    assert total == (4, "exact")
+    assert page == [0, 1]
+    assert connections[0] is not connections[1]
+
+
+def test_page_and_total_skips_count():
+    """Test count=none returns no total and only runs the page query."""
+    ran = []
+
+    async def run(fn):
+        ran.append(fn)
+        return fn(None)
+
+    def fetch_page(connection):
+        return ["row"]
+
+    total, page = asyncio.run(page_and_total(run, fetch_page))
+
+    assert total == (None, "none")
+    assert page == ["row"]
+    assert ran == [fetch_page]
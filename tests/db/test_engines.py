@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import text
+
+from src.db.utils.engines import (
+    ConnectionLimiter,
+    ConnectionLimitReached,
+    EngineRegistry,
+    normalize_url,
+    pool_options,
+)
+
+URL = "postgresql+psycopg2://u:p@db/{}"
+
+
+def test_normalize_url():
+    """Test spellings of the same database normalize to one key."""
+    assert (
+        normalize_url("postgresql://u:p@DB/app?b=2&a=1")
+        == normalize_url("postgresql+psycopg2://u:p@db:5432/app?a=1&b=2")
+        == "postgresql+psycopg2://u:p@db:5432/app?a=1&b=2"
+    )
+    assert normalize_url("postgresql://u:p@db/app") != normalize_url(
+        "postgresql://u:other@db/app"
+    )
+
+
+def test_pool_options_overrides():
+    """Test project settings override the defaults and unknown keys are ignored."""
+    options = pool_options({"pool_size": 20, "max_overflow": None, "echo": True})
+
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == pool_options()["max_overflow"]
+    assert "echo" not in options
+
+
+def test_engines_are_shared_and_sized():
+    """Test one engine per database, built with the project's pool size."""
+    registry = EngineRegistry(max_engines=4)
+    engine = registry.get(URL.format("a"), {"pool_size": 7})
+
+    assert registry.get("postgresql://u:p@db:5432/a", {"pool_size": 7}) is engine
+    assert engine.pool.size() == 7
+
+
+def test_pool_settings_are_part_of_the_key():
+    """Test other pool settings get their own engine without disposing the first."""
+    registry = EngineRegistry(max_engines=4)
+    small = registry.get(URL.format("a"), {"pool_size": 2})
+    small_pool = small.pool
+
+    large = registry.get(URL.format("a"), {"pool_size": 3})
+
+    assert large is not small
+    assert registry.get(URL.format("a"), {"pool_size": 2}) is small
+    assert registry.get(URL.format("a")) is registry.get(URL.format("a"), {})
+    assert small.pool is small_pool
+
+    registry.dispose(URL.format("a"))
+    registry.executor.shutdown(wait=True)
+    assert not registry.entries
+    assert small.pool is not small_pool
+
+
+def test_lru_eviction_disposes():
+    """Test the least recently used engine is disposed when the registry is full."""
+    registry = EngineRegistry(max_engines=2)
+    first = registry.get(URL.format("a"))
+    first_pool = first.pool
+    second = registry.get(URL.format("b"))
+    second_pool = second.pool
+    registry.get(URL.format("a"))
+    registry.get(URL.format("c"))
+    registry.executor.shutdown(wait=True)
+
+    assert [url for url, _ in registry.entries] == [
+        normalize_url(URL.format("a")),
+        normalize_url(URL.format("c")),
+    ]
+    assert second.pool is not second_pool
+    assert first.pool is first_pool
+    assert registry.stats()["disposed"] == 1
+
+
+def test_idle_engines_are_dropped(monkeypatch):
+    """Test engines unused for longer than the idle timeout are disposed."""
+    now = [1000.0]
+    monkeypatch.setattr("src.db.utils.engines.time.monotonic", lambda: now[0])
+    registry = EngineRegistry(max_engines=4, idle_timeout=60)
+    registry.get(URL.format("a"))
+    now[0] += 61
+    registry.get(URL.format("b"))
+
+    assert [url for url, _ in registry.entries] == [normalize_url(URL.format("b"))]
+
+
+def test_connection_limit(tmp_path):
+    """Test checkouts beyond the process limit fail and slots are released on checkin."""
+    limiter = ConnectionLimiter(limit=1, wait=0)
+    registry = EngineRegistry(limiter=limiter)
+    engine = registry.get(f"sqlite:///{tmp_path / 'app.db'}")
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert registry.stats()["connections_in_use"] == 1
+        with pytest.raises(ConnectionLimitReached):
+            engine.connect()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar_one() == 1
+
+    stats = registry.stats()
+    assert stats["connections_in_use"] == 0
+    assert stats["pools"][0]["sync"]["checkedout"] == 0
+    registry.dispose()
+
@@ -0,0 +1,93 @@
+import datetime
+
+import pytest
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    select,
+)
+
+from src.db.utils.filters import InvalidFilter, coerce_value, parse_filters, parse_sort
+
+metadata = MetaData()
+people = Table(
+    "people",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("born", Date),
+    Column("active", Boolean),
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            people.insert(),
+            [
+                {"id": 1, "name": "ada", "born": datetime.date(1990, 1, 1), "active": True},
+                {"id": 2, "name": "bob", "born": None, "active": False},
+                {"id": 3, "name": "cy", "born": datetime.date(2001, 5, 2), "active": True},
+            ],
+        )
+    return engine
+
+
+def ids(engine, specs):
+    query = select(people.c.id).where(*parse_filters(people, specs)).order_by(people.c.id)
+    with engine.connect() as connection:
+        return connection.execute(query).scalars().all()
+
+
+def test_coerce_value_uses_column_types():
+    """Test query-string values are converted to the column's Python type."""
+    assert coerce_value(people.c.id, "18") == 18
+    assert coerce_value(people.c.born, "2001-05-02") == datetime.date(2001, 5, 2)
+    assert coerce_value(people.c.active, "false") is False
+    with pytest.raises(InvalidFilter):
+        coerce_value(people.c.id, "eighteen")
+
+
+def test_filters_run_in_sql(engine):
+    """Test comparison, in, like and null filters select the matching rows."""
+    assert ids(engine, ["id:gte:2"]) == [2, 3]
+    assert ids(engine, ["id:in:1,3"]) == [1, 3]
+    assert ids(engine, ["name:like:%b%"]) == [2]
+    assert ids(engine, ["born:is_null"]) == [2]
+    assert ids(engine, ["active:eq:true", "born:gt:1995-01-01"]) == [3]
+
+
+def test_filters_are_bound_parameters():
+    """Test filter values never end up in the SQL text."""
+    (clause,) = parse_filters(people, ["name:eq:x' OR '1'='1"])
+
+    assert "OR" not in str(clause)
+
+
+@pytest.mark.parametrize("spec", ["missing:eq:1", "id:between:1", "name"])
+def test_invalid_filters(spec):
+    """Test unknown columns and operators are rejected."""
+    with pytest.raises(InvalidFilter):
+        parse_filters(people, [spec])
+
+
+def test_parse_sort():
+    """Test sorts accept repeated and comma-separated columns."""
+    sort = parse_sort(people, ["-born,name", "id"])
+
+    assert [(column.name, desc) for column, desc in sort] == [
+        ("born", True),
+        ("name", False),
+        ("id", False),
+    ]
+    with pytest.raises(InvalidFilter):
+        parse_sort(people, ["-missing"])
@@ -0,0 +1,99 @@
+import asyncio
+import datetime
+import decimal
+import json
+
+import pytest
+from sqlalchemy import DateTime, Integer, Numeric
+
+from src.db.utils.formats import (
+    ARROW_MEDIA_TYPE,
+    arrow_ipc,
+    columnar_payload,
+    cut_short_on_error,
+    format_result,
+    negotiate_format,
+)
+
+KEYS = ["id", "amount", "paid_at"]
+ROWS = [
+    (1, decimal.Decimal("9.50"), datetime.datetime(2024, 1, 2, 3, 4, 5)),
+    (2, decimal.Decimal("10"), None),
+]
+
+
+def test_negotiates_arrow_from_accept_header():
+    assert negotiate_format(None, f"{ARROW_MEDIA_TYPE}, */*") == "arrow"
+    assert negotiate_format("rows", ARROW_MEDIA_TYPE) == "rows"
+    assert negotiate_format(None, "application/json") == "records"
+
+
+def test_columnar_layouts():
+    assert columnar_payload(KEYS, ROWS, "rows") == {
+        "columns": KEYS,
+        "rows": [list(row) for row in ROWS],
+    }
+    assert columnar_payload(KEYS, ROWS, "columns", batch_size=1) == {
+        "data": {
+            "id": [1, 2],
+            "amount": [decimal.Decimal("9.50"), decimal.Decimal("10")],
+            "paid_at": [ROWS[0][2], None],
+        }
+    }
+    assert columnar_payload(KEYS, [], "columns") == {
+        "data": {"id": [], "amount": [], "paid_at": []}
+    }
+
+
+def test_json_formats_encode_like_records():
+    """Test columnar JSON encodes values the way FastAPI encodes records."""
+    response = format_result(KEYS, ROWS, "rows", {"total": 2})
+
+    assert json.loads(response.body) == {
+        "columns": KEYS,
+        "rows": [[1, 9.5, "2024-01-02T03:04:05"], [2, 10, None]],
+        "total": 2,
+    }
+    assert format_result(KEYS, ROWS[:1], "records", {"total": 1}) == {
+        "data": [dict(zip(KEYS, ROWS[0]))],
+        "total": 1,
+    }
+
+
+def test_arrow_streams_batches_with_column_types():
+    """Test Arrow takes its schema from the column types and streams each batch."""
+    pa = pytest.importorskip("pyarrow")
+    # The first batch alone would infer null columns.
+    batches = [[(1, None, None)] * 3, ROWS]
+    response = arrow_ipc(
+        KEYS, iter(batches), {"total": 5}, [Integer(), Numeric(10, 2), DateTime()]
+    )
+
+    async def read_chunks():
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = asyncio.run(read_chunks())
+    reader = pa.ipc.open_stream(b"".join(chunks))
+    table = reader.read_all()
+
+    # One chunk per record batch, then the end of the stream.
+    assert len(chunks) == 3
+    assert table.schema.types == [pa.int64(), pa.decimal128(10, 2), pa.timestamp("us")]
+    assert reader.schema.metadata == {b"total": b"5"}
+    assert table.to_pylist()[3:] == [dict(zip(KEYS, row)) for row in ROWS]
+
+
+def test_failed_stream_is_logged_and_cut_short(caplog):
+    """Test a body failing mid-stream keeps what was sent, logs, and re-raises."""
+
+    def chunks():
+        yield b"first\n"
+        raise RuntimeError("connection lost")
+
+    sent = []
+    with pytest.raises(RuntimeError):
+        for chunk in cut_short_on_error(chunks(), "export of public.users"):
+            sent.append(chunk)
+
+    assert sent == [b"first\n"]
+    assert "Error streaming export of public.users" in caplog.text
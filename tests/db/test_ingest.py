@@ -0,0 +1,226 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from src.models import Base, ColumnInfo, ColumnMetadata, TableInfo
+from src.schema import SchemaMetadata, TableMetadata
+from src.db.utils.ingest import (
+    InformationSchemaReader,
+    MetadataWriter,
+    RelationRow,
+    seed_catalog,
+    stream_schema_columns,
+)
+
+
+@pytest.fixture
+def metadata_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[
+            SchemaMetadata.__table__,
+            TableMetadata.__table__,
+            ColumnMetadata.__table__,
+        ],
+    )
+    with Session(engine) as session:
+        yield session
+
+
+class TestMetadataWriter:
+    """Test set-based metadata ingestion."""
+
+    def write_catalog(self, db, batch_size=2):
+        writer = MetadataWriter(db, "proj_123")
+        schema_ids = writer.write_schemas(["public", "sales"])
+        writer.write_relations(
+            schema_ids,
+            [
+                RelationRow("missing", "table", "id"),
+                RelationRow("public", "empty", None),
+                RelationRow("public", "users", "id"),
+                RelationRow("public", "users", "email"),
+                RelationRow("sales", "orders", "id"),
+            ],
+            batch_size=batch_size,
+        )
+        table_ids = dict(
+            db.execute(select(TableMetadata.table_name, TableMetadata.id)).all()
+        )
+        return schema_ids, table_ids
+
+    def test_writes_every_level(self, metadata_db):
+        """Test schemas, tables and columns are linked by id."""
+        schema_ids, table_ids = self.write_catalog(metadata_db)
+
+        assert set(schema_ids) == {"public", "sales"}
+        assert set(table_ids) == {"empty", "users", "orders"}
+        columns = metadata_db.execute(
+            select(ColumnMetadata).where(ColumnMetadata.table_id == table_ids["users"])
+        ).scalars().all()
+        assert {column.column_name for column in columns} == {"id", "email"}
+        assert {column.schema_id for column in columns} == {schema_ids["public"]}
+
+    def test_rerun_skips_existing_rows(self, metadata_db):
+        """Test a second ingestion does not duplicate metadata."""
+        first_schema_ids, first_table_ids = self.write_catalog(metadata_db)
+        second_schema_ids, second_table_ids = self.write_catalog(
+            metadata_db, batch_size=10
+        )
+
+        assert first_schema_ids == second_schema_ids
+        assert first_table_ids == second_table_ids
+        total_columns = metadata_db.execute(
+            select(func.count()).select_from(ColumnMetadata)
+        ).scalar_one()
+        assert total_columns == 3
+
+
+@pytest.fixture
+def information_schema_db():
+    """A source database whose ``information_schema.columns`` is a plain table."""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def attach_information_schema(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS information_schema")
+
+    ColumnInfo.__table__.create(bind=engine)
+    with Session(engine) as session:
+        yield session
+
+
+def test_stream_schema_columns_pages_without_server_side_cursors(
+    information_schema_db,
+):
+    """Test the keyset fallback returns every column once, in order."""
+    rows = [
+        {
+            "table_catalog": "def",
+            "table_schema": schema_name,
+            "table_name": table_name,
+            "column_name": f"c{position}",
+            "ordinal_position": position,
+        }
+        for schema_name in ("public", "other")
+        for table_name in ("a", "b", "c")
+        for position in range(1, 4)
+    ]
+    information_schema_db.execute(insert(ColumnInfo), rows)
+
+    columns = list(
+        stream_schema_columns(information_schema_db, "public", batch_size=2)
+    )
+
+    assert [(c.table_name, c.ordinal_position) for c in columns] == [
+        (table_name, position)
+        for table_name in ("a", "b", "c")
+        for position in range(1, 4)
+    ]
+
+
+def test_reader_streams_keys_per_batch_of_tables(information_schema_db):
+    """Test keys reflected one table batch at a time land on the right columns,
+    with each column's position in its index key."""
+    for statement in (
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)",
+        "CREATE UNIQUE INDEX users_email_id ON users (email, id)",
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id))",
+        "CREATE TABLE notes (body TEXT)",
+    ):
+        information_schema_db.execute(text(statement))
+    TableInfo.__table__.create(bind=information_schema_db.connection())
+    catalog = {"users": ["id", "email"], "orders": ["id", "user_id"], "notes": ["body"]}
+    information_schema_db.execute(
+        insert(TableInfo),
+        [
+            {"table_catalog": "def", "table_schema": "main", "table_name": table_name}
+            for table_name in catalog
+        ],
+    )
+    information_schema_db.execute(
+        insert(ColumnInfo),
+        [
+            {
+                "table_catalog": "def",
+                "table_schema": "main",
+                "table_name": table_name,
+                "column_name": column_name,
+                "ordinal_position": position,
+            }
+            for table_name, column_names in catalog.items()
+            for position, column_name in enumerate(column_names, start=1)
+        ],
+    )
+
+    rows = InformationSchemaReader(None, batch_size=1).relations(
+        information_schema_db, "main"
+    )
+    keys = {
+        (row.table_name, row.column_name): (
+            row.is_primary_key,
+            [
+                (index["name"], index["primary"], index["position"])
+                for index in row.indexes
+            ],
+            [(fk["table"], fk["column"]) for fk in row.foreign_keys],
+        )
+        for row in rows
+    }
+
+    assert keys == {
+        ("notes", "body"): (False, [], []),
+        ("orders", "id"): (True, [(None, True, 1)], []),
+        ("orders", "user_id"): (False, [], [("users", "id")]),
+        ("users", "email"): (False, [("users_email_id", False, 1)], []),
+        ("users", "id"): (True, [(None, True, 1), ("users_email_id", False, 2)], []),
+    }
+
+
+class ParallelReader:
+    """A catalog reader whose schemas can only be read side by side."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.started = threading.Barrier(len(catalog), timeout=5)
+        self.sessions = {}
+
+    def schema_names(self, source_db):
+        return list(self.catalog)
+
+    def relations(self, source_db, schema_name):
+        self.sessions[schema_name] = source_db
+        self.started.wait()
+        for table_name, column_names in self.catalog[schema_name].items():
+            for column_name in column_names:
+                yield RelationRow(schema_name, table_name, column_name)
+
+
+def test_seed_catalog_reads_schemas_in_parallel_sessions(tmp_path):
+    """Test every schema is seeded by its own worker on its own sessions."""
+    metadata_engine = create_engine(f"sqlite:///{tmp_path / 'metadata.db'}")
+    Base.metadata.create_all(
+        bind=metadata_engine,
+        tables=[
+            SchemaMetadata.__table__,
+            TableMetadata.__table__,
+            ColumnMetadata.__table__,
+        ],
+    )
+    reader = ParallelReader(
+        {"public": {"users": ["id", "email"]}, "sales": {"orders": ["id"]}}
+    )
+
+    seed_catalog(
+        create_engine("sqlite://"), metadata_engine, "proj_123", reader, parallelism=2
+    )
+
+    assert reader.sessions["public"] is not reader.sessions["sales"]
+    with Session(metadata_engine) as db:
+        stored = db.execute(
+            select(ColumnMetadata.schema_name, ColumnMetadata.column_name)
+        ).all()
+    assert sorted(stored) == [("public", "email"), ("public", "id"), ("sales", "id")]
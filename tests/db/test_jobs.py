@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from src.models import Base, ColumnMetadata
+from src.schema import SchemaMetadata, SeedCheckpoint, SeedJob, TableMetadata
+from src.db.utils.ingest import RelationRow, SeedFailed, seed_catalog
+from src.db.utils.jobs import SeedJobTracker, can_resume, create_seed_job
+
+
+class FakeReader:
+    """Catalog reader serving a fixed catalog, optionally failing one schema."""
+
+    def __init__(self, catalog, failing=None):
+        self.catalog = catalog
+        self.failing = failing
+        self.read = []
+
+    def schema_names(self, source_db):
+        return list(self.catalog)
+
+    def catalog_size(self, source_db, schema_names):
+        tables = sum(len(self.catalog[name]) for name in schema_names)
+        columns = sum(
+            len(columns)
+            for name in schema_names
+            for columns in self.catalog[name].values()
+        )
+        return tables, columns
+
+    def relations(self, source_db, schema_name):
+        self.read.append(schema_name)
+        for table_name, columns in self.catalog[schema_name].items():
+            for column_name in columns:
+                if schema_name == self.failing:
+                    raise RuntimeError("connection lost")
+                yield RelationRow(schema_name, table_name, column_name)
+
+
+CATALOG = {
+    "public": {"users": ["id", "email"], "orders": ["id"]},
+    "sales": {"invoices": ["id", "total"]},
+}
+
+
+@pytest.fixture
+def metadata_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metadata.db'}")
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[
+            SchemaMetadata.__table__,
+            TableMetadata.__table__,
+            ColumnMetadata.__table__,
+            SeedJob.__table__,
+            SeedCheckpoint.__table__,
+        ],
+    )
+    return engine
+
+
+def run(metadata_engine, job_id, reader):
+    tracker = SeedJobTracker(metadata_engine, job_id)
+    assert tracker.claim()
+    try:
+        seed_catalog(
+            metadata_engine, metadata_engine, "proj_123", reader, parallelism=1, job=tracker
+        )
+    except SeedFailed as e:
+        tracker.finish(error=e)
+    else:
+        tracker.finish()
+
+
+class TestSeedJobTracking:
+    """Test seed job progress, checkpoints and resume."""
+
+    def test_records_progress_and_checkpoints(self, metadata_engine):
+        """Test a completed seed counts every schema, table and column."""
+        with Session(metadata_engine) as db:
+            job_id = create_seed_job(db, "proj_123").id
+
+        run(metadata_engine, job_id, FakeReader(CATALOG))
+
+        with Session(metadata_engine) as db:
+            job = db.get(SeedJob, job_id)
+            assert job.status == "completed"
+            assert (job.schemas_done, job.schemas_total) == (2, 2)
+            assert (job.tables_done, job.tables_total) == (3, 3)
+            assert (job.columns_done, job.columns_total) == (5, 5)
+            assert job.finished_at is not None
+            assert {checkpoint.status for checkpoint in job.checkpoints} == {
+                "completed"
+            }
+
+    def test_resume_skips_completed_schemas(self, metadata_engine):
+        """Test a resumed job only re-reads schemas that did not complete."""
+        with Session(metadata_engine) as db:
+            job_id = create_seed_job(db, "proj_123").id
+
+        run(metadata_engine, job_id, FakeReader(CATALOG, failing="sales"))
+
+        with Session(metadata_engine) as db:
+            job = db.get(SeedJob, job_id)
+            assert job.status == "failed"
+            assert job.error == "sales: connection lost"
+            assert can_resume(job)
+            statuses = {c.schema_name: c.status for c in job.checkpoints}
+            assert statuses == {"public": "completed", "sales": "failed"}
+
+        reader = FakeReader(CATALOG)
+        run(metadata_engine, job_id, reader)
+
+        assert reader.read == ["sales"]
+        with Session(metadata_engine) as db:
+            job = db.get(SeedJob, job_id)
+            assert job.status == "completed"
+            assert job.error is None
+            assert (job.schemas_done, job.tables_done, job.columns_done) == (2, 3, 5)
+            total_columns = db.execute(
+                select(func.count()).select_from(ColumnMetadata)
+            ).scalar_one()
+            assert total_columns == 5
+
+    def test_running_job_is_claimed_once(self, metadata_engine):
+        """Test a duplicate delivery of a running job does not start it twice."""
+        with Session(metadata_engine) as db:
+            job_id = create_seed_job(db, "proj_123").id
+        tracker = SeedJobTracker(metadata_engine, job_id)
+
+        assert tracker.claim()
+        assert not tracker.claim()
+        assert tracker.claim(now=datetime.now(timezone.utc) + timedelta(hours=1))
+
+    def test_completed_job_cannot_resume(self, metadata_engine):
+        with Session(metadata_engine) as db:
+            job = create_seed_job(db, "proj_123")
+            job.status = "completed"
+
+            assert not can_resume(job)
+
+    def test_timestamps_read_back_as_utc(self, metadata_engine):
+        """Test job times are aware UTC datetimes, even on SQLite."""
+        with Session(metadata_engine) as db:
+            job_id = create_seed_job(db, "proj_123").id
+        SeedJobTracker(metadata_engine, job_id).claim()
+
+        with Session(metadata_engine) as db:
+            job = db.get(SeedJob, job_id)
+            assert job.started_at.tzinfo == timezone.utc
+            assert job.created_at <= job.updated_at <= datetime.now(timezone.utc)
+            assert not can_resume(job)
+            assert can_resume(job, now=job.updated_at + timedelta(hours=1))
@@ -0,0 +1,138 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from src.db.migrations import DuplicateRows, upgrade_metadata
+
+# The catalog tables as created before their new columns and constraints.
+OLD_TABLES = [
+    """CREATE TABLE bus_projects (
+        id VARCHAR(255) PRIMARY KEY, project_name VARCHAR(255) NOT NULL,
+        db_connection_string VARCHAR(255) NOT NULL, created_by VARCHAR(255),
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE bus_metadata (
+        id VARCHAR(255) PRIMARY KEY, schema_name VARCHAR(255),
+        project_id VARCHAR(255) NOT NULL,
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE table_metadata (
+        id VARCHAR(255) PRIMARY KEY, table_name VARCHAR(255),
+        schema_name VARCHAR(255), schema_id VARCHAR(255) NOT NULL,
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE column_metadata (
+        id VARCHAR(255) PRIMARY KEY, column_name VARCHAR(255),
+        table_name VARCHAR(255), table_id VARCHAR(255) NOT NULL,
+        schema_name VARCHAR(255), schema_id VARCHAR(255) NOT NULL,
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE bus_seed_jobs (
+        id VARCHAR(255) PRIMARY KEY, project_id VARCHAR(255) NOT NULL,
+        status VARCHAR(32) NOT NULL,
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)""",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metadata.db'}")
+    with engine.begin() as connection:
+        for statement in OLD_TABLES:
+            connection.execute(text(statement))
+    return engine
+
+
+def columns(engine, table_name):
+    return {column["name"] for column in inspect(engine).get_columns(table_name)}
+
+
+def test_upgrade_adds_missing_columns_once(engine):
+    """Test old tables gain the new model columns and a rerun changes nothing."""
+    upgrade_metadata(engine)
+    upgrade_metadata(engine)
+
+    assert {
+        "pool_settings",
+        "statement_timeout",
+        "read_replicas",
+        "max_replica_lag",
+    } <= columns(engine, "bus_projects")
+    assert "fingerprint" in columns(engine, "bus_metadata")
+    assert "fingerprint" in columns(engine, "table_metadata")
+    assert {"data_type", "is_primary_key", "indexes", "foreign_keys"} <= columns(
+        engine, "column_metadata"
+    )
+
+
+def test_upgrade_fills_defaults_of_new_columns(engine):
+    """Test existing seed jobs are seeds once jobs gain a kind."""
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO bus_seed_jobs VALUES "
+                "('j1', 'p1', 'completed', '2024-01-01', '2024-01-01')"
+            )
+        )
+
+    upgrade_metadata(engine)
+
+    with engine.begin() as connection:
+        assert connection.execute(text("SELECT kind FROM bus_seed_jobs")).scalar() == "seed"
+
+
+@pytest.fixture
+def duplicated(engine):
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO bus_metadata VALUES "
+                "('s1', 'public', 'p1', '2024-01-01', '2024-01-01'),"
+                "('s2', 'public', 'p1', '2024-01-01', '2024-02-01')"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO table_metadata VALUES "
+                "('t1', 'users', 'public', 's1', '2024-01-01', '2024-01-01'),"
+                "('t2', 'users', 'public', 's2', '2024-01-01', '2024-01-01')"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO column_metadata VALUES "
+                "('c1', 'id', 'users', 't1', 'public', 's1', '2024-01-01', '2024-01-01'),"
+                "('c2', 'id', 'users', 't2', 'public', 's2', '2024-01-01', '2024-01-01'),"
+                "('c3', 'email', 'users', 't2', 'public', 's2', '2024-01-01', '2024-01-01')"
+            )
+        )
+    return engine
+
+
+def test_upgrade_stops_on_duplicates(duplicated):
+    """Test a unique key over duplicate rows stops the upgrade, changing nothing."""
+    with pytest.raises(DuplicateRows, match="bus_metadata"):
+        upgrade_metadata(duplicated)
+
+    assert "pool_settings" not in columns(duplicated, "bus_projects")
+    with duplicated.begin() as connection:
+        assert connection.execute(text("SELECT count(*) FROM bus_metadata")).scalar() == 2
+
+
+def test_upgrade_merges_duplicates_on_request(duplicated):
+    """Test duplicates are merged into the newest row before adding the unique keys."""
+    upgrade_metadata(duplicated, merge_duplicates=True)
+
+    with duplicated.begin() as connection:
+        # The most recently updated schema is kept and its duplicates' rows
+        # now point at it.
+        assert connection.execute(text("SELECT id FROM bus_metadata")).scalars().all() == ["s2"]
+        assert connection.execute(
+            text("SELECT id, schema_id FROM table_metadata")
+        ).all() == [("t2", "s2")]
+        assert connection.execute(
+            text("SELECT column_name, table_id FROM column_metadata ORDER BY column_name")
+        ).all() == [("email", "t2"), ("id", "t2")]
+    with pytest.raises(IntegrityError), duplicated.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO table_metadata (id, table_name, schema_id, created_at, updated_at) "
+                "VALUES ('t3', 'users', 's2', '2024-01-01', '2024-01-01')"
+            )
+        )
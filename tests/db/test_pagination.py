@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    select,
+)
+
+from src.db.utils.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_key,
+    keyset_order,
+    keyset_page,
+    paginate_rows,
+)
+
+metadata = MetaData()
+events = Table(
+    "events",
+    metadata,
+    Column("tenant", Integer, primary_key=True),
+    Column("seq", Integer, primary_key=True),
+    Column("name", String),
+)
+logs = Table(
+    "logs",
+    metadata,
+    Column("code", String, nullable=False),
+    Column("note", String),
+    Index("logs_code_key", "code", unique=True),
+)
+heap = Table("heap", metadata, Column("note", String))
+readings = Table(
+    "readings",
+    metadata,
+    Column("taken_at", DateTime, primary_key=True),
+    Column("value", Integer),
+)
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        connection.execute(
+            events.insert(),
+            [
+                {"tenant": tenant, "seq": seq, "name": f"{tenant}-{seq}"}
+                for tenant in range(3)
+                for seq in range(4)
+            ],
+        )
+        yield connection
+
+
+def fetch(connection, limit, cursor=None, sort=()):
+    order = keyset_order(events, sort)
+    query, direction, has_cursor = keyset_page(select(events), order, limit, cursor)
+    rows = connection.execute(query).mappings().all()
+    rows, next_cursor, prev_cursor = paginate_rows(
+        rows, order, limit, direction, has_cursor
+    )
+    return [row["name"] for row in rows], next_cursor, prev_cursor
+
+
+def test_keyset_key_prefers_primary_key_then_unique_index():
+    assert [column.name for column in keyset_key(events)] == ["tenant", "seq"]
+    assert [column.name for column in keyset_key(logs)] == ["code"]
+    assert keyset_key(heap) is None
+
+
+def test_pages_forward_and_back(connection):
+    """Test every row is visited once and prev_cursor returns the same page."""
+    pages, cursor = [], None
+    while True:
+        names, cursor, prev_cursor = fetch(connection, 5, cursor)
+        pages.append((names, prev_cursor))
+        if not cursor:
+            break
+
+    assert [names for names, _ in pages] == [
+        ["0-0", "0-1", "0-2", "0-3", "1-0"],
+        ["1-1", "1-2", "1-3", "2-0", "2-1"],
+        ["2-2", "2-3"],
+    ]
+    assert pages[0][1] is None
+    names, next_cursor, prev_cursor = fetch(connection, 5, pages[2][1])
+    assert names == pages[1][0]
+    assert next_cursor and prev_cursor
+
+
+def test_pages_mixed_direction_sort(connection):
+    """Test a descending sort is seeked with the key as tie-breaker."""
+    sort = [(events.c.seq, True)]
+    first, cursor, _ = fetch(connection, 4, sort=sort)
+    second, _, prev_cursor = fetch(connection, 4, cursor, sort=sort)
+
+    assert first == ["0-3", "1-3", "2-3", "0-2"]
+    assert second == ["1-2", "2-2", "0-1", "1-1"]
+    assert fetch(connection, 4, prev_cursor, sort=sort)[0] == first
+
+
+def test_nullable_sort_has_no_keyset_order():
+    assert keyset_order(events, [(events.c.name, False)]) is None
+
+
+def test_rejects_cursor_of_another_key():
+    order = keyset_order(events)
+    cursor = encode_cursor(keyset_order(logs), {"code": "a"}, "next")
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, order)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, keyset_order(logs, [(logs.c.code, True)]))
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor", order)
+
+
+def test_pages_by_datetime_key():
+    """Test cursors of a datetime key decode to datetimes and seek correctly."""
+    start = datetime(2024, 1, 1, 23, 59, 30)
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        connection.execute(
+            readings.insert(),
+            [{"taken_at": start + timedelta(seconds=i * 15), "value": i} for i in range(7)],
+        )
+        order = keyset_order(readings)
+        values, cursor = [], None
+        while True:
+            query, direction, has_cursor = keyset_page(select(readings), order, 3, cursor)
+            rows = connection.execute(query).mappings().all()
+            rows, cursor, _ = paginate_rows(rows, order, 3, direction, has_cursor)
+            values += [row["value"] for row in rows]
+            if not cursor:
+                break
+            assert decode_cursor(cursor, order)[0] == [rows[-1]["taken_at"]]
+
+    assert values == list(range(7))
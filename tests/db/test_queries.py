@@ -0,0 +1,114 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.db.utils.queries import (
+    QUERY_TIMEOUT,
+    RunningQuery,
+    apply_timeout,
+    cancel_on_disconnect,
+    cancel_query,
+    effective_timeout,
+    query_registry,
+    tracked,
+)
+
+
+class RecordingConnection:
+    """Collects the SQL sent to it, posing as a connection of ``dialect``."""
+
+    def __init__(self, dialect, is_mariadb=False):
+        self.dialect = SimpleNamespace(name=dialect, is_mariadb=is_mariadb)
+        self.statements = []
+
+    def execute(self, statement, parameters=None):
+        self.statements.append((str(statement), parameters))
+
+
+def running_query(user_id="u1", **kwargs):
+    return RunningQuery(
+        id="q1", user_id=user_id, project_id="p1", db_url="sqlite://", sql="SELECT 1", **kwargs
+    )
+
+
+def test_effective_timeout():
+    """Test requests can shorten the project's timeout but not extend it."""
+    assert effective_timeout(None, 30) == 30
+    assert effective_timeout(10, 30) == 10
+    assert effective_timeout(60, 30) == 30
+    assert effective_timeout(None, None) == QUERY_TIMEOUT
+
+
+def test_apply_timeout_per_dialect():
+    """Test the timeout setting each dialect understands is used and reset."""
+    postgres = RecordingConnection("postgresql")
+    apply_timeout(postgres, 5)()
+    mysql = RecordingConnection("mysql")
+    apply_timeout(mysql, 5)()
+    mariadb = RecordingConnection("mysql", is_mariadb=True)
+    apply_timeout(mariadb, 5)
+
+    assert postgres.statements == [
+        ("SELECT set_config('statement_timeout', :timeout, true)", {"timeout": "5000"})
+    ]
+    assert [sql for sql, _ in mysql.statements] == [
+        "SET SESSION max_execution_time = 5000",
+        "SET SESSION max_execution_time = DEFAULT",
+    ]
+    assert mariadb.statements[0][0] == "SET SESSION max_statement_time = 5.0"
+
+
+def test_tracked_registers_while_running():
+    """Test queries are listed only while their statements run."""
+    engine = create_engine("sqlite://")
+    query = running_query(timeout=5)
+
+    with engine.connect() as connection, tracked(connection, query):
+        assert query_registry.get("u1", "q1") is query
+        assert [q.id for q in query_registry.for_user("u1")] == ["q1"]
+        connection.execute(text("SELECT 1"))
+
+    assert query_registry.get("u1", "q1") is None
+    assert not cancel_query(engine, query)
+
+
+def test_query_ids_are_taken_per_user():
+    """Test a running id can't be reused by its user but is invisible to others."""
+    engine = create_engine("sqlite://")
+    query = running_query()
+
+    with engine.connect() as connection, tracked(connection, query):
+        with pytest.raises(ValueError, match="already running"):
+            with tracked(connection, running_query()):
+                pass
+        other = running_query(user_id="u2")
+        with tracked(connection, other):
+            assert query_registry.get("u2", "q1") is other
+        assert query_registry.get("u1", "q1") is query
+
+    with pytest.raises(ValueError):
+        query_registry.new_id("q1; DROP")
+    assert query_registry.new_id("q-1") == "q-1"
+
+
+def test_cancel_on_disconnect():
+    """Test a client going away cancels its query."""
+    cancelled = []
+    request = SimpleNamespace(is_disconnected=lambda: asyncio.sleep(0, result=True))
+
+    async def slow_query():
+        while not cancelled:
+            await asyncio.sleep(0.01)
+        return "stopped"
+
+    async def cancel():
+        cancelled.append(True)
+
+    result = asyncio.run(
+        cancel_on_disconnect(request, slow_query(), cancel, interval=0.01)
+    )
+
+    assert result == "stopped"
+    assert cancelled == [True]
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.db.utils.queries import RunningQuery, query_registry
+from src.db.utils.query_jobs import QueryJobStore, QuotaExceeded, RowWriter, read_rows
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, body TEXT)"))
+        connection.execute(
+            text("INSERT INTO events (id, body) VALUES (:id, :body)"),
+            [{"id": i, "body": f"event {i}"} for i in range(25)],
+        )
+    return engine
+
+
+def run_job(store, engine, sql="SELECT id, body FROM events ORDER BY id"):
+    query = RunningQuery(
+        id=query_registry.new_id(), user_id="u1", project_id="p1", db_url="sqlite://", sql=sql
+    )
+    store.submit(engine, query)
+    store.executor.shutdown(wait=True)
+    return store.get("u1", query.id)
+
+
+def test_row_store_random_access(tmp_path):
+    """Test pages are read back from any offset of the row store."""
+    writer = RowWriter(tmp_path)
+    writer.append([(i, f"row {i}") for i in range(7)])
+    writer.append([(7, None), (8, "ünïcode")])
+    writer.close()
+
+    assert read_rows(tmp_path, 0, 2) == [[0, "row 0"], [1, "row 1"]]
+    assert read_rows(tmp_path, 6, 10) == [[6, "row 6"], [7, None], [8, "ünïcode"]]
+    assert read_rows(tmp_path, 9, 10) == []
+
+
+def test_job_spills_and_pages(engine, tmp_path):
+    """Test a job stores its whole result and serves pages of it."""
+    store = QueryJobStore(root=str(tmp_path / "jobs"), batch_size=4)
+
+    job = run_job(store, engine)
+
+    assert job["status"] == "completed"
+    assert job["columns"] == ["id", "body"]
+    assert job["row_count"] == 25
+    assert store.rows("u1", job["job_id"], 20, 10) == [
+        [i, f"event {i}"] for i in range(20, 25)
+    ]
+    assert [job["job_id"] for job in store.for_user("u1")] == [job["job_id"]]
+
+
+def test_job_over_quota_fails(engine, tmp_path):
+    """Test a result over the user's quota fails the job and refuses new ones."""
+    store = QueryJobStore(root=str(tmp_path / "jobs"), quota=200, batch_size=4)
+
+    job = run_job(store, engine)
+
+    assert job["status"] == "failed"
+    assert job["bytes"] == 0
+    store.quota = 0
+    with pytest.raises(QuotaExceeded):
+        run_job(store, engine)
+
+
+def test_expired_jobs_are_swept(engine, tmp_path):
+    """Test finished jobs disappear once their TTL is over."""
+    store = QueryJobStore(root=str(tmp_path / "jobs"), ttl=60)
+    job = run_job(store, engine)
+
+    later = datetime.now(timezone.utc) + timedelta(seconds=61)
+    assert store.get("u1", job["job_id"], now=later) is None
+    assert store.sweep(now=later) == 1
+    assert store.for_user("u1") == []
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from src.db.utils.query_log import (
+    LoggedStatement,
+    QueryLogBuffer,
+    fingerprint,
+    latency,
+    normalize_sql,
+    slowest,
+)
+from src.schema import QueryLog
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metadata.db'}")
+    QueryLog.__table__.create(engine)
+    return engine
+
+
+def logged(sql, duration_ms, project_id="p1", source="execute"):
+    statement = LoggedStatement(source, sql, project_id, "u1")
+    statement.finish(rows=1)
+    statement.duration_ms = duration_ms
+    return statement
+
+
+def test_normalize_sql():
+    """Test statements differing only in literals share a fingerprint."""
+    first = normalize_sql("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a' -- note")
+    second = normalize_sql("select *  from t\nwhere id in (4) and name = 'b''c';")
+
+    assert first == "select * from t where id in (?+) and name = ?"
+    assert fingerprint(first) == fingerprint(second)
+    assert normalize_sql("SELECT a::int FROM t1 LIMIT :param_1") == (
+        "select a::int from t1 limit ?"
+    )
+
+
+def test_ring_keeps_newest(engine):
+    """Test the log table keeps only the newest entries of the ring."""
+    buffer = QueryLogBuffer(size=3)
+    for batch in (range(2), range(2, 5)):
+        for i in batch:
+            buffer.pending.append(logged(f"SELECT {i}", i))
+        buffer.flush(engine)
+
+    with Session(engine) as db:
+        durations = db.execute(select(QueryLog.duration_ms).order_by(QueryLog.id)).scalars()
+        assert list(durations) == [2, 3, 4]
+        assert db.execute(select(func.count()).select_from(QueryLog)).scalar() == 3
+
+
+def test_slowest_and_latency(engine):
+    """Test fingerprints are ranked by duration with percentiles per fingerprint."""
+    buffer = QueryLogBuffer(size=1000)
+    for i in range(1, 101):
+        buffer.pending.append(logged(f"SELECT * FROM big WHERE id = {i}", i))
+    buffer.pending.append(logged("SELECT 1", 500))
+    buffer.pending.append(logged("SELECT * FROM other", 1000, project_id="p2"))
+    buffer.pending.append(logged("SELECT * FROM big WHERE id = 7", 0.5, source="cache"))
+    buffer.flush(engine)
+
+    with Session(engine) as db:
+        top = slowest(db, "p1", limit=2, by="total")
+        [stats] = latency(db, "p1", fingerprint=top[0]["fingerprint"])
+
+    assert [row["statement"] for row in top] == [
+        "select * from big where id = ?",
+        "select ?",
+    ]
+    assert top[0]["count"] == 101
+    assert top[0]["cache_hits"] == 1
+    assert stats["p50"] == pytest.approx(50)
+    assert stats["p99"] == pytest.approx(99)
+    assert stats["max"] == 100
@@ -0,0 +1,58 @@
+import asyncio
+
+from sqlalchemy import text
+
+from src.db.utils.replicas import ReplicaRouter, is_replica_safe, replica_router, run_read
+from src.db.utils.resolution import ProjectConnection
+
+
+def project(tmp_path, replicas, max_replica_lag=None):
+    return ProjectConnection(
+        f"sqlite:///{tmp_path / 'primary.db'}", None, None, replicas, max_replica_lag
+    )
+
+
+def test_replica_safe_statements():
+    """Test only plain reads are sent to replicas."""
+    assert is_replica_safe("SELECT * FROM orders WHERE note = 'for update'")
+    assert is_replica_safe("WITH t AS (SELECT 1) SELECT * FROM t")
+    assert not is_replica_safe("SELECT * FROM orders FOR UPDATE")
+    assert not is_replica_safe("SELECT nextval('orders_id_seq')")
+    assert not is_replica_safe("SELECT * INTO backup FROM orders")
+    assert not is_replica_safe("UPDATE orders SET status = 'done'")
+
+
+def test_choose_balances_healthy_replicas(tmp_path):
+    """Test reads go to checked, caught-up replicas with the fewest reads in flight."""
+    first, second = (f"sqlite:///{tmp_path / f'replica{i}.db'}" for i in range(2))
+    router = ReplicaRouter(max_lag=30)
+    target = project(tmp_path, [first, second])
+
+    # Nothing is known about the replicas before their first check.
+    assert router.choose(target) == target.db_url
+    router.executor.shutdown(wait=True)
+    with router.reading(first):
+        assert router.choose(target) == second
+        router.replicas[second].lag = 60
+        assert router.choose(target) == first
+    assert router.choose(project(tmp_path, [second], max_replica_lag=120)) == second
+
+    router.failed(first, "connection refused")
+    router.replicas[second].healthy = False
+    assert router.choose(target) == target.db_url
+
+
+def test_run_read_falls_back_to_primary(tmp_path):
+    """Test a read whose replica can't be reached is retried on the primary."""
+    unreachable = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    target = project(tmp_path, [unreachable])
+    replica_router.check(unreachable)
+    replica_router.replicas[unreachable].healthy = True
+    replica_router.replicas[unreachable].lag = 0
+
+    value = asyncio.run(
+        run_read(target, lambda connection: connection.execute(text("SELECT 1")).scalar_one())
+    )
+
+    assert value == 1
+    assert replica_router.choose(target) == target.db_url
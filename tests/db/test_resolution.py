@@ -0,0 +1,89 @@
+import threading
+import time
+
+from sqlalchemy import Column, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from src.db.utils.resolution import PROJECTS_TABLE, ResolutionCache, resolution_cache
+
+
+def test_hits_until_ttl(monkeypatch):
+    """Test values are reused until they expire and None is never cached."""
+    now = [1000.0]
+    monkeypatch.setattr("src.db.utils.resolution.time.monotonic", lambda: now[0])
+    cache = ResolutionCache(ttl=10)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return "postgresql://db"
+
+    assert cache.get(("connection", "p1"), load) == "postgresql://db"
+    assert cache.get(("connection", "p1"), load) == "postgresql://db"
+    now[0] += 11
+    cache.get(("connection", "p1"), load)
+    cache.get(("connection", "p2"), lambda: None)
+    cache.get(("connection", "p2"), lambda: None)
+
+    assert len(loads) == 2
+    assert ("connection", "p2") not in cache.entries
+
+
+def test_single_flight():
+    """Test concurrent misses on one key share a single load."""
+    cache = ResolutionCache(ttl=60)
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get(("k", "p"), load)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_invalidate_project():
+    """Test invalidation drops one project's entries only."""
+    cache = ResolutionCache(ttl=60)
+    cache.get(("connection", "p1"), lambda: "a")
+    cache.get(("schema_name", "p1", "s1"), lambda: "public")
+    cache.get(("connection", "p2"), lambda: "b")
+
+    cache.invalidate("p1")
+
+    assert list(cache.entries) == [("connection", "p2")]
+
+
+def test_project_update_invalidates_on_commit():
+    """Test committing a changed project drops its cached resolution."""
+    Base = declarative_base()
+
+    class Project(Base):
+        __tablename__ = PROJECTS_TABLE
+        id = Column(String, primary_key=True)
+        db_connection_string = Column(String)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Project(id="p1", db_connection_string="old"))
+        db.commit()
+        resolution_cache.get(("connection", "p1"), lambda: "old")
+
+        db.get(Project, "p1").db_connection_string = "new"
+        db.flush()
+        assert ("connection", "p1") in resolution_cache.entries
+        db.commit()
+
+    assert ("connection", "p1") not in resolution_cache.entries
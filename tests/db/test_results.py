@@ -0,0 +1,160 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from src.db.utils.results import (
+    InvalidContinuation,
+    decode_continuation,
+    encode_continuation,
+    execute_bounded,
+    is_ordered,
+    is_read_only,
+    stream_ndjson,
+    streams_rows,
+    take_rows,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, body TEXT)"))
+        connection.execute(
+            text("INSERT INTO events (id, body) VALUES (:id, :body)"),
+            [{"id": i, "body": "x" * 10} for i in range(25)],
+        )
+    return engine
+
+
+def take(engine, max_rows, max_bytes=10**9, skip=0):
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(
+            text("SELECT id, body FROM events ORDER BY id")
+        )
+        return take_rows(result, max_rows, max_bytes, skip, batch_size=4)
+
+
+def test_row_budget(engine):
+    """Test results stop at the row budget and report truncation."""
+    rows, truncated = take(engine, max_rows=10)
+
+    assert [row[0] for row in rows] == list(range(10))
+    assert truncated
+
+
+def test_exact_fit_is_not_truncated(engine):
+    """Test a result that fits the budget exactly isn't truncated."""
+    rows, truncated = take(engine, max_rows=25)
+
+    assert len(rows) == 25
+    assert not truncated
+
+
+def test_byte_budget_and_skip(engine):
+    """Test the byte budget cuts results short and skip resumes after the returned rows."""
+    first, truncated = take(engine, max_rows=100, max_bytes=500)
+    rest, _ = take(engine, max_rows=100, skip=len(first))
+
+    assert truncated
+    assert 0 < len(first) < 25
+    assert [row[0] for row in first + rest] == list(range(25))
+
+
+def test_continuation_roundtrip():
+    """Test signed continuation handles carry the query and offset for their user only."""
+    handle = encode_continuation("SELECT * FROM events", 100, "u1", "p1")
+    payload, signature = handle.split(".")
+    forged = encode_continuation("DELETE FROM events", 0, "u1", "p1").split(".")[0]
+
+    assert decode_continuation(handle, "u1", "p1") == ("SELECT * FROM events", 100)
+    for bad in ("not-a-handle", f"{forged}.{signature}", f"{payload}.x{signature}"):
+        with pytest.raises(InvalidContinuation):
+            decode_continuation(bad, "u1", "p1")
+    with pytest.raises(InvalidContinuation):
+        decode_continuation(handle, "u2", "p1")
+    with pytest.raises(InvalidContinuation):
+        decode_continuation(handle, "u1", "p2")
+
+
+@pytest.mark.parametrize(
+    "sql, ordered",
+    [
+        ("SELECT * FROM events ORDER BY id", True),
+        ("SELECT * FROM (SELECT * FROM events ORDER BY id) e", False),
+        ("SELECT * FROM events WHERE body = 'order by'", False),
+        ("WITH e AS (SELECT * FROM events) SELECT * FROM e\nORDER\n BY id DESC", True),
+    ],
+)
+def test_is_ordered(sql, ordered):
+    """Test only a top-level ORDER BY makes continuations stable."""
+    assert is_ordered(sql) is ordered
+
+
+@pytest.mark.parametrize(
+    "sql, read_only",
+    [
+        ("SELECT * FROM events", True),
+        ("  with x as (select 1) select * from x", True),
+        ("WITH gone AS (DELETE FROM events RETURNING *) SELECT * FROM gone", False),
+        ("INSERT INTO events VALUES (1) RETURNING id", False),
+    ],
+)
+def test_is_read_only(sql, read_only):
+    """Test only read statements get continuation handles."""
+    assert is_read_only(sql) is read_only
+
+
+def test_stream_ndjson(engine):
+    """Test streamed results hold every row, one JSON object per line."""
+    chunks = list(stream_ndjson(engine, text("SELECT id FROM events"), batch_size=10))
+    lines = b"".join(chunks).decode().splitlines()
+
+    assert len(chunks) == 3
+    assert [json.loads(line)["id"] for line in lines] == list(range(25))
+
+
+def test_stream_ndjson_write(engine):
+    """Test streamed writes are committed and reported."""
+    committed = []
+
+    chunks = list(
+        stream_ndjson(engine, text("DELETE FROM events"), lambda: committed.append(1))
+    )
+
+    assert json.loads(chunks[0])["message"]
+    assert committed == [1]
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM events")).scalar_one() == 0
+
+
+def streamed_statements(engine):
+    """Record whether each statement run on ``engine`` asked for a server-side cursor."""
+    streamed = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(connection, cursor, statement, parameters, context, executemany):
+        streamed.append(bool(context.execution_options.get("stream_results")))
+
+    return streamed
+
+
+def test_writes_skip_server_side_cursors(engine):
+    """Test writes run as plain statements on both the bounded and streamed paths."""
+    streamed = streamed_statements(engine)
+
+    def run(sql):
+        with engine.connect() as connection:
+            return execute_bounded(connection, text(sql), sql, max_rows=100, max_bytes=10**9)
+
+    executed = run("DELETE FROM events WHERE id < 5")
+    chunks = list(stream_ndjson(engine, text("UPDATE events SET body = 'y'")))
+    reads = run("SELECT id FROM events")
+
+    assert executed.keys is None and executed.rowcount == 5
+    assert json.loads(chunks[0])["rowcount"] == 20
+    assert len(reads.rows) == 20
+    assert streamed == [False, False, True]
+    assert not streams_rows("SHOW search_path")
+    assert not streams_rows("WITH gone AS (DELETE FROM events RETURNING *) SELECT * FROM gone")
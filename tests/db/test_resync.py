@@ -0,0 +1,199 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.models import Base, ColumnMetadata
+from src.schema import SchemaMetadata, TableMetadata
+from src.db.utils.ingest import COLUMN_DETAILS, MetadataWriter, RelationRow
+from src.db.utils.resync import CatalogResync, match_renames, resync_catalog
+
+
+@pytest.fixture
+def metadata_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[
+            SchemaMetadata.__table__,
+            TableMetadata.__table__,
+            ColumnMetadata.__table__,
+        ],
+    )
+    with Session(engine) as session:
+        yield session
+
+
+def columns(*names, data_type="integer"):
+    return [
+        {
+            "column_name": name,
+            **dict.fromkeys(COLUMN_DETAILS),
+            "data_type": data_type,
+            "ordinal_position": position,
+        }
+        for position, name in enumerate(names, start=1)
+    ]
+
+
+def names(catalog):
+    return {
+        schema_name: {
+            table_name: sorted(column["column_name"] for column in table_columns)
+            for table_name, table_columns in tables.items()
+        }
+        for schema_name, tables in catalog.items()
+    }
+
+
+def sync(db, catalog):
+    return CatalogResync(db, "proj_123").run(list(catalog), catalog.__getitem__)
+
+
+def stored_catalog(db):
+    catalog = {}
+    for schema in db.execute(select(SchemaMetadata)).scalars():
+        catalog[schema.schema_name] = {}
+    for table in db.execute(select(TableMetadata)).scalars():
+        catalog[table.schema_name][table.table_name] = []
+    columns = db.execute(select(ColumnMetadata).order_by(ColumnMetadata.column_name))
+    for column in columns.scalars():
+        catalog[column.schema_name][column.table_name].append(column.column_name)
+    return catalog
+
+
+class TestCatalogResync:
+    """Test incremental catalog re-sync."""
+
+    def test_first_sync_inserts_everything(self, metadata_db):
+        """Test an empty project receives the whole catalog."""
+        catalog = {"public": {"users": columns("email", "id"), "orders": columns("id")}}
+
+        summary = sync(metadata_db, catalog)
+
+        assert summary["schemas_added"] == 1
+        assert summary["tables_added"] == 2
+        assert summary["columns_added"] == 3
+        assert stored_catalog(metadata_db) == names(catalog)
+
+    def test_unchanged_catalog_is_skipped(self, metadata_db):
+        """Test a second sync of the same catalog writes nothing."""
+        catalog = {"public": {"users": columns("email", "id")}}
+        sync(metadata_db, catalog)
+
+        summary = sync(metadata_db, catalog)
+
+        assert summary["schemas_unchanged"] == 1
+        assert summary["tables_added"] == 0
+        assert summary["columns_added"] == 0
+
+    def test_applies_drops_renames_and_column_changes(self, metadata_db):
+        """Test drops, renames and column changes are applied in place."""
+        sync(metadata_db, 
+            {
+                "public": {
+                    "users": columns("email", "id"),
+                    "legacy": columns("id", "payload"),
+                },
+                "staging": {"events": columns("id")},
+            }
+        )
+        users_id = metadata_db.execute(
+            select(TableMetadata.id).where(TableMetadata.table_name == "users")
+        ).scalar_one()
+
+        catalog = {
+            "public": {
+                "accounts": columns("email", "id"),
+                "legacy": columns("id", "kind"),
+            },
+        }
+        summary = sync(metadata_db, catalog)
+
+        assert summary["schemas_deleted"] == 1
+        assert summary["tables_renamed"] == 1
+        assert summary["tables_updated"] == 1
+        assert summary["columns_added"] == 1
+        assert summary["columns_deleted"] == 1
+        assert stored_catalog(metadata_db) == names(catalog)
+        renamed = metadata_db.get(TableMetadata, users_id)
+        assert renamed.table_name == "accounts"
+
+    def test_updates_changed_column_types(self, metadata_db):
+        """Test a type change updates the stored column in place."""
+        sync(metadata_db, {"public": {"users": columns("id")}})
+
+        summary = sync(metadata_db, 
+            {"public": {"users": columns("id", data_type="bigint")}}
+        )
+
+        assert summary["columns_updated"] == 1
+        assert summary["columns_added"] == 0
+        stored = metadata_db.execute(select(ColumnMetadata)).scalar_one()
+        assert stored.data_type == "bigint"
+
+
+def test_match_renames_ignores_ambiguous_fingerprints():
+    renames = match_renames(
+        {"old_a": "fp1", "old_b": "fp2", "old_c": "fp2", "old_d": None},
+        {"new_a": "fp1", "new_b": "fp2"},
+    )
+
+    assert renames == {"old_a": "new_a"}
+
+
+class SchemaReader:
+    """A catalog reader over ``{schema: {table: [column names]}}``."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.reads = []
+
+    def schema_names(self, source_db):
+        return list(self.catalog)
+
+    def relations(self, source_db, schema_name):
+        self.reads.append(schema_name)
+        for table_name, column_names in self.catalog[schema_name].items():
+            for position, column_name in enumerate(column_names, start=1):
+                yield RelationRow(
+                    schema_name, table_name, column_name, ordinal_position=position
+                )
+
+
+def test_resync_reports_changed_tables_after_commit(metadata_db):
+    """Test schemas are read one at a time and changed tables reach on_commit."""
+    reader = SchemaReader(
+        {"public": {"users": ["id"], "orders": ["id"]}, "staging": {"events": ["id"]}}
+    )
+    resync_catalog(None, metadata_db, "proj_123", reader)
+    reader.catalog = {"public": {"users": ["id", "email"], "orders": ["id"]}}
+    reader.reads = []
+    changes = []
+
+    resync_catalog(None, metadata_db, "proj_123", reader, on_commit=changes.append)
+
+    assert reader.reads == ["public"]
+    assert changes == [{("public", "users"), ("staging", "events")}]
+    assert stored_catalog(metadata_db) == {
+        "public": {"users": ["email", "id"], "orders": ["id"]}
+    }
+
+
+def test_resync_after_seed_reads_but_writes_nothing(metadata_db):
+    """Test a seed stores the fingerprints a re-sync of the same catalog matches."""
+    reader = SchemaReader(
+        {"public": {"users": ["id", "email"], "orders": ["id"]}, "staging": {}}
+    )
+    writer = MetadataWriter(metadata_db, "proj_123")
+    schema_ids = writer.write_schemas(list(reader.catalog))
+    for schema_name, schema_id in schema_ids.items():
+        # One row per batch, so tables straddle batches.
+        writer.write_relations(
+            {schema_name: schema_id}, reader.relations(None, schema_name), batch_size=1
+        )
+    changes = []
+
+    summary = resync_catalog(None, metadata_db, "proj_123", reader, on_commit=changes.append)
+
+    assert summary["schemas_unchanged"] == 2
+    assert changes == [set()]
@@ -0,0 +1,13 @@
+from sqlalchemy import create_engine
+
+from src.db.utils.ingest import GroupedColumnsReader, InformationSchemaReader
+from src.db.utils.seed import Seed
+
+
+def test_catalog_reader_per_dialect():
+    """Test MySQL seeds read columns grouped per schema and others join per table."""
+    mysql = Seed("proj_123", create_engine("mysql+mysqlconnector://u:p@localhost/shop"))
+    sqlite = Seed("proj_123", create_engine("sqlite://"))
+
+    assert type(mysql.catalog_reader()) is GroupedColumnsReader
+    assert type(sqlite.catalog_reader()) is InformationSchemaReader
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from sqlalchemy import ARRAY, Integer, VARCHAR
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import NullType
+
+from src.db.utils.tables import column_type, table_from_metadata
+
+
+def stored(column_name, data_type, is_primary_key=False, is_nullable=True, indexes=()):
+    return SimpleNamespace(
+        column_name=column_name,
+        data_type=data_type,
+        is_primary_key=is_primary_key,
+        is_nullable=is_nullable,
+        indexes=list(indexes),
+    )
+
+
+def test_column_type_maps_dialect_names():
+    dialect = postgresql.dialect()
+
+    assert isinstance(column_type(dialect, "character varying(255)"), VARCHAR)
+    assert isinstance(column_type(dialect, "integer[]"), ARRAY)
+    assert isinstance(column_type(dialect, "my_enum"), NullType)
+
+
+def test_table_from_metadata_builds_typed_table():
+    engine = SimpleNamespace(dialect=postgresql.dialect())
+
+    table = table_from_metadata(
+        engine,
+        "public",
+        "users",
+        [
+            stored("id", "integer", True, False),
+            stored(
+                "email",
+                "text",
+                indexes=[{"name": "users_email_key", "unique": True, "primary": False}],
+            ),
+        ],
+    )
+
+    assert table.fullname == "public.users"
+    assert list(table.columns.keys()) == ["id", "email"]
+    assert isinstance(table.c.id.type, Integer)
+    assert table.c.id.primary_key and not table.c.id.nullable
+    [index] = table.indexes
+    assert index.unique and list(index.columns) == [table.c.email]
+
+
+def test_table_from_metadata_keeps_index_key_order():
+    """Test key columns follow their index positions, not their ordinal order."""
+    engine = SimpleNamespace(dialect=postgresql.dialect())
+    def key(position):
+        return [
+            {"name": name, "unique": True, "primary": primary, "position": position}
+            for name, primary in (("pairs_pkey", True), ("pairs_b_a_key", False))
+        ]
+
+    table = table_from_metadata(
+        engine,
+        "public",
+        "pairs",
+        [
+            stored("a", "integer", True, indexes=key(2)),
+            stored("b", "integer", True, indexes=key(1)),
+        ],
+    )
+
+    assert list(table.primary_key.columns) == [table.c.b, table.c.a]
+    [index] = table.indexes
+    assert list(index.columns) == [table.c.b, table.c.a]
+
+
+def test_table_from_metadata_requires_types():
+    engine = SimpleNamespace(dialect=postgresql.dialect())
+
+    assert table_from_metadata(engine, "public", "users", []) is None
+    assert (
+        table_from_metadata(engine, "public", "users", [stored("id", None)]) is None
+    )
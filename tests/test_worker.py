@@ -0,0 +1,110 @@
+import importlib
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.db.utils.jobs import create_seed_job, latest_seed_job
+from src.models import Base
+from src.projects import models as project_models
+from src.schema import SeedCheckpoint, SeedJob
+from src.worker import (
+    BrokerNotConfigured,
+    celery_app,
+    enqueue_seed,
+    resync_project,
+    seed_project,
+    seed_queue,
+    seed_task_id,
+)
+
+
+def test_seed_task_keys_and_queues():
+    """Test seed task ids are deterministic and queues are per dialect."""
+    assert seed_task_id("proj_123", "job_1") == seed_task_id("proj_123", "job_1")
+    assert seed_queue("mariadb") == "seed.mariadb"
+
+
+def test_seed_needs_a_broker():
+    """Test seeds are refused, not run in-process, without a real broker."""
+    assert not celery_app.conf.task_always_eager
+    assert celery_app.conf.broker_url.startswith("memory://")
+
+    with pytest.raises(BrokerNotConfigured):
+        enqueue_seed("proj_123", "job_1", "postgresql")
+
+
+class FakeSeed:
+    def __init__(self, metadata_engine, runs):
+        self.metadata_engine = metadata_engine
+        self.runs = runs
+
+    def insert_metadata(self, job=None):
+        self.runs.append(job.job_id)
+
+    def resync_metadata(self, on_commit=None):
+        self.runs.append("resync")
+        on_commit({("public", "users")})
+        return {"tables_updated": 1}
+
+
+@pytest.fixture
+def metadata_engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metadata.db'}")
+    project_models.Base.metadata.create_all(engine)
+    Base.metadata.create_all(engine, tables=[SeedJob.__table__, SeedCheckpoint.__table__])
+    with Session(engine) as db:
+        db.add(
+            project_models.ProjectModel(
+                id="proj_123",
+                project_name="shop",
+                db_connection_string=f"sqlite:///{tmp_path / 'shop.db'}",
+                pool_settings={"pool_size": 2},
+                created_by="u1",
+            )
+        )
+        db.commit()
+    db_config = importlib.import_module("src.db.config")
+    monkeypatch.setattr(db_config, "metadata_engine", engine)
+    return engine
+
+
+@pytest.fixture
+def runs(metadata_engine, monkeypatch):
+    runs = []
+    db_config = importlib.import_module("src.db.config")
+    monkeypatch.setattr(
+        db_config, "get_seed", lambda source_engine, project_id: FakeSeed(metadata_engine, runs)
+    )
+    return runs
+
+
+def test_seed_project_completes_once(metadata_engine, runs):
+    """Test a seed task completes its job and a duplicate delivery does nothing."""
+    with Session(metadata_engine) as db:
+        job_id = create_seed_job(db, "proj_123").id
+
+    assert seed_project.apply(args=("proj_123", job_id)).get() is True
+    assert seed_project.apply(args=("proj_123", job_id)).get() is False
+
+    assert runs == [job_id]
+    with Session(metadata_engine) as db:
+        assert db.get(SeedJob, job_id).status == "completed"
+
+
+def test_resync_project_records_its_summary(metadata_engine, runs):
+    """Test a re-sync task stores its counters and changed tables on its own job."""
+    with Session(metadata_engine) as db:
+        seed_job_id = create_seed_job(db, "proj_123").id
+        job_id = create_seed_job(db, "proj_123", kind="resync").id
+
+    assert resync_project.apply(args=("proj_123", job_id)).get() is True
+    assert resync_project.apply(args=("proj_123", job_id)).get() is False
+
+    assert runs == ["resync"]
+    with Session(metadata_engine) as db:
+        job = latest_seed_job(db, "proj_123", kind="resync")
+        assert job.id == job_id
+        assert job.status == "completed"
+        assert job.summary == {"tables_updated": 1, "changed_tables": [["public", "users"]]}
+        assert latest_seed_job(db, "proj_123").id == seed_job_id